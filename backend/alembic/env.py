@@ -174,6 +174,10 @@ def run_migrations_online() -> None:
         except Exception as e:
             # Se a tabela não existir ou houver erro, continua normalmente
             print(f"ℹ️  Não foi possível verificar alembic_version: {e}")
+        # Fecha a transação aberta pela consulta acima: com ela pendente o
+        # Alembic não faz o commit das migrations (nem da alembic_version)
+        if connection.in_transaction():
+            connection.rollback()
         
         context.configure(
             connection=connection, target_metadata=target_metadata
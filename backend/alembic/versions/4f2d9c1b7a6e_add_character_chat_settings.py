@@ -0,0 +1,28 @@
+"""add_character_chat_settings
+
+Revision ID: 4f2d9c1b7a6e
+Revises: 931b714a7d45
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2d9c1b7a6e'
+down_revision: Union[str, Sequence[str], None] = '931b714a7d45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - adiciona ajustes de roteamento do chat por personagem."""
+    op.add_column("characters", sa.Column("chat_settings", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("characters", "chat_settings")
@@ -0,0 +1,39 @@
+"""add_fulltext_search_indexes
+
+Revision ID: 7c3e5a2f9b1d
+Revises: 4f2d9c1b7a6e
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5a2f9b1d'
+down_revision: Union[str, Sequence[str], None] = '4f2d9c1b7a6e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - índices FULLTEXT para a busca de personagens (apenas MySQL)."""
+    if op.get_bind().dialect.name != "mysql":
+        # Nos outros bancos a busca usa o índice invertido em memória
+        return
+    op.create_index(
+        "ft_characters_search",
+        "characters",
+        ["name", "description", "who_is_character"],
+        mysql_prefix="FULLTEXT",
+    )
+    op.create_index("ft_phrases_phrase", "phrases", ["phrase"], mysql_prefix="FULLTEXT")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "mysql":
+        return
+    op.drop_index("ft_phrases_phrase", table_name="phrases")
+    op.drop_index("ft_characters_search", table_name="characters")
@@ -0,0 +1,68 @@
+"""add_chat_usage_ledger
+
+Revision ID: b8e4d2a6c1f3
+Revises: 7c3e5a2f9b1d
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e4d2a6c1f3'
+down_revision: Union[str, Sequence[str], None] = '7c3e5a2f9b1d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - tabelas do registro de uso e das transcrições do chat."""
+    op.create_table(
+        "chat_usage",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("request_id", sa.String(length=32), nullable=False),
+        sa.Column("character_id", sa.Integer(), nullable=False),
+        sa.Column("channel", sa.String(length=20), nullable=False),
+        sa.Column("route", sa.String(length=50), nullable=True),
+        sa.Column("model", sa.String(length=100), nullable=True),
+        sa.Column("prompt_tokens", sa.Integer(), nullable=False),
+        sa.Column("completion_tokens", sa.Integer(), nullable=False),
+        sa.Column("total_ms", sa.Float(), nullable=True),
+        sa.Column("openai_ms", sa.Float(), nullable=True),
+        sa.Column("stages", sa.JSON(), nullable=True),
+        sa.Column("moderation", sa.String(length=20), nullable=False),
+        sa.Column("cached", sa.Boolean(), nullable=False),
+        sa.Column("shared", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_chat_usage_request_id", "chat_usage", ["request_id"])
+    op.create_index("ix_chat_usage_created_at", "chat_usage", ["created_at"])
+    op.create_index("ix_chat_usage_character_created", "chat_usage", ["character_id", "created_at"])
+
+    op.create_table(
+        "chat_transcripts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("request_id", sa.String(length=32), nullable=False),
+        sa.Column("character_id", sa.Integer(), nullable=False),
+        sa.Column("role", sa.String(length=20), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_chat_transcripts_request_id", "chat_transcripts", ["request_id"])
+    op.create_index("ix_chat_transcripts_character_id", "chat_transcripts", ["character_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_chat_transcripts_character_id", table_name="chat_transcripts")
+    op.drop_index("ix_chat_transcripts_request_id", table_name="chat_transcripts")
+    op.drop_table("chat_transcripts")
+    op.drop_index("ix_chat_usage_character_created", table_name="chat_usage")
+    op.drop_index("ix_chat_usage_created_at", table_name="chat_usage")
+    op.drop_index("ix_chat_usage_request_id", table_name="chat_usage")
+    op.drop_table("chat_usage")
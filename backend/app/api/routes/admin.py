@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from app.core.profiling import is_admin, profile_store
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(request: Request) -> None:
+    """Exige o header X-Admin-Token igual a PROFILING_ADMIN_TOKEN."""
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Token de administrador inválido.")
+
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Lista os profilings gravados, do mais recente para o mais antigo."""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str):
+    """Baixa um profiling (speedscope: abra o arquivo em https://speedscope.app)."""
+    path = profile_store.path(profile_id) if profile_id.replace("-", "").isalnum() else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profiling não encontrado.")
+    return FileResponse(path, filename=path.rsplit("/", 1)[-1])
@@ -1,26 +1,98 @@
+from datetime import datetime
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import bindparam, delete, select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
 
-from app.database import get_db
+from app.database import get_async_read_db, get_async_write_db, get_read_preference
 from app.models.character import Character
 from app.models.phrase import Phrase
-from app.schemas.character import CharacterCreate, CharacterOut, CharacterUpdate, AVAILABLE_PURPOSES
+from app.schemas.character import (
+    CharacterCreate,
+    CharacterOut,
+    CharacterSearchPage,
+    CharacterUpdate,
+    AVAILABLE_PURPOSES,
+)
+from app.services.characters import load_character
+from app.services.invalidation import invalidation_bus
+from app.services.search import search_characters
 
 router = APIRouter(prefix="/characters", tags=["characters"])
 
 
+async def _apply_phrase_diff(db: AsyncSession, character: Character, phrases, now: datetime) -> bool:
+    """
+    Aplica as falas recebidas como um diff por finalidade (purpose).
+
+    Falas inalteradas não geram SQL; as alteradas viram um único UPDATE em lote
+    (executemany), as finalidades ausentes um único DELETE e as novas um INSERT.
+    O estado das falas na sessão é atualizado diretamente, sem reload.
+
+    Returns:
+        bool: True se alguma fala foi inserida, alterada ou removida
+    """
+    existing = {phrase.purpose: phrase for phrase in character.phrases}
+    incoming = {phrase_data.purpose: phrase_data.phrase for phrase_data in phrases}
+
+    changed = [
+        (existing[purpose], text)
+        for purpose, text in incoming.items()
+        if purpose in existing and existing[purpose].phrase != text
+    ]
+    removed = [phrase for purpose, phrase in existing.items() if purpose not in incoming]
+    added = [
+        Phrase(character_id=character.id, phrase=text, purpose=purpose, created_at=now, updated_at=now)
+        for purpose, text in incoming.items()
+        if purpose not in existing
+    ]
+
+    if changed:
+        phrase_table = Phrase.__table__
+        await db.execute(
+            update(phrase_table)
+            .where(phrase_table.c.id == bindparam("b_id"))
+            .values(phrase=bindparam("b_phrase"), updated_at=now),
+            [{"b_id": phrase.id, "b_phrase": text} for phrase, text in changed],
+        )
+        for phrase, text in changed:
+            # Marca como valor já persistido para o ORM não emitir outro UPDATE
+            set_committed_value(phrase, "phrase", text)
+            set_committed_value(phrase, "updated_at", now)
+
+    if removed:
+        await db.execute(
+            delete(Phrase)
+            .where(Phrase.id.in_([phrase.id for phrase in removed]))
+            .execution_options(synchronize_session=False)
+        )
+        for phrase in removed:
+            db.expunge(phrase)
+
+    kept = [phrase for phrase in character.phrases if phrase.purpose in incoming]
+    set_committed_value(character, "phrases", kept)
+
+    if added:
+        # Inserções só ocorrem para personagens antigos com finalidades faltando;
+        # passam pelo ORM para que os IDs fiquem disponíveis na resposta
+        db.add_all(added)
+        character.phrases.extend(added)
+
+    return bool(changed or removed or added)
+
+
 @router.get("/", response_model=List[CharacterOut])
-def list_characters(db: Session = Depends(get_db)):
+async def list_characters(db: AsyncSession = Depends(get_async_read_db)):
     import logging
     import traceback
     logger = logging.getLogger(__name__)
     
     try:
-        stmt = select(Character).options(joinedload(Character.phrases)).order_by(Character.name.asc())
-        result = db.execute(stmt).unique().scalars().all()
+        stmt = select(Character).options(selectinload(Character.phrases)).order_by(Character.name.asc())
+        result = (await db.execute(stmt)).scalars().all()
         
         # Garante que todos os personagens têm phrases (mesmo que vazia)
         for character in result:
@@ -33,13 +105,13 @@ def list_characters(db: Session = Depends(get_db)):
                     character.phrases = []
             except Exception as phrase_error:
                 # Se houver erro ao acessar phrases (tabela não existe, etc), define como lista vazia
-                logger.warning(f"Erro ao carregar phrases para personagem {character.id}: {phrase_error}")
+                logger.warning("Erro ao carregar phrases para personagem %s: %s", character.id, phrase_error)
                 character.phrases = []
         
         return result
     except Exception as e:
         error_trace = traceback.format_exc()
-        logger.error(f"Erro ao listar personagens: {e}\n{error_trace}")
+        logger.error("Erro ao listar personagens: %s\n%s", e, error_trace)
         
         # Verifica se o erro é relacionado à estrutura do banco
         error_msg = str(e).lower()
@@ -55,32 +127,44 @@ def list_characters(db: Session = Depends(get_db)):
         )
 
 
+# Declarada antes de /{character_id} para que "search" não seja lido como id
+@router.get("/search", response_model=CharacterSearchPage)
+async def search_characters_route(
+    q: str = Query(..., min_length=1, max_length=100, description="Termos da busca"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Busca personagens por nome, descrição, quem é e falas, em ordem de relevância."""
+    total, items = await search_characters(db, q, limit, offset)
+    return CharacterSearchPage(total=total, limit=limit, offset=offset, items=items)
+
+
 @router.get("/{character_id}", response_model=CharacterOut)
-def get_character(character_id: int, db: Session = Depends(get_db)):
-    character = db.execute(
-        select(Character).options(joinedload(Character.phrases)).where(Character.id == character_id)
-    ).unique().scalar_one_or_none()
+async def get_character(character_id: int, use_replica: bool = Depends(get_read_preference)):
+    # Requisições simultâneas para o mesmo personagem compartilham a consulta
+    character = await load_character(character_id, use_replica)
     if not character:
         raise HTTPException(status_code=404, detail="Personagem não encontrado.")
     return character
 
 
 @router.post("/", response_model=CharacterOut, status_code=status.HTTP_201_CREATED)
-def create_character(payload: CharacterCreate, db: Session = Depends(get_db)):
+async def create_character(payload: CharacterCreate, db: AsyncSession = Depends(get_async_write_db)):
     import logging
     logger = logging.getLogger(__name__)
     
     # Log do payload recebido para debug
     try:
-        logger.info(f"📥 Payload recebido: name={payload.name}, phrases_count={len(payload.phrases) if payload.phrases else 0}")
+        logger.info("📥 Payload recebido: name=%s, phrases_count=%s", payload.name, len(payload.phrases) if payload.phrases else 0)
     except Exception as e:
-        logger.error(f"❌ Erro ao processar payload: {e}")
+        logger.error("❌ Erro ao processar payload: %s", e)
         raise
     
-    # Valida se nome já existe
-    existing = db.execute(
-        select(Character).where(Character.name == payload.name)
-    ).scalar_one_or_none()
+    # Valida se nome já existe; a mesma consulta traz o relógio do banco (func.now())
+    existing, now = (await db.execute(
+        select(select(Character.id).where(Character.name == payload.name).scalar_subquery(), func.now())
+    )).one()
     if existing:
         raise HTTPException(status_code=400, detail="Nome já está em uso.")
     
@@ -117,42 +201,51 @@ def create_character(payload: CharacterCreate, db: Session = Depends(get_db)):
             detail=f"Finalidades inválidas: {', '.join(invalid_purposes)}. Finalidades válidas: {', '.join(AVAILABLE_PURPOSES)}"
         )
 
-    # Cria o personagem
+    # Cria o personagem com as falas. Os timestamps vêm do func.now() lido acima
+    # (o relógio do banco) e não do server_default, para que a resposta saia do
+    # estado em sessão (lazy loads não funcionam em asyncio)
     character_data = payload.model_dump(exclude={"phrases"})
-    character = Character(**character_data)
-    db.add(character)
-    db.flush()  # Para obter o ID do personagem
-    
-    # Cria as falas
-    for phrase_data in payload.phrases:
-        phrase = Phrase(
-            character_id=character.id,
+    character = Character(**character_data, created_at=now, updated_at=now)
+    character.phrases = [
+        Phrase(
             phrase=phrase_data.phrase,
-            purpose=phrase_data.purpose
+            purpose=phrase_data.purpose,
+            created_at=now,
+            updated_at=now,
         )
-        db.add(phrase)
-    
-    db.commit()
-    db.refresh(character)
-    # Carrega as phrases para retornar
-    db.refresh(character, ["phrases"])
-    return character
+        for phrase_data in payload.phrases
+    ]
+    db.add(character)
+    await db.flush()  # Para obter os IDs do personagem e das falas
+
+    response = CharacterOut.model_validate(character)
+    await db.commit()
+    # Avisa os caches deste e dos demais workers
+    await invalidation_bus.publish(response.id)
+    return response
 
 
 @router.put("/{character_id}", response_model=CharacterOut)
-def update_character(
-    character_id: int, payload: CharacterUpdate, db: Session = Depends(get_db)
+async def update_character(
+    character_id: int, payload: CharacterUpdate, db: AsyncSession = Depends(get_async_write_db)
 ):
-    character = db.execute(
-        select(Character).options(joinedload(Character.phrases)).where(Character.id == character_id)
-    ).unique().scalar_one_or_none()
-    if not character:
+    # O relógio do banco (func.now(), o mesmo dos defaults de inserção) vem na
+    # mesma consulta: o updated_at gravado segue o relógio que o polling de
+    # invalidação (max(updated_at)) compara, sem um SELECT a mais
+    row = (await db.execute(
+        select(Character, func.now()).options(selectinload(Character.phrases)).where(Character.id == character_id)
+    )).one_or_none()
+    if not row:
         raise HTTPException(status_code=404, detail="Personagem não encontrado.")
+    character, now = row
+    changed = False
 
     # Atualiza dados do personagem (exceto phrases)
     data = payload.model_dump(exclude_unset=True, exclude={"phrases"})
     for key, value in data.items():
-        setattr(character, key, value)
+        if getattr(character, key) != value:
+            setattr(character, key, value)
+            changed = True
     
     # Se phrases foram fornecidas, atualiza
     if payload.phrases is not None:
@@ -181,47 +274,41 @@ def update_character(
                 detail=f"Faltam as seguintes finalidades: {', '.join(missing)}"
             )
         
-        # Remove todas as phrases antigas
-        # Cria uma cópia da lista para evitar problemas durante a iteração
-        old_phrases = list(character.phrases)
-        for old_phrase in old_phrases:
-            db.delete(old_phrase)
-        db.flush()  # Garante que as deletes foram processadas
-        
-        # Cria novas phrases
-        for phrase_data in payload.phrases:
-            phrase = Phrase(
-                character_id=character.id,
-                phrase=phrase_data.phrase,
-                purpose=phrase_data.purpose
-            )
-            db.add(phrase)
-
-    # Não precisa fazer db.add(character) novamente, pois já está na sessão
-    db.commit()
-    # Recarrega o character com as novas phrases
-    db.refresh(character)
-    # Força o reload das phrases
-    character = db.execute(
-        select(Character).options(joinedload(Character.phrases)).where(Character.id == character_id)
-    ).unique().scalar_one()
-    return character
+        if await _apply_phrase_diff(db, character, payload.phrases, now):
+            changed = True
+
+    if changed:
+        # Valor do func.now() lido acima (o mesmo relógio do onupdate) para que
+        # o estado em sessão continue completo e a resposta dispense o reload.
+        # flag_modified: numa edição no mesmo segundo da anterior o valor é
+        # igual ao gravado; sem ele o ORM tiraria a coluna do SET, o onupdate
+        # dispararia e o atributo expirado quebraria a resposta (lazy load)
+        character.updated_at = now
+        flag_modified(character, "updated_at")
+
+    await db.flush()
+    response = CharacterOut.model_validate(character)
+    await db.commit()
+    # Avisa os caches deste e dos demais workers
+    await invalidation_bus.publish(response.id)
+    return response
 
 
 @router.delete("/{character_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_character(character_id: int, db: Session = Depends(get_db)):
-    character = db.get(Character, character_id)
+async def delete_character(character_id: int, db: AsyncSession = Depends(get_async_write_db)):
+    character = await db.get(Character, character_id)
     if not character:
         raise HTTPException(status_code=404, detail="Personagem não encontrado.")
 
-    total = db.scalar(select(func.count()).select_from(Character))
+    total = await db.scalar(select(func.count()).select_from(Character))
     if total is not None and total <= 1:
         raise HTTPException(
             status_code=400,
             detail="Não é possível remover todos os personagens. Pelo menos um deve permanecer.",
         )
 
-    db.delete(character)
-    db.commit()
+    await db.delete(character)
+    await db.commit()
+    await invalidation_bus.publish(character_id)
     return None
 
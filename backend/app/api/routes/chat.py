@@ -1,18 +1,120 @@
-from typing import List, Optional
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import time
+from collections import deque
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.orm import Session, joinedload
-from openai import OpenAI
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-from app.database import get_db
-from app.models.character import Character
+from app.database import get_read_preference
+from app.core import metrics
+from app.core.admission import AdmissionRejected, ConcurrencyLimiter, TokenBucketLimiter
+from app.core.clients import get_rate_limit_key
 from app.core.config import settings
+from app.core.disk_cache import cache_key, disk_cache
+from app.core.deadline import (
+    DEADLINE_HEADER,
+    ClientDisconnected,
+    DeadlineExceeded,
+    cancel_on_disconnect,
+    resolve_budget,
+    start_deadline,
+    within_deadline,
+)
 from app.core.guardrails import get_guardrails, ModerationLevel
+from app.core.idempotency import IdempotencyConflict, IdempotencyStore
+from app.core.model_routing import ChatRoute, RoutingPolicy
+from app.core.openai_transport import CircuitBreaker, CircuitOpenError, OpenAITransport
+from app.core.profiling import profiled
+from app.core.query_stats import query_stats_snapshot
+from app.core.tracing import current_span, set_attributes, span
+from app.core.singleflight import SingleFlight
+from app.schemas.character import CharacterOut
+from app.services.characters import load_character, load_characters
+from app.services.invalidation import invalidation_bus, reaches_all_workers
+from app.services.ledger import usage_ledger
+from app.services.summaries import create_summarizer
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+# Linhas [PERF] de cada etapa: logger próprio para poderem ser amostradas (LOG_SAMPLE_RATES)
+perf_logger = logging.getLogger("app.perf")
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
+# Código não padronizado (nginx) para requisições abandonadas pelo cliente
+CLIENT_CLOSED_REQUEST = 499
+
+# Limita as chamadas simultâneas à OpenAI (com fila limitada) e o ritmo por cliente
+chat_admission = ConcurrencyLimiter(
+    max_concurrent=settings.chat_max_concurrency,
+    max_queue=settings.chat_max_queue,
+    queue_timeout=settings.chat_queue_timeout_seconds,
+)
+chat_rate_limiter = TokenBucketLimiter(
+    rate=settings.chat_rate_limit_per_minute / 60,
+    burst=settings.chat_rate_limit_burst,
+)
+metrics.register_collector("chat_admission", chat_admission.snapshot)
+metrics.register_collector("chat_rate_limit", chat_rate_limiter.snapshot)
+
+chat_flight = SingleFlight()
+metrics.register_collector("singleflight.chat", chat_flight.snapshot)
+
+chat_idempotency = IdempotencyStore(
+    max_entries=settings.chat_idempotency_max_entries,
+    ttl_seconds=settings.chat_idempotency_ttl_seconds,
+)
+metrics.register_collector("chat_idempotency", chat_idempotency.snapshot)
+
+# Retry com backoff, hedge opcional e circuit breaker em volta da OpenAI
+openai_transport = OpenAITransport(
+    max_attempts=settings.openai_max_attempts,
+    backoff_base=settings.openai_backoff_base_seconds,
+    backoff_max=settings.openai_backoff_max_seconds,
+    hedge_enabled=settings.openai_hedge_enabled,
+    hedge_percentile=settings.openai_hedge_percentile,
+    hedge_min_samples=settings.openai_hedge_min_samples,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.openai_breaker_failure_threshold,
+        reset_timeout=settings.openai_breaker_reset_seconds,
+    ),
+)
+metrics.register_collector("openai_transport", openai_transport.snapshot)
+# Os resumos do histórico têm transporte (e circuito) próprio: falhas ao resumir
+# não abrem o circuito do chat, nem as latências deles disparam hedge no chat
+summary_transport = OpenAITransport(
+    max_attempts=settings.openai_max_attempts,
+    backoff_base=settings.openai_backoff_base_seconds,
+    backoff_max=settings.openai_backoff_max_seconds,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.openai_breaker_failure_threshold,
+        reset_timeout=settings.openai_breaker_reset_seconds,
+    ),
+)
+metrics.register_collector("openai_transport_resumo", summary_transport.snapshot)
+
+routing_policy = RoutingPolicy(settings)
+
 
 class ChatMessage(BaseModel):
     message: str
@@ -26,72 +128,596 @@ class ChatResponse(BaseModel):
     debug_performance: Optional[dict] = None
 
 
+class GroupChatMessage(BaseModel):
+    message: str
+    character_ids: List[int] = Field(..., min_length=1)
+    conversation_history: List[dict] = []
+
+
+class GroupChatReply(BaseModel):
+    character_id: int
+    character_name: str
+    response: Optional[str] = None
+    # Falha isolada de um personagem não derruba as respostas dos demais
+    error: Optional[str] = None
+    status_code: int = 200
+    debug_performance: Optional[dict] = None
+
+
+class GroupChatResponse(BaseModel):
+    replies: List[GroupChatReply]
+    debug_performance: Optional[dict] = None
+
+
+def _unavailable_response(character: CharacterOut) -> str:
+    """Fala segura do personagem para quando a OpenAI está indisponível."""
+    if character.name.lower() == "mario":
+        return (
+            "Mamma mia! Estou sem fôlego depois dessa fase... "
+            "Fala comigo de novo daqui a pouquinho! It's-a me, Mario! 🍄"
+        )
+    safe_response = "Preciso de um instante para recuperar o fôlego. Fala comigo de novo daqui a pouco!"
+    if character.catchphrase:
+        return f"{character.catchphrase} {safe_response}"
+    return safe_response
+
+
+def _chat_flight_key(payload: ChatMessage) -> tuple:
+    """Chave de coalescência: personagem, hash do histórico e mensagem."""
+    history_hash = hashlib.sha256(
+        json.dumps(payload.conversation_history, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    return (payload.character_id, history_hash, payload.message)
+
+
+@lru_cache(maxsize=1)
+def _openai_client(api_key: str) -> "AsyncOpenAI":
+    # O SDK (~0,5 s de import) é importado no primeiro uso ou no warm_up do startup
+    from openai import AsyncOpenAI
+
+    # Reaproveita o cliente (e o pool HTTP) entre requisições. Os retries ficam
+    # a cargo do openai_transport, por isso o retry interno do SDK é desligado
+    return AsyncOpenAI(api_key=api_key, max_retries=0)
+
+
 def get_openai_client():
     if not settings.openai_api_key:
         raise HTTPException(
             status_code=500,
             detail="OpenAI API key não configurada. Configure OPENAI_API_KEY no ambiente."
         )
-    return OpenAI(api_key=settings.openai_api_key)
+    return _openai_client(settings.openai_api_key)
+
+
+async def _summary_completion(character_id: int, messages: List[dict], model: str, max_tokens: int) -> str:
+    """
+    Chamada à OpenAI usada pelo resumo do histórico (fora da requisição).
+
+    Os tokens entram no registro de uso no canal "resumo", sem transcrição.
+    """
+    step_start = time.time()
+    response = await summary_transport.create(
+        get_openai_client(), model=model, messages=messages, temperature=0.3, max_tokens=max_tokens
+    )
+    openai_ms = round((time.time() - step_start) * 1000, 2)
+    perf_data = {"rota": {"name": "resumo", "model": model}, "openai_ms": openai_ms, "total_ms": openai_ms}
+    if response.usage is not None:
+        perf_data["tokens_prompt"] = response.usage.prompt_tokens
+        perf_data["tokens_resposta"] = response.usage.completion_tokens
+    usage_ledger.record(character_id, "resumo", perf_data, _moderation_outcome(perf_data))
+    return response.choices[0].message.content or ""
+
+
+# Resumo do histórico antigo em conversas longas (CHAT_SUMMARY_ENABLED)
+conversation_summarizer = create_summarizer(_summary_completion)
 
 
 @router.post("/", response_model=ChatResponse)
-def chat(payload: ChatMessage, db: Session = Depends(get_db)):
-    """Envia uma mensagem para o personagem e retorna a resposta."""
-    import time
-    import logging
-    
-    logger = logging.getLogger(__name__)
+async def chat(
+    payload: ChatMessage,
+    request: Request,
+    response: Response,
+    use_replica: bool = Depends(get_read_preference),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=255),
+    deadline_ms: Optional[str] = Header(default=None, alias=DEADLINE_HEADER),
+):
+    """
+    Envia uma mensagem para o personagem e retorna a resposta.
+
+    O processamento é interrompido quando o prazo da requisição acaba (504) ou
+    quando o cliente desconecta.
+    """
+    start_deadline(resolve_budget(deadline_ms, settings.chat_request_timeout_seconds))
+    with span("chat", {
+        "chat.character_id": payload.character_id,
+        "chat.message_chars": len(payload.message),
+        "chat.history_messages": len(payload.conversation_history),
+        "chat.idempotency_key": bool(idempotency_key),
+    }) as chat_span:
+        try:
+            return await cancel_on_disconnect(
+                request, _chat(payload, request, response, use_replica, idempotency_key)
+            )
+        except DeadlineExceeded as e:
+            chat_span.set_attribute("chat.deadline_stage", e.stage)
+            raise _deadline_http_error(e)
+        except ClientDisconnected:
+            # Sem Idempotency-Key a geração é cancelada junto; com a chave ela segue
+            # (limitada pelo prazo) para que a nova tentativa do cliente a aproveite
+            chat_span.set_attribute("chat.client_disconnected", True)
+            logger.info("Cliente desconectou antes da resposta do chat")
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+async def _chat(
+    payload: ChatMessage,
+    request: Request,
+    response: Response,
+    use_replica: bool,
+    idempotency_key: Optional[str],
+) -> ChatResponse:
+    if not idempotency_key:
+        return await _chat_turn(payload, request, use_replica)
+
+    # Uma nova tentativa do mesmo turno (mesma chave) se junta à geração em
+    # andamento ou recebe a resposta já pronta, sem nova chamada à OpenAI.
+    # A impressão digital cobre o payload inteiro (personagem, histórico e
+    # mensagem): a mesma chave com outro histórico é recusada. As chaves valem
+    # por cliente e o store é por worker: uma nova tentativa atendida por outro
+    # worker do gunicorn gera uma nova resposta
+    fingerprint = hashlib.sha256(
+        json.dumps(_chat_flight_key(payload), ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    scoped_key = f"{get_rate_limit_key(request)}:{idempotency_key}"
+    try:
+        result, reused = await chat_idempotency.run(
+            scoped_key, fingerprint, lambda: _chat_turn(payload, request, use_replica)
+        )
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key já utilizada com outra mensagem ou outro histórico.",
+        )
+    if reused:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+def _check_rate_limit(request: Request) -> None:
+    """Aplica o rate limit por cliente (429 com Retry-After quando excedido)."""
+    retry_after = chat_rate_limiter.check(get_rate_limit_key(request))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas mensagens em sequência. Aguarde alguns instantes e tente novamente.",
+            headers={"Retry-After": AdmissionRejected("rate_limited", retry_after).retry_after_header},
+        )
+
+
+@router.post("/group", response_model=GroupChatResponse)
+async def group_chat(
+    payload: GroupChatMessage,
+    request: Request,
+    stream: bool = False,
+    use_replica: bool = Depends(get_read_preference),
+    deadline_ms: Optional[str] = Header(default=None, alias=DEADLINE_HEADER),
+):
+    """
+    Envia a mesma mensagem para vários personagens de uma vez.
+
+    As respostas são geradas em paralelo, então o tempo total é o da resposta
+    mais lenta. Com ?stream=true cada resposta é enviada (NDJSON, uma por
+    linha) assim que fica pronta.
+    """
+    start_time = time.time()
+    perf_data = {}
+    start_deadline(resolve_budget(deadline_ms, settings.chat_request_timeout_seconds))
+
+    # Mantém a ordem pedida e ignora ids repetidos
+    character_ids = list(dict.fromkeys(payload.character_ids))
+    if len(character_ids) > settings.chat_group_max_characters:
+        raise HTTPException(
+            status_code=400,
+            detail=f"O chat em grupo aceita no máximo {settings.chat_group_max_characters} personagens."
+        )
+
+    # Uma mensagem em grupo conta como uma única mensagem no rate limit; o
+    # paralelismo das chamadas à OpenAI continua limitado por chat_admission
+    _check_rate_limit(request)
+
+    # Busca todos os personagens numa única consulta
+    step_start = time.time()
+    try:
+        characters = await within_deadline(load_characters(character_ids, use_replica), "banco")
+        missing = [str(character_id) for character_id in character_ids if character_id not in characters]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Personagens não encontrados: {', '.join(missing)}")
+        perf_data["buscar_personagens_ms"] = round((time.time() - step_start) * 1000, 2)
+
+        # A mensagem é a mesma para todos: modera uma única vez
+        input_ok = await _moderate_input(payload.message, perf_data)
+    except DeadlineExceeded as e:
+        raise _deadline_http_error(e)
+
+    tasks = [
+        asyncio.create_task(_group_reply(characters[character_id], payload, input_ok))
+        for character_id in character_ids
+    ]
+    if stream:
+        return StreamingResponse(_stream_replies(tasks), media_type="application/x-ndjson")
+
+    try:
+        replies = await cancel_on_disconnect(request, asyncio.gather(*tasks))
+    except ClientDisconnected:
+        logger.info("Cliente desconectou antes das respostas do chat em grupo")
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # Consultas SQL da requisição (db_queries, db_ms)
+    perf_data.update(query_stats_snapshot())
+    perf_data["total_ms"] = round((time.time() - start_time) * 1000, 2)
+    perf_logger.info(
+        "⏱️  [PERF] Chat em grupo (%s personagens): %sms", len(replies), perf_data['total_ms'],
+        extra={"perf": dict(perf_data)},
+    )
+    return GroupChatResponse(replies=replies, debug_performance=perf_data)
+
+
+async def _group_reply(character: CharacterOut, payload: GroupChatMessage, input_ok: bool) -> GroupChatReply:
+    """Gera a resposta de um personagem do grupo, capturando falhas individuais."""
+    start_time = time.time()
+    if not input_ok:
+        _record_usage("grupo", character.id, payload.message, None, {"entrada_recusada": True})
+        return GroupChatReply(
+            character_id=character.id,
+            character_name=character.name,
+            response=_input_refusal(character),
+        )
+
+    turn = ChatMessage(
+        message=payload.message,
+        character_id=character.id,
+        conversation_history=payload.conversation_history,
+    )
+    try:
+        with span("chat.group.reply", {"chat.character_id": character.id}) as reply_span:
+            reply, shared = await chat_flight.do(
+                _chat_flight_key(turn), lambda: _generate_reply(character, turn, input_moderated=True)
+            )
+            reply_span.set_attribute("chat.shared", shared)
+    except (HTTPException, DeadlineExceeded) as e:
+        error = e if isinstance(e, HTTPException) else _deadline_http_error(e)
+        return GroupChatReply(
+            character_id=character.id,
+            character_name=character.name,
+            error=str(error.detail),
+            status_code=error.status_code,
+        )
+
+    perf_data = dict(reply.debug_performance or {})
+    perf_data["compartilhada"] = shared
+    perf_data["total_ms"] = round((time.time() - start_time) * 1000, 2)
+    _record_usage("grupo", character.id, payload.message, reply.response, perf_data)
+    return GroupChatReply(
+        character_id=character.id,
+        character_name=character.name,
+        response=reply.response,
+        debug_performance=perf_data,
+    )
+
+
+async def _stream_replies(tasks: List[asyncio.Task]) -> AsyncIterator[str]:
+    """Envia cada resposta assim que fica pronta; cancela o resto se o cliente sair."""
+    try:
+        for next_reply in asyncio.as_completed(tasks):
+            reply = await next_reply
+            yield reply.model_dump_json() + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+# Com vários workers e o barramento local, a versão do personagem não muda
+# com edições feitas em outro worker: a sessão recarrega a cada mensagem
+_ws_snapshot_enabled = reaches_all_workers("Snapshot do personagem nas conexões WebSocket")
+
+
+class ChatSession:
+    """
+    Estado de uma conexão WebSocket de chat: snapshot do personagem, prompt
+    compilado e histórico recente, mantidos enquanto a conexão durar.
+    """
+
+    def __init__(self, character: CharacterOut, max_history: int, version=None):
+        self.character = character
+        self.system_prompt = _build_system_prompt(character)
+        self.history = deque(maxlen=max(0, max_history))
+        # Versão do personagem no invalidation_bus quando o snapshot foi lido
+        self.version = version if version is not None else invalidation_bus.version(character.id)
+
+    async def refresh(self, use_replica: bool) -> bool:
+        """
+        Recarrega o personagem se ele foi alterado desde o snapshot (ou
+        sempre, quando as invalidações não chegam a todos os workers).
+
+        Returns:
+            bool: False se o personagem foi excluído
+        """
+        version = invalidation_bus.version(self.character.id)
+        if version == self.version and _ws_snapshot_enabled:
+            return True
+        character = await load_character(self.character.id, use_replica)
+        if character is None:
+            return False
+        self.character = character
+        self.system_prompt = _build_system_prompt(character)
+        self.version = version
+        return True
+
+    def load_history(self, messages: list) -> None:
+        """Substitui o histórico (ex.: conversa restaurada pelo navegador)."""
+        self.history.clear()
+        for message in messages:
+            if (
+                isinstance(message, dict)
+                and message.get("role") in ("user", "assistant")
+                and isinstance(message.get("content"), str)
+            ):
+                self.history.append({"role": message["role"], "content": message["content"]})
+
+    def messages_for(self, message: str) -> List[dict]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            *self.history,
+            {"role": "user", "content": message},
+        ]
+
+    def remember(self, message: str, reply: str) -> None:
+        self.history.append({"role": "user", "content": message})
+        self.history.append({"role": "assistant", "content": reply})
+
+
+def _origin_allowed(websocket: WebSocket) -> bool:
+    # O CORSMiddleware não se aplica a WebSockets: valida a origem aqui
+    origin = websocket.headers.get("origin")
+    if not origin or "*" in settings.allowed_origins:
+        return True
+    return origin.rstrip("/") in [allowed.rstrip("/") for allowed in settings.allowed_origins]
+
+
+@router.websocket("/ws")
+async def chat_ws(websocket: WebSocket, character_id: int):
+    """
+    Canal de chat por WebSocket para um personagem.
+
+    O personagem, o prompt e o histórico recente ficam na conexão, então cada
+    turno envia apenas a mensagem nova. Eventos do cliente (JSON):
+      {"type": "message", "content": "..."}   inicia uma resposta
+      {"type": "cancel"}                       interrompe a resposta em andamento
+      {"type": "history", "messages": [...]}   restaura o histórico da conversa
+      {"type": "ping"}
+    Eventos do servidor: ready, typing, delta (trecho da resposta), done
+    (resposta final já moderada), cancelled, error e pong.
+    """
+    if not _origin_allowed(websocket):
+        await websocket.close(code=1008, reason="Origem não permitida.")
+        return
+    await websocket.accept()
+
+    version = invalidation_bus.version(character_id)
+    character = await load_character(character_id, get_read_preference(websocket))
+    if not character:
+        await websocket.send_json({"type": "error", "status_code": 404, "detail": "Personagem não encontrado."})
+        await websocket.close(code=1008)
+        return
+
+    session = ChatSession(character, max_history=settings.chat_ws_history_messages, version=version)
+    await websocket.send_json({"type": "ready", "character_id": character.id, "character_name": character.name})
+
+    generation: Optional[asyncio.Task] = None
+    try:
+        while True:
+            try:
+                event = json.loads(await websocket.receive_text())
+            except ValueError:
+                await websocket.send_json({"type": "error", "status_code": 400, "detail": "Evento inválido."})
+                continue
+            kind = event.get("type") if isinstance(event, dict) else None
+
+            if kind == "message":
+                content = event.get("content")
+                if not isinstance(content, str) or not content.strip():
+                    await websocket.send_json({"type": "error", "status_code": 400, "detail": "Mensagem vazia."})
+                elif generation is not None and not generation.done():
+                    await websocket.send_json({
+                        "type": "error",
+                        "status_code": 409,
+                        "detail": "Aguarde a resposta atual ou cancele-a antes de enviar outra mensagem.",
+                    })
+                else:
+                    generation = asyncio.create_task(_ws_turn(websocket, session, content))
+            elif kind == "cancel":
+                if generation is not None and not generation.done():
+                    generation.cancel()
+            elif kind == "history":
+                session.load_history(event.get("messages") or [])
+            elif kind == "ping":
+                await websocket.send_json({"type": "pong"})
+            else:
+                await websocket.send_json({"type": "error", "status_code": 400, "detail": "Evento inválido."})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Cliente saiu: não continua gastando tokens com uma resposta que ninguém vai ler
+        if generation is not None and not generation.done():
+            generation.cancel()
+
+
+async def _ws_turn(websocket: WebSocket, session: ChatSession, message: str) -> None:
+    """Gera uma resposta em streaming para a conexão WebSocket."""
+    character = session.character
+    start_time = time.time()
+    perf_data = {}
+    # Cada turno tem o seu prazo; a task do turno tem uma cópia própria do contexto
+    start_deadline(settings.chat_request_timeout_seconds)
+    try:
+        _check_rate_limit(websocket)
+        # Personagem editado durante a conversa: passa a usar a versão nova
+        if not await within_deadline(session.refresh(get_read_preference(websocket)), "banco"):
+            raise HTTPException(status_code=404, detail="Personagem não encontrado.")
+        character = session.character
+        await websocket.send_json({"type": "typing", "active": True})
+
+        if not await _moderate_input(message, perf_data):
+            reply = _input_refusal(character)
+            perf_data["entrada_recusada"] = True
+        else:
+            route = _choose_route(character, message, len(session.history))
+            perf_data["rota"] = route.as_debug()
+            messages = session.messages_for(message)
+            reply_key = _reply_cache_key(route, messages)
+            reply = await _cached_reply(reply_key)
+            if reply is not None:
+                # Já moderada quando foi guardada: vai inteira num único trecho
+                perf_data["cache_resposta"] = True
+                await websocket.send_json({"type": "delta", "content": reply})
+            else:
+                client = get_openai_client()
+                reply = await _stream_completion(websocket, client, route, messages, perf_data)
+
+                # A moderação de saída só é possível com a resposta completa; se ela
+                # for barrada, o evento done traz a resposta segura no lugar dos trechos
+                if settings.moderation_enabled:
+                    step_start = time.time()
+                    guardrails = get_guardrails()
+                    if not await within_deadline(
+                        run_in_threadpool(profiled(guardrails.moderate), reply, check_type="input"), "moderacao"
+                    ):
+                        reply = _output_refusal(character)
+                        perf_data["resposta_substituida"] = True
+                    perf_data["moderacao_saida_ms"] = round((time.time() - step_start) * 1000, 2)
+                if not perf_data.get("resposta_substituida"):
+                    await _store_reply(reply_key, reply)
+
+        session.remember(message, reply)
+        perf_data["total_ms"] = round((time.time() - start_time) * 1000, 2)
+        await websocket.send_json({"type": "done", "response": reply, "debug_performance": perf_data})
+        _record_usage("websocket", character.id, message, reply, perf_data)
+    except asyncio.CancelledError:
+        # Resposta parcial não entra no histórico
+        with contextlib.suppress(Exception):
+            await websocket.send_json({"type": "cancelled"})
+        raise
+    except CircuitOpenError:
+        logger.warning("Circuito da OpenAI aberto; usando resposta segura do personagem")
+        with contextlib.suppress(Exception):
+            await websocket.send_json({
+                "type": "done",
+                "response": _unavailable_response(character),
+                "debug_performance": {"circuito_aberto": True},
+            })
+    except Exception as e:
+        error = e if isinstance(e, HTTPException) else _openai_http_error(e)
+        with contextlib.suppress(Exception):
+            await websocket.send_json({"type": "error", "status_code": error.status_code, "detail": error.detail})
+    finally:
+        with contextlib.suppress(Exception):
+            await websocket.send_json({"type": "typing", "active": False})
+
+
+async def _stream_completion(
+    websocket: WebSocket, client, route: ChatRoute, messages: List[dict], perf_data: dict
+) -> str:
+    """Chama a OpenAI em modo stream e repassa cada trecho ao cliente."""
+    step_start = time.time()
+    async with chat_admission.slot():
+        perf_data["fila_openai_ms"] = round((time.time() - step_start) * 1000, 2)
+        step_start = time.time()
+        stream = await openai_transport.create(
+            client,
+            model=route.model,
+            messages=messages,
+            temperature=route.temperature,
+            max_tokens=route.max_tokens,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not parts:
+                        perf_data["primeiro_token_ms"] = round((time.time() - step_start) * 1000, 2)
+                    parts.append(chunk.choices[0].delta.content)
+                    await websocket.send_json({"type": "delta", "content": chunk.choices[0].delta.content})
+                if chunk.usage is not None:
+                    perf_data["tokens_prompt"] = chunk.usage.prompt_tokens
+                    perf_data["tokens_resposta"] = chunk.usage.completion_tokens
+        finally:
+            # Fecha a conexão HTTP do stream (inclusive ao cancelar a geração)
+            await stream.close()
+    perf_data["openai_ms"] = round((time.time() - step_start) * 1000, 2)
+    return "".join(parts)
+
+
+async def _chat_turn(payload: ChatMessage, request: Request, use_replica: bool) -> ChatResponse:
+    """Processa um turno de chat: rate limit, busca do personagem e geração."""
     start_time = time.time()
     perf_data = {}  # Armazena tempos de cada etapa
     
+    # Rate limit por cliente antes de qualquer trabalho
+    _check_rate_limit(request)
+
     # Busca personagem com suas phrases
     step_start = time.time()
-    character = db.execute(
-        select(Character).options(joinedload(Character.phrases)).where(Character.id == payload.character_id)
-    ).unique().scalar_one_or_none()
+    character = await within_deadline(load_character(payload.character_id, use_replica), "banco")
     if not character:
         raise HTTPException(status_code=404, detail="Personagem não encontrado.")
     perf_data["buscar_personagem_ms"] = round((time.time() - step_start) * 1000, 2)
-    logger.info(f"⏱️  [PERF] Buscar personagem: {perf_data['buscar_personagem_ms']}ms")
-    
-    # Validação de entrada com guardrails (apenas palavrões para performance)
-    step_start = time.time()
-    if settings.moderation_enabled:
-        guardrails = get_guardrails()
-        # Verifica apenas palavrões na entrada (toxicidade é lenta, verifica apenas na saída)
-        input_moderation = guardrails.moderate(payload.message, check_type="input")
-        perf_data["moderacao_entrada_ms"] = round((time.time() - step_start) * 1000, 2)
-        logger.info(f"⏱️  [PERF] Moderação entrada: {perf_data['moderacao_entrada_ms']}ms")
-        
-        if not input_moderation:
-            # Mensagem genérica para não expor detalhes da moderação
-            safe_response = (
-                "Desculpe, mas não posso responder a essa mensagem. "
-                "Vamos manter nossa conversa respeitosa e apropriada!"
-            )
-            
-            # Personaliza a resposta baseado no personagem se possível
-            if character.name.lower() == "mario":
-                safe_response = (
-                    "Mamma mia! Desculpe, mas não posso responder isso. "
-                    "Vamos manter nossa aventura divertida e respeitosa! It's-a me, Mario! 🍄"
-                )
-            
-            return ChatResponse(response=safe_response, debug_performance=perf_data)
-    else:
-        perf_data["moderacao_entrada_ms"] = 0
-        logger.info(f"⏱️  [PERF] Moderação desabilitada")
-    
-    # Prepara cliente OpenAI
-    step_start = time.time()
-    client = get_openai_client()
-    perf_data["criar_cliente_openai_ms"] = round((time.time() - step_start) * 1000, 2)
-    logger.info(f"⏱️  [PERF] Criar cliente OpenAI: {perf_data['criar_cliente_openai_ms']}ms")
-    
-    # Gera o prompt do sistema em tempo real
-    step_start = time.time()
+    perf_logger.info("⏱️  [PERF] Buscar personagem: %sms", perf_data['buscar_personagem_ms'])
     
+    # Mensagens idênticas concorrentes (reenvio, duplo clique) compartilham a
+    # mesma moderação e a mesma chamada à OpenAI
+    reply, shared = await chat_flight.do(
+        _chat_flight_key(payload), lambda: _generate_reply(character, payload)
+    )
+    perf_data.update(reply.debug_performance or {})
+    perf_data["compartilhada"] = shared
+    current_span().set_attribute("chat.shared", shared)
+    # Consultas SQL da requisição (db_queries, db_ms)
+    perf_data.update(query_stats_snapshot())
+
+    total_time = (time.time() - start_time) * 1000
+    perf_data["total_ms"] = round(total_time, 2)
+    perf_data["total_s"] = round(total_time / 1000, 2)
+    # Registro estruturado com todas as etapas (campo "perf" no JSON)
+    perf_logger.info(
+        "⏱️  [PERF] Total: %sms (%ss)", perf_data['total_ms'], perf_data['total_s'],
+        extra={"perf": dict(perf_data)},
+    )
+    _record_usage("http", character.id, payload.message, reply.response, perf_data)
+
+    return ChatResponse(response=reply.response, debug_performance=perf_data)
+
+
+def _output_refusal(character: CharacterOut) -> str:
+    """Resposta segura para quando a resposta gerada é barrada pela moderação."""
+    # Personaliza baseado no personagem
+    if character.name.lower() == "mario":
+        return (
+            "Mamma mia! Deixa eu pensar melhor sobre isso... "
+            "Vamos falar de algo mais divertido! It's-a me, Mario! 🍄"
+        )
+    return (
+        "Desculpe, mas não consigo formular uma resposta apropriada no momento. "
+        "Vamos mudar de assunto?"
+    )
+
+
+def _build_system_prompt(character: CharacterOut) -> str:
+    """Monta o prompt do sistema a partir das falas e traços do personagem."""
     # Monta a lista de falas formatadas
     phrases_list = []
     for phrase in character.phrases:
@@ -101,42 +727,183 @@ def chat(payload: ChatMessage, db: Session = Depends(get_db)):
     # Formata os traços de personalidade
     traits_text = ", ".join(character.personality_traits) if character.personality_traits else "carismático"
     
-    # Gera o prompt do sistema
-    system_prompt = f"""Você é o {character.name}, {character.who_is_character}.
+    return f"""Você é o {character.name}, {character.who_is_character}.
 Você tem a personalidade {traits_text} e utiliza falas como:
 {phrases_text}
 
 Fale em português brasileiro, mas mantenha algumas expressões características do personagem. Seja amigável, divertido e mantenha o espírito do personagem. Use emojis ocasionalmente para dar mais vida à conversa! 🍄⭐"""
+
+
+def _choose_route(character: CharacterOut, message: str, history_depth: int) -> ChatRoute:
+    overrides = character.chat_settings.model_dump(exclude_none=True) if character.chat_settings else None
+    return routing_policy.choose(message, history_depth, overrides)
+
+
+def _reply_cache_key(route: ChatRoute, messages: List[dict]) -> Optional[str]:
+    """Chave do cache de respostas: mesma conversa com o mesmo modelo e parâmetros."""
+    if settings.chat_response_cache_ttl_seconds <= 0 or not disk_cache.enabled:
+        return None
+    return cache_key("resposta", route.model, route.temperature, route.max_tokens, messages)
+
+
+async def _cached_reply(key: Optional[str]) -> Optional[str]:
+    if key is None:
+        return None
+    return await run_in_threadpool(disk_cache.get, key)
+
+
+async def _store_reply(key: Optional[str], reply: str) -> None:
+    # Só respostas já aprovadas pela moderação de saída entram no cache
+    if key is not None and reply:
+        await run_in_threadpool(disk_cache.set, key, reply, settings.chat_response_cache_ttl_seconds)
+
+
+def _moderation_outcome(perf_data: dict) -> str:
+    if perf_data.get("entrada_recusada"):
+        return "entrada_bloqueada"
+    if perf_data.get("resposta_substituida"):
+        return "saida_bloqueada"
+    return "aprovada" if settings.moderation_enabled else "desabilitada"
+
+
+def _record_usage(
+    channel: str, character_id: int, message: str, reply: Optional[str], perf_data: dict
+) -> None:
+    """Enfileira o uso e a transcrição do turno no registro de uso (não bloqueia a resposta)."""
+    usage_ledger.record(
+        character_id,
+        channel,
+        perf_data,
+        _moderation_outcome(perf_data),
+        [("user", message), ("assistant", reply)],
+    )
+
+
+async def _moderate_input(message: str, perf_data: dict) -> bool:
+    """Modera a mensagem do usuário; retorna False se ela deve ser recusada."""
+    step_start = time.time()
+    if not settings.moderation_enabled:
+        perf_data["moderacao_entrada_ms"] = 0
+        perf_logger.info("⏱️  [PERF] Moderação desabilitada")
+        return True
+
+    # A moderação é síncrona (e a primeira chamada pode carregar o modelo):
+    # roda no threadpool para não bloquear o event loop
+    guardrails = await within_deadline(run_in_threadpool(profiled(get_guardrails)), "moderacao")
+    # Verifica apenas palavrões na entrada (toxicidade é lenta, verifica apenas na saída)
+    input_moderation = await within_deadline(
+        run_in_threadpool(profiled(guardrails.moderate), message, check_type="input"), "moderacao"
+    )
+    perf_data["moderacao_entrada_ms"] = round((time.time() - step_start) * 1000, 2)
+    perf_logger.info("⏱️  [PERF] Moderação entrada: %sms", perf_data['moderacao_entrada_ms'])
+    return bool(input_moderation)
+
+
+def _input_refusal(character: CharacterOut) -> str:
+    """Resposta segura para mensagens recusadas pela moderação de entrada."""
+    # Personaliza a resposta baseado no personagem se possível
+    if character.name.lower() == "mario":
+        return (
+            "Mamma mia! Desculpe, mas não posso responder isso. "
+            "Vamos manter nossa aventura divertida e respeitosa! It's-a me, Mario! 🍄"
+        )
+    # Mensagem genérica para não expor detalhes da moderação
+    return (
+        "Desculpe, mas não posso responder a essa mensagem. "
+        "Vamos manter nossa conversa respeitosa e apropriada!"
+    )
+
+
+async def _generate_reply(
+    character: CharacterOut, payload: ChatMessage, input_moderated: bool = False
+) -> ChatResponse:
+    """
+    Modera a mensagem, chama a OpenAI e modera a resposta.
+    Executada uma única vez por grupo de requisições idênticas (ver chat_flight).
+    """
+    perf_data = {}
+
+    # Validação de entrada com guardrails (apenas palavrões para performance).
+    # No chat em grupo a mensagem já foi moderada uma vez para todos
+    if not input_moderated and not await _moderate_input(payload.message, perf_data):
+        current_span().set_attribute("chat.input_refused", True)
+        perf_data["entrada_recusada"] = True
+        return ChatResponse(response=_input_refusal(character), debug_performance=perf_data)
+    
+    # Prepara cliente OpenAI
+    step_start = time.time()
+    client = get_openai_client()
+    perf_data["criar_cliente_openai_ms"] = round((time.time() - step_start) * 1000, 2)
+    perf_logger.info("⏱️  [PERF] Criar cliente OpenAI: %sms", perf_data['criar_cliente_openai_ms'])
+    
+    # Gera o prompt do sistema em tempo real
+    step_start = time.time()
+    
+    system_prompt = _build_system_prompt(character)
     
     # Monta o histórico de mensagens
     messages = [
         {"role": "system", "content": system_prompt}
     ]
     
-    # Adiciona histórico da conversa
-    messages.extend(payload.conversation_history)
+    # Adiciona histórico da conversa (em conversas longas, o começo vira um resumo)
+    messages.extend(await conversation_summarizer.compact(character, payload.conversation_history, perf_data))
     
     # Adiciona a mensagem atual do usuário
     messages.append({"role": "user", "content": payload.message})
     perf_data["preparar_mensagens_ms"] = round((time.time() - step_start) * 1000, 2)
-    logger.info(f"⏱️  [PERF] Preparar mensagens: {perf_data['preparar_mensagens_ms']}ms")
+    perf_logger.info("⏱️  [PERF] Preparar mensagens: %sms", perf_data['preparar_mensagens_ms'])
+    
+    # Escolhe modelo e max_tokens conforme o tamanho da conversa e os ajustes do personagem
+    route = _choose_route(character, payload.message, len(payload.conversation_history))
+    perf_data["rota"] = route.as_debug()
+    set_attributes(current_span(), {"chat.route": route.name, "chat.model": route.model})
+    
+    # Resposta da mesma conversa gerada antes (por qualquer worker, inclusive
+    # antes de um reinício): evita uma nova chamada à OpenAI
+    reply_key = _reply_cache_key(route, messages)
+    cached_reply = await _cached_reply(reply_key)
+    if cached_reply is not None:
+        perf_data["cache_resposta"] = True
+        current_span().set_attribute("chat.response_cached", True)
+        return ChatResponse(response=cached_reply, debug_performance=perf_data)
     
     try:
-        # Chama OpenAI
+        # Aguarda uma vaga no limitador de concorrência (fila limitada)
         step_start = time.time()
-        logger.info(f"⏱️  [PERF] Iniciando chamada OpenAI...")
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.8,
-            max_tokens=2000  # Aumentado para permitir respostas mais completas
-        )
+        async with chat_admission.slot():
+            perf_data["fila_openai_ms"] = round((time.time() - step_start) * 1000, 2)
+
+            # Chama OpenAI
+            step_start = time.time()
+            perf_logger.info("⏱️  [PERF] Iniciando chamada OpenAI...")
+            with span("openai.chat.completions", {
+                "gen_ai.system": "openai",
+                "gen_ai.request.model": route.model,
+                "gen_ai.request.max_tokens": route.max_tokens,
+                "gen_ai.request.temperature": route.temperature,
+            }, kind="client") as openai_span:
+                response = await openai_transport.create(
+                    client,
+                    model=route.model,
+                    messages=messages,
+                    temperature=route.temperature,
+                    max_tokens=route.max_tokens,
+                )
+                if response.usage is not None:
+                    set_attributes(openai_span, {
+                        "gen_ai.usage.input_tokens": response.usage.prompt_tokens,
+                        "gen_ai.usage.output_tokens": response.usage.completion_tokens,
+                    })
         openai_time = (time.time() - step_start) * 1000
         perf_data["openai_ms"] = round(openai_time, 2)
         perf_data["openai_s"] = round(openai_time / 1000, 2)
-        logger.info(f"⏱️  [PERF] OpenAI respondeu: {perf_data['openai_ms']}ms ({perf_data['openai_s']}s)")
+        perf_logger.info("⏱️  [PERF] OpenAI respondeu: %sms (%ss)", perf_data['openai_ms'], perf_data['openai_s'])
         
         assistant_message = response.choices[0].message.content
+        if response.usage is not None:
+            perf_data["tokens_prompt"] = response.usage.prompt_tokens
+            perf_data["tokens_resposta"] = response.usage.completion_tokens
         
         # Validação de saída com guardrails (apenas palavrões para performance)
         step_start = time.time()
@@ -145,54 +912,97 @@ Fale em português brasileiro, mas mantenha algumas expressões características
         if settings.moderation_enabled:
             guardrails = get_guardrails()
             # Verifica apenas palavrões na saída (rápido)
-            output_moderation = guardrails.moderate(assistant_message, check_type="input")
+            output_moderation = await within_deadline(
+                run_in_threadpool(profiled(guardrails.moderate), assistant_message, check_type="input"), "moderacao"
+            )
             perf_data["moderacao_saida_ms"] = round((time.time() - step_start) * 1000, 2)
-            logger.info(f"⏱️  [PERF] Moderação saída: {perf_data['moderacao_saida_ms']}ms")
+            perf_logger.info("⏱️  [PERF] Moderação saída: %sms", perf_data['moderacao_saida_ms'])
             
             if not output_moderation:
                 # Se a resposta do assistente for inadequada, retorna mensagem segura
-                safe_response = (
-                    "Desculpe, mas não consigo formular uma resposta apropriada no momento. "
-                    "Vamos mudar de assunto?"
-                )
-                
-                # Personaliza baseado no personagem
-                if character.name.lower() == "mario":
-                    safe_response = (
-                        "Mamma mia! Deixa eu pensar melhor sobre isso... "
-                        "Vamos falar de algo mais divertido! It's-a me, Mario! 🍄"
-                    )
-                
-                perf_data["total_ms"] = round((time.time() - start_time) * 1000, 2)
-                perf_data["total_s"] = round(perf_data["total_ms"] / 1000, 2)
-                return ChatResponse(response=safe_response, debug_performance=perf_data)
+                current_span().set_attribute("chat.output_replaced", True)
+                perf_data["resposta_substituida"] = True
+                return ChatResponse(response=_output_refusal(character), debug_performance=perf_data)
         else:
             perf_data["moderacao_saida_ms"] = 0
-            logger.info(f"⏱️  [PERF] Moderação saída desabilitada")
-        
-        total_time = (time.time() - start_time) * 1000
-        perf_data["total_ms"] = round(total_time, 2)
-        perf_data["total_s"] = round(total_time / 1000, 2)
-        logger.info(f"⏱️  [PERF] Total: {perf_data['total_ms']}ms ({perf_data['total_s']}s)")
+            perf_logger.info("⏱️  [PERF] Moderação saída desabilitada")
         
+        await _store_reply(reply_key, assistant_message)
         return ChatResponse(response=assistant_message, debug_performance=perf_data)
     
+    except CircuitOpenError:
+        # OpenAI degradada: responde na hora com a fala segura do personagem
+        logger.warning("Circuito da OpenAI aberto; usando resposta segura do personagem")
+        perf_data["circuito_aberto"] = True
+        current_span().set_attribute("chat.circuit_open", True)
+        return ChatResponse(response=_unavailable_response(character), debug_performance=perf_data)
+
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Erro ao comunicar com a API da OpenAI: {str(e)}", exc_info=True)
-        
-        # Mensagem de erro mais amigável
-        error_detail = str(e)
-        if "api_key" in error_detail.lower() or "authentication" in error_detail.lower():
-            error_detail = "Chave da API da OpenAI inválida ou não configurada"
-        elif "rate limit" in error_detail.lower():
-            error_detail = "Limite de requisições excedido. Tente novamente em alguns instantes."
-        elif "timeout" in error_detail.lower():
-            error_detail = "Tempo de resposta excedido. Tente novamente."
-        
-        raise HTTPException(
+        raise _openai_http_error(e)
+
+
+def _deadline_http_error(e: DeadlineExceeded) -> HTTPException:
+    logger.warning("Prazo da requisição de chat excedido na etapa '%s'", e.stage)
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="Erro ao processar mensagem: Tempo limite da requisição excedido. Tente novamente.",
+    )
+
+
+def _openai_http_error(e: Exception) -> HTTPException:
+    """Converte falhas da chamada à OpenAI (ou da fila de admissão) em HTTPException."""
+    from openai import (
+        APIConnectionError,
+        APITimeoutError,
+        AuthenticationError,
+        InternalServerError,
+        RateLimitError,
+    )
+
+    if isinstance(e, DeadlineExceeded):
+        return _deadline_http_error(e)
+
+    if isinstance(e, AdmissionRejected):
+        # Fila cheia ou espera excedida: falha rápido em vez de acumular requisições
+        logger.warning("Chat recusado pelo controle de admissão (%s)", e.reason)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado no momento. Tente novamente em alguns instantes.",
+            headers={"Retry-After": e.retry_after_header},
+        )
+
+    if isinstance(e, RateLimitError):
+        logger.warning("Rate limit da OpenAI atingido: %s", e)
+        retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Limite de requisições excedido. Tente novamente em alguns instantes.",
+            headers={"Retry-After": retry_after or "1"},
+        )
+
+    if isinstance(e, AuthenticationError):
+        logger.error("Erro de autenticação na OpenAI: %s", e)
+        return HTTPException(
             status_code=500,
-            detail=f"Erro ao processar mensagem: {error_detail}"
+            detail="Erro ao processar mensagem: Chave da API da OpenAI inválida ou não configurada"
+        )
+
+    if isinstance(e, APITimeoutError):
+        logger.error("Timeout na OpenAI após %s tentativas: %s", openai_transport.max_attempts, e)
+        return HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Erro ao processar mensagem: Tempo de resposta excedido. Tente novamente."
+        )
+
+    if isinstance(e, (APIConnectionError, InternalServerError)):
+        logger.error("OpenAI indisponível após %s tentativas: %s", openai_transport.max_attempts, e)
+        return HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Erro ao processar mensagem: Serviço da OpenAI indisponível. Tente novamente."
         )
 
+    logger.error("Erro ao comunicar com a API da OpenAI: %s", e, exc_info=True)
+    return HTTPException(
+        status_code=500,
+        detail=f"Erro ao processar mensagem: {str(e)}"
+    )
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.routes.admin import require_admin
+from app.database import get_async_read_db
+from app.models.character import Character
+from app.models.usage import ChatUsage
+from app.schemas import CharacterUsage, UsageReport
+from app.services.ledger import usage_ledger
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+@router.get("/", response_model=UsageReport, dependencies=[Depends(require_admin)])
+async def usage_report(
+    days: int = Query(7, ge=1, le=365, description="Período em dias"),
+    character_id: Optional[int] = Query(None, description="Filtra um personagem"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Tokens, tempos e resultados da moderação por personagem (para planejamento
+    de capacidade). Exige o header X-Admin-Token, como as rotas de /admin.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    stmt = (
+        select(
+            ChatUsage.character_id,
+            Character.name,
+            func.count(ChatUsage.id),
+            func.coalesce(func.sum(ChatUsage.prompt_tokens), 0),
+            func.coalesce(func.sum(ChatUsage.completion_tokens), 0),
+            func.avg(ChatUsage.total_ms),
+            func.max(ChatUsage.total_ms),
+            func.avg(ChatUsage.openai_ms),
+            _count_where(ChatUsage.cached.is_(True)),
+            _count_where(ChatUsage.shared.is_(True)),
+            _count_where(ChatUsage.moderation == "entrada_bloqueada"),
+            _count_where(ChatUsage.moderation == "saida_bloqueada"),
+        )
+        # Outer join: o uso de personagens excluídos continua no relatório
+        .outerjoin(Character, Character.id == ChatUsage.character_id)
+        .where(ChatUsage.created_at >= since)
+        .group_by(ChatUsage.character_id, Character.name)
+        .order_by(func.sum(ChatUsage.prompt_tokens + ChatUsage.completion_tokens).desc())
+    )
+    if character_id is not None:
+        stmt = stmt.where(ChatUsage.character_id == character_id)
+
+    characters = [
+        CharacterUsage(
+            character_id=row[0],
+            character_name=row[1],
+            replies=row[2],
+            prompt_tokens=row[3],
+            completion_tokens=row[4],
+            avg_total_ms=round(row[5], 2) if row[5] is not None else None,
+            max_total_ms=row[6],
+            avg_openai_ms=round(row[7], 2) if row[7] is not None else None,
+            cached=row[8],
+            shared=row[9],
+            input_blocked=row[10],
+            output_blocked=row[11],
+        )
+        for row in (await db.execute(stmt)).all()
+    ]
+    return UsageReport(
+        since=since,
+        replies=sum(item.replies for item in characters),
+        prompt_tokens=sum(item.prompt_tokens for item in characters),
+        completion_tokens=sum(item.completion_tokens for item in characters),
+        characters=characters,
+        pending=usage_ledger.pending,
+    )
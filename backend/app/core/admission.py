@@ -0,0 +1,203 @@
+"""
+Controle de admissão para chamadas caras (OpenAI).
+Implementa um limitador de concorrência com fila de espera limitada e um
+rate limit por cliente (token bucket). Quando a fila está cheia ou o cliente
+excede o limite, a requisição é rejeitada imediatamente com um Retry-After,
+em vez de esperar indefinidamente e estourar o threadpool.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque
+
+from app.core.deadline import DeadlineExceeded, remaining_budget
+
+
+class AdmissionRejected(Exception):
+    """Requisição recusada pelo controle de admissão."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Valor do header Retry-After (segundos inteiros, mínimo 1)."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class ConcurrencyLimiter:
+    """
+    Limita quantas operações rodam ao mesmo tempo.
+
+    Até max_concurrent operações executam; as seguintes esperam numa fila FIFO
+    de no máximo max_queue posições, por até queue_timeout segundos. Com
+    max_concurrent <= 0 o limitador fica desabilitado.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Média móvel do tempo de execução, usada para estimar o Retry-After
+        self._avg_service_s = 1.0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.queue_timeouts = 0
+        self.wait_total_s = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def _estimated_wait(self) -> float:
+        """Estimativa de quanto tempo leva para a fila atual andar."""
+        rounds = (len(self._waiters) + 1) / max(self.max_concurrent, 1)
+        return self._avg_service_s * rounds
+
+    async def acquire(self) -> None:
+        if not self.enabled:
+            return
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected("queue_full", self._estimated_wait())
+
+        # A espera na fila também respeita o prazo da requisição
+        timeout = self.queue_timeout
+        remaining = remaining_budget()
+        limited_by_deadline = remaining is not None and remaining < timeout
+        if limited_by_deadline:
+            timeout = remaining
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # A vaga chegou junto com o timeout: devolve para o próximo
+                self.release()
+            else:
+                waiter.cancel()
+            self.queue_timeouts += 1
+            if limited_by_deadline:
+                raise DeadlineExceeded("fila")
+            raise AdmissionRejected("queue_timeout", self._estimated_wait())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self.wait_total_s += time.monotonic() - start
+        self.admitted += 1
+
+    def release(self) -> None:
+        if not self.enabled:
+            return
+        # Passa a vaga diretamente para o próximo da fila (sem furar a ordem)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Context manager que ocupa uma vaga durante o bloco."""
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self._avg_service_s = 0.9 * self._avg_service_s + 0.1 * elapsed
+            self.release()
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "queue_timeouts": self.queue_timeouts,
+            "wait_avg_ms": round(self.wait_total_s / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "service_avg_ms": round(self._avg_service_s * 1000, 2),
+        }
+
+
+class TokenBucketLimiter:
+    """
+    Rate limit por cliente usando token bucket.
+
+    Cada cliente tem até `burst` fichas, repostas a `rate` fichas por segundo.
+    Os baldes são mantidos num LRU limitado a max_clients. Com rate <= 0 o
+    limitador fica desabilitado.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        # cliente -> (fichas, última_reposição)
+        self._buckets = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, client_key: str) -> float:
+        """
+        Consome uma ficha do cliente.
+
+        Returns:
+            float: 0 se a requisição foi aceita; caso contrário, os segundos até
+            haver uma ficha disponível
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(client_key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.limited += 1
+            self._buckets[client_key] = (tokens, now)
+            self._buckets.move_to_end(client_key)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                "allowed": self.allowed,
+                "limited": self.limited,
+            }
@@ -0,0 +1,51 @@
+"""
+Identificação do cliente que originou uma requisição.
+Usada para consistência read-your-writes e limites por cliente.
+"""
+
+from starlette.requests import HTTPConnection
+
+from app.core.config import settings
+
+CLIENT_ID_HEADER = "X-Client-Id"
+
+
+def get_client_key(connection: HTTPConnection) -> str:
+    """
+    Retorna uma chave estável para o cliente da requisição (read-your-writes).
+
+    Os headers são controlados pelo cliente: serve só para decisões que ele
+    não tem interesse em forjar. Para limites, use get_rate_limit_key.
+
+    Prioriza o header X-Client-Id (enviado pelo frontend), depois o primeiro IP
+    de X-Forwarded-For (atrás do proxy do Railway) e por fim o IP da conexão.
+    """
+    client_id = connection.headers.get(CLIENT_ID_HEADER)
+    if client_id:
+        return f"id:{client_id.strip()[:128]}"
+
+    forwarded_for = connection.headers.get("x-forwarded-for")
+    if forwarded_for:
+        return f"ip:{forwarded_for.split(',')[0].strip()}"
+
+    if connection.client is not None:
+        return f"ip:{connection.client.host}"
+    return "anonymous"
+
+
+def get_rate_limit_key(connection: HTTPConnection, trusted_hops: int = settings.trusted_proxy_hops) -> str:
+    """
+    Chave do cliente para o rate limit, que o cliente não consegue trocar.
+
+    Sem proxy confiável (TRUSTED_PROXY_HOPS=0) usa o IP da conexão. Atrás de N
+    proxies confiáveis usa o N-ésimo IP da direita em X-Forwarded-For: o que o
+    proxy mais externo acrescentou. As entradas à esquerda dele vêm do cliente
+    e são ignoradas.
+    """
+    if trusted_hops > 0:
+        hops = [hop.strip() for hop in connection.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(hops) >= trusted_hops:
+            return f"ip:{hops[-trusted_hops]}"
+    if connection.client is not None:
+        return f"ip:{connection.client.host}"
+    return "anonymous"
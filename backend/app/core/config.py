@@ -20,15 +20,61 @@ class Settings(BaseSettings):
         default=None, validation_alias="DATABASE_URL"
     )
 
+    # Pool de conexões do SQLAlchemy
+    db_pool_size: int = Field(default=5, validation_alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=10, validation_alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=30.0, validation_alias="DB_POOL_TIMEOUT")
+    # Recicla conexões antes do timeout de ociosidade do proxy (Railway); -1 desabilita
+    db_pool_recycle: int = Field(default=280, validation_alias="DB_POOL_RECYCLE")
+    # Estratégia de pre-ping: "always" (todo checkout), "idle" (apenas conexões
+    # ociosas há mais de DB_POOL_PRE_PING_IDLE_SECONDS) ou "never"
+    db_pool_pre_ping: str = Field(default="idle", validation_alias="DB_POOL_PRE_PING")
+    db_pool_pre_ping_idle_seconds: float = Field(
+        default=30.0, validation_alias="DB_POOL_PRE_PING_IDLE_SECONDS"
+    )
+
+    # Réplicas de leitura (opcional): DSNs separados por vírgula
+    database_replica_urls: Union[str, List[str]] = Field(
+        default="", validation_alias="DATABASE_REPLICA_URLS"
+    )
+    # Lag máximo aceito antes de a leitura voltar para o primário
+    db_replica_max_lag_seconds: float = Field(
+        default=5.0, validation_alias="DB_REPLICA_MAX_LAG_SECONDS"
+    )
+    db_replica_check_interval_seconds: float = Field(
+        default=10.0, validation_alias="DB_REPLICA_CHECK_INTERVAL_SECONDS"
+    )
+    # Janela em que as leituras de um cliente que acabou de escrever vão ao primário
+    db_read_your_writes_seconds: float = Field(
+        default=10.0, validation_alias="DB_READ_YOUR_WRITES_SECONDS"
+    )
+    # Consultas acima deste tempo (ms) vão para o log, com os parâmetros ocultos; 0 desabilita
+    db_slow_query_ms: float = Field(default=200.0, validation_alias="DB_SLOW_QUERY_MS")
+    # Detecção de N+1: o mesmo SELECT repetido N vezes numa requisição.
+    # Modo off, warn (log) ou raise (erro na requisição; para testes)
+    db_n_plus_one_threshold: int = Field(default=10, validation_alias="DB_N_PLUS_ONE_THRESHOLD")
+    db_n_plus_one_mode: str = Field(default="warn", validation_alias="DB_N_PLUS_ONE_MODE")
+    # Espera pelo banco na subida do container (app.core.schema_check): backoff
+    # exponencial a partir do intervalo inicial, limitado ao máximo, até o prazo total
+    db_boot_wait_seconds: float = Field(default=90.0, validation_alias="DB_BOOT_WAIT_SECONDS")
+    db_boot_backoff_initial_seconds: float = Field(
+        default=0.5, validation_alias="DB_BOOT_BACKOFF_INITIAL_SECONDS"
+    )
+    db_boot_backoff_max_seconds: float = Field(default=8.0, validation_alias="DB_BOOT_BACKOFF_MAX_SECONDS")
+    # Tempos da verificação do schema no boot, incluídos nos tempos do startup
+    schema_check_report_path: str = Field(
+        default="/tmp/schema_check.json", validation_alias="SCHEMA_CHECK_REPORT_PATH"
+    )
+
     allowed_origins: Union[str, List[str]] = Field(
         default="http://localhost:3000,http://localhost:5173,http://127.0.0.1:5173,http://localhost,http://localhost:80,http://localhost:8080",
         validation_alias="ALLOWED_ORIGINS"
     )
     
-    @field_validator('allowed_origins', mode='before')
+    @field_validator('allowed_origins', 'database_replica_urls', mode='before')
     @classmethod
     def parse_allowed_origins(cls, v):
-        """Parse ALLOWED_ORIGINS from string (comma-separated) to list."""
+        """Parse ALLOWED_ORIGINS / DATABASE_REPLICA_URLS from string (comma-separated) to list."""
         if isinstance(v, list):
             return v
         if isinstance(v, str):
@@ -39,6 +85,153 @@ class Settings(BaseSettings):
         validation_alias="OPENAI_API_KEY",
     )
 
+    # Logging: nível, formato (json ou text), tamanho da fila, amostragem por
+    # logger abaixo de WARNING ("app.perf=0.1,uvicorn.access=0.5") e limite
+    # de caracteres dos corpos de requisição registrados
+    log_level: str = Field(default="INFO", validation_alias="LOG_LEVEL")
+    log_format: str = Field(default="json", validation_alias="LOG_FORMAT")
+    log_queue_size: int = Field(default=10000, validation_alias="LOG_QUEUE_SIZE")
+    log_sample_rates: str = Field(default="", validation_alias="LOG_SAMPLE_RATES")
+    log_max_body_chars: int = Field(default=2000, validation_alias="LOG_MAX_BODY_CHARS")
+
+    # Profiling sob demanda (?profile=1 com X-Admin-Token); sem token fica desabilitado
+    profiling_admin_token: Optional[str] = Field(default=None, validation_alias="PROFILING_ADMIN_TOKEN")
+    profiling_format: str = Field(default="speedscope", validation_alias="PROFILING_FORMAT")
+    profiling_interval_ms: float = Field(default=1.0, validation_alias="PROFILING_INTERVAL_MS")
+    profiling_max_per_minute: float = Field(default=2.0, validation_alias="PROFILING_MAX_PER_MINUTE")
+    profiling_output_dir: str = Field(default=".cache/profiles", validation_alias="PROFILING_OUTPUT_DIR")
+    profiling_max_files: int = Field(default=20, validation_alias="PROFILING_MAX_FILES")
+
+    # Tracing OpenTelemetry: none, console, file ou otlp; fração de traces amostrados
+    tracing_exporter: str = Field(default="none", validation_alias="TRACING_EXPORTER")
+    tracing_sample_ratio: float = Field(default=1.0, validation_alias="TRACING_SAMPLE_RATIO")
+    tracing_file_path: str = Field(default=".cache/traces.jsonl", validation_alias="TRACING_FILE_PATH")
+    tracing_service_name: str = Field(default="chatbot-personagens-backend", validation_alias="TRACING_SERVICE_NAME")
+
+    # Cache de personagens por processo (0 desabilita) e barramento de invalidação
+    # entre workers: local (um processo), redis (pub/sub) ou mysql (polling).
+    # Com vários workers e o barramento local o cache fica desligado
+    character_cache_max_entries: int = Field(default=1000, validation_alias="CHARACTER_CACHE_MAX_ENTRIES")
+    character_cache_ttl_seconds: float = Field(default=300.0, validation_alias="CHARACTER_CACHE_TTL_SECONDS")
+    cache_invalidation_backend: str = Field(default="local", validation_alias="CACHE_INVALIDATION_BACKEND")
+    # Workers do gunicorn (definido pelo start.sh / gunicorn.conf.py)
+    web_concurrency: int = Field(default=1, validation_alias="WEB_CONCURRENCY")
+    redis_url: Optional[str] = Field(default=None, validation_alias="REDIS_URL")
+    cache_invalidation_channel: str = Field(
+        default="chatbot:characters", validation_alias="CACHE_INVALIDATION_CHANNEL"
+    )
+    cache_invalidation_poll_seconds: float = Field(
+        default=2.0, validation_alias="CACHE_INVALIDATION_POLL_SECONDS"
+    )
+
+    # Cache em disco (SQLite) compartilhado pelos workers do host; caminho vazio desabilita
+    disk_cache_path: Optional[str] = Field(default=".cache/chatbot_cache.sqlite3", validation_alias="DISK_CACHE_PATH")
+    disk_cache_max_mb: float = Field(default=256.0, validation_alias="DISK_CACHE_MAX_MB")
+    # TTL dos resultados da moderação e das respostas do chat no cache (0 desabilita)
+    moderation_cache_ttl_seconds: float = Field(default=604800.0, validation_alias="MODERATION_CACHE_TTL_SECONDS")
+    # Opt-in: com o cache, a mesma mensagem (com o mesmo histórico) recebe a
+    # mesma resposta de todos os usuários durante o TTL, apesar da temperatura
+    chat_response_cache_ttl_seconds: float = Field(default=0.0, validation_alias="CHAT_RESPONSE_CACHE_TTL_SECONDS")
+
+    # Registro de uso (tokens, tempos, moderação) e transcrições, gravados em
+    # lote fora da requisição; acima de USAGE_LEDGER_MAX_PENDING os registros são descartados
+    usage_ledger_enabled: bool = Field(default=True, validation_alias="USAGE_LEDGER_ENABLED")
+    # Transcrições guardam as conversas dos usuários: só com opt-in
+    usage_ledger_transcripts: bool = Field(default=False, validation_alias="USAGE_LEDGER_TRANSCRIPTS")
+    usage_ledger_batch_size: int = Field(default=200, validation_alias="USAGE_LEDGER_BATCH_SIZE")
+    usage_ledger_flush_seconds: float = Field(default=1.0, validation_alias="USAGE_LEDGER_FLUSH_SECONDS")
+    usage_ledger_max_pending: int = Field(default=10000, validation_alias="USAGE_LEDGER_MAX_PENDING")
+
+    # Controle de admissão das chamadas à OpenAI (0 desabilita)
+    chat_max_concurrency: int = Field(default=8, validation_alias="CHAT_MAX_CONCURRENCY")
+    chat_max_queue: int = Field(default=32, validation_alias="CHAT_MAX_QUEUE")
+    chat_queue_timeout_seconds: float = Field(
+        default=10.0, validation_alias="CHAT_QUEUE_TIMEOUT_SECONDS"
+    )
+    # Rate limit por cliente (token bucket; 0 desabilita). O estado fica em cada
+    # worker: com WEB_CONCURRENCY=N o limite efetivo chega a N vezes o configurado
+    chat_rate_limit_per_minute: float = Field(
+        default=30.0, validation_alias="CHAT_RATE_LIMIT_PER_MINUTE"
+    )
+    chat_rate_limit_burst: int = Field(default=10, validation_alias="CHAT_RATE_LIMIT_BURST")
+    # Proxies confiáveis na frente da aplicação (1 no Railway): o cliente do rate
+    # limit é o IP que o proxy mais externo acrescentou ao X-Forwarded-For.
+    # 0 usa o IP da conexão
+    trusted_proxy_hops: int = Field(default=0, validation_alias="TRUSTED_PROXY_HOPS")
+
+    # Roteamento de modelo e max_tokens por requisição
+    chat_model: str = Field(default="gpt-4o-mini", validation_alias="CHAT_MODEL")
+    chat_model_long: Optional[str] = Field(default=None, validation_alias="CHAT_MODEL_LONG")
+    chat_temperature: float = Field(default=0.8, validation_alias="CHAT_TEMPERATURE")
+    chat_max_tokens_short: int = Field(default=300, validation_alias="CHAT_MAX_TOKENS_SHORT")
+    chat_max_tokens_standard: int = Field(default=1000, validation_alias="CHAT_MAX_TOKENS_STANDARD")
+    chat_max_tokens_long: int = Field(default=2000, validation_alias="CHAT_MAX_TOKENS_LONG")
+    chat_short_message_chars: int = Field(default=40, validation_alias="CHAT_SHORT_MESSAGE_CHARS")
+    chat_long_message_chars: int = Field(default=600, validation_alias="CHAT_LONG_MESSAGE_CHARS")
+    chat_short_history_messages: int = Field(
+        default=4, validation_alias="CHAT_SHORT_HISTORY_MESSAGES"
+    )
+    chat_long_history_messages: int = Field(
+        default=20, validation_alias="CHAT_LONG_HISTORY_MESSAGES"
+    )
+    # Latência alvo (0 desabilita) e vazão estimada do modelo para o limite de tokens
+    chat_latency_slo_ms: int = Field(default=0, validation_alias="CHAT_LATENCY_SLO_MS")
+    chat_tokens_per_second: float = Field(default=60.0, validation_alias="CHAT_TOKENS_PER_SECOND")
+
+    # Transporte resiliente da OpenAI
+    openai_max_attempts: int = Field(default=3, validation_alias="OPENAI_MAX_ATTEMPTS")
+    openai_backoff_base_seconds: float = Field(
+        default=0.5, validation_alias="OPENAI_BACKOFF_BASE_SECONDS"
+    )
+    openai_backoff_max_seconds: float = Field(
+        default=8.0, validation_alias="OPENAI_BACKOFF_MAX_SECONDS"
+    )
+    # Hedge: segunda chamada quando a primeira passa do percentil de latência
+    openai_hedge_enabled: bool = Field(default=False, validation_alias="OPENAI_HEDGE_ENABLED")
+    openai_hedge_percentile: float = Field(
+        default=95.0, validation_alias="OPENAI_HEDGE_PERCENTILE"
+    )
+    openai_hedge_min_samples: int = Field(
+        default=20, validation_alias="OPENAI_HEDGE_MIN_SAMPLES"
+    )
+    # Circuit breaker (0 desabilita)
+    openai_breaker_failure_threshold: int = Field(
+        default=5, validation_alias="OPENAI_BREAKER_FAILURE_THRESHOLD"
+    )
+    openai_breaker_reset_seconds: float = Field(
+        default=30.0, validation_alias="OPENAI_BREAKER_RESET_SECONDS"
+    )
+
+    # Prazo (s) de uma requisição de chat; o header X-Request-Deadline-Ms pode
+    # apenas encurtá-lo. 0 desabilita
+    chat_request_timeout_seconds: float = Field(default=110.0, validation_alias="CHAT_REQUEST_TIMEOUT_SECONDS")
+
+    # Máximo de personagens respondendo a mesma mensagem no chat em grupo
+    chat_group_max_characters: int = Field(default=5, validation_alias="CHAT_GROUP_MAX_CHARACTERS")
+
+    # Mensagens recentes mantidas por conexão no chat via WebSocket
+    chat_ws_history_messages: int = Field(default=20, validation_alias="CHAT_WS_HISTORY_MESSAGES")
+
+    # Resumo do histórico: a partir de CHAT_SUMMARY_THRESHOLD_MESSAGES mensagens, as
+    # antigas (em blocos de CHAT_SUMMARY_BLOCK_MESSAGES) viram um resumo gerado em
+    # segundo plano; as CHAT_SUMMARY_KEEP_RECENT_MESSAGES mais recentes vão inteiras
+    chat_summary_enabled: bool = Field(default=False, validation_alias="CHAT_SUMMARY_ENABLED")
+    chat_summary_threshold_messages: int = Field(default=16, validation_alias="CHAT_SUMMARY_THRESHOLD_MESSAGES")
+    chat_summary_block_messages: int = Field(default=8, validation_alias="CHAT_SUMMARY_BLOCK_MESSAGES")
+    chat_summary_keep_recent_messages: int = Field(default=6, validation_alias="CHAT_SUMMARY_KEEP_RECENT_MESSAGES")
+    chat_summary_model: str = Field(default="gpt-4o-mini", validation_alias="CHAT_SUMMARY_MODEL")
+    chat_summary_max_tokens: int = Field(default=250, validation_alias="CHAT_SUMMARY_MAX_TOKENS")
+    chat_summary_ttl_seconds: float = Field(default=86400.0, validation_alias="CHAT_SUMMARY_TTL_SECONDS")
+    chat_summary_max_concurrency: int = Field(default=2, validation_alias="CHAT_SUMMARY_MAX_CONCURRENCY")
+
+    # Respostas de chat guardadas por Idempotency-Key
+    chat_idempotency_max_entries: int = Field(
+        default=1000, validation_alias="CHAT_IDEMPOTENCY_MAX_ENTRIES"
+    )
+    chat_idempotency_ttl_seconds: float = Field(
+        default=600.0, validation_alias="CHAT_IDEMPOTENCY_TTL_SECONDS"
+    )
+
     # Guardrails configuration
     moderation_enabled: bool = Field(
         default=True,
@@ -60,6 +253,25 @@ class Settings(BaseSettings):
             f"@{self.db_host}:{self.db_port}/{self.db_name}"
         )
 
+    @property
+    def async_database_url(self) -> str:
+        return to_async_url(self.database_url)
+
+
+# Driver assíncrono equivalente a cada driver síncrono suportado
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Converte uma URL síncrona do SQLAlchemy para o driver asyncio equivalente."""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
 
 def get_settings() -> Settings:
     """Return settings instance."""
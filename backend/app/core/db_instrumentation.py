@@ -0,0 +1,184 @@
+"""
+Instrumentação do pool de conexões do SQLAlchemy.
+Monta as opções do engine a partir das Settings e exporta estatísticas do pool
+(espera no checkout, conexões em uso, overflow e invalidações) via app.core.metrics.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core import metrics
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+PRE_PING_STRATEGIES = ("always", "idle", "never")
+
+
+class PoolStats:
+    """Contadores acumulados de um pool de conexões."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_total_s = 0.0
+        self.checkout_wait_max_s = 0.0
+        self.connects = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.pings = 0
+        self.ping_failures = 0
+
+    def record_checkout(self, wait_s: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            else:
+                self.checkouts += 1
+            self.checkout_wait_total_s += wait_s
+            self.checkout_wait_max_s = max(self.checkout_wait_max_s, wait_s)
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self, pool) -> dict:
+        """Retorna os contadores junto com o estado atual do pool."""
+        with self._lock:
+            attempts = self.checkouts + self.checkout_timeouts
+            data = {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_wait_avg_ms": round(self.checkout_wait_total_s / attempts * 1000, 3) if attempts else 0.0,
+                "checkout_wait_max_ms": round(self.checkout_wait_max_s * 1000, 3),
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+            }
+        if isinstance(pool, QueuePool):
+            data.update(
+                pool_size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+            )
+        return data
+
+
+_pool_stats: Dict[str, PoolStats] = {}
+
+
+def get_pool_stats(name: str) -> PoolStats:
+    """Retorna (criando se preciso) as estatísticas do pool com o nome informado."""
+    stats = _pool_stats.get(name)
+    if stats is None:
+        stats = _pool_stats.setdefault(name, PoolStats(name))
+    return stats
+
+
+class _TimedCheckoutMixin:
+    """Mede o tempo de espera por uma conexão livre em cada checkout."""
+
+    def connect(self):
+        stats = get_pool_stats(self.logging_name or "default")
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            stats.record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    """QueuePool que registra o tempo de espera do checkout."""
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    """Versão para engines asyncio (create_async_engine)."""
+
+
+def engine_options(settings: Settings, url: str, name: str, is_async: bool = False) -> dict:
+    """
+    Monta os argumentos de create_engine (ou create_async_engine, com
+    is_async=True) para o pool configurado nas Settings.
+
+    SQLite (usado em testes locais) mantém o pool padrão do dialeto, que não
+    aceita as opções de dimensionamento.
+    """
+    strategy = settings.db_pool_pre_ping.lower()
+    if strategy not in PRE_PING_STRATEGIES:
+        logger.warning("DB_POOL_PRE_PING inválido: '%s'. Usando 'idle'.", settings.db_pool_pre_ping)
+        strategy = "idle"
+
+    options = {"pool_pre_ping": strategy == "always"}
+    if make_url(url).get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_logging_name=name,
+    )
+    return options
+
+
+def instrument_engine(engine: Engine, name: str, settings: Settings) -> None:
+    """
+    Registra os listeners de pool do engine e exporta suas métricas.
+    Para engines asyncio, passe o AsyncEngine.sync_engine.
+    """
+    stats = get_pool_stats(name)
+    ping_idle = settings.db_pool_pre_ping.lower() == "idle"
+    idle_threshold = settings.db_pool_pre_ping_idle_seconds
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.increment("connects")
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get("last_checkin")
+        if not ping_idle or last_checkin is None:
+            return
+        if time.monotonic() - last_checkin < idle_threshold:
+            return
+        # Pre-ping apenas em conexões ociosas: evita o round-trip extra nas
+        # conexões quentes e ainda detecta as que o proxy derrubou
+        stats.increment("pings")
+        try:
+            alive = engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            alive = False
+        if not alive:
+            stats.increment("ping_failures")
+            # Faz o pool descartar a conexão e tentar outra
+            raise exc.DisconnectionError("Conexão ociosa não respondeu ao ping.")
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.increment("invalidations")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def _on_soft_invalidate(dbapi_connection, connection_record, exception):
+        stats.increment("soft_invalidations")
+
+    metrics.register_collector(f"db_pool.{name}", lambda: stats.snapshot(engine.pool))
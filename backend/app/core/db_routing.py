@@ -0,0 +1,177 @@
+"""
+Roteamento de leituras para réplicas do banco.
+Leituras vão para uma réplica saudável (round-robin); escritas, flushes e
+clientes que acabaram de escrever (read-your-writes) ficam no primário.
+Réplicas com lag acima do limite ou inacessíveis são ignoradas até a próxima
+verificação.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaMonitor:
+    """Verifica periodicamente o lag de cada réplica e guarda o resultado."""
+
+    def __init__(self, replicas: List[Engine], max_lag_seconds: float, check_interval_seconds: float):
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        # url -> (verificado_em, lag_em_segundos ou None se inacessível)
+        self._status = {}
+        self._checking = set()
+
+    def _measure_lag(self, engine: Engine) -> Optional[float]:
+        """Retorna o lag da réplica em segundos, ou None se não puder ser usada."""
+        if engine.dialect.name != "mysql":
+            return 0.0
+        try:
+            with engine.connect() as connection:
+                try:
+                    row = connection.execute(text("SHOW REPLICA STATUS")).mappings().first()
+                except Exception:
+                    row = connection.execute(text("SHOW SLAVE STATUS")).mappings().first()
+        except Exception as e:
+            logger.warning("⚠️  Réplica %s inacessível: %s", engine.url.host, e)
+            return None
+
+        if row is None:
+            # Endpoint sem status de replicação (ex.: proxy gerenciado): assume em dia
+            return 0.0
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        # NULL significa replicação parada
+        return float(lag) if lag is not None else None
+
+    def lag(self, engine: Engine) -> Optional[float]:
+        """Retorna o último lag conhecido, reavaliando se a medição expirou."""
+        key = str(engine.url)
+        now = time.monotonic()
+        with self._lock:
+            checked_at, lag = self._status.get(key, (None, None))
+            stale = checked_at is None or now - checked_at >= self.check_interval_seconds
+            # Apenas uma thread mede por vez; as demais usam o valor anterior
+            should_check = stale and key not in self._checking
+            if should_check:
+                self._checking.add(key)
+        if not should_check:
+            return lag if checked_at is not None else None
+
+        try:
+            lag = self._measure_lag(engine)
+        finally:
+            with self._lock:
+                self._status[key] = (time.monotonic(), lag)
+                self._checking.discard(key)
+        return lag
+
+    def is_healthy(self, engine: Engine) -> bool:
+        lag = self.lag(engine)
+        return lag is not None and lag <= self.max_lag_seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                engine.url.render_as_string(hide_password=True): self._status.get(str(engine.url), (None, None))[1]
+                for engine in self.replicas
+            }
+
+
+class ReadYourWritesTracker:
+    """Lembra quais clientes escreveram recentemente (LRU limitado)."""
+
+    def __init__(self, window_seconds: float, max_clients: int = 10000):
+        self.window_seconds = window_seconds
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._last_write = OrderedDict()
+
+    def mark_write(self, client_key: str) -> None:
+        with self._lock:
+            self._last_write[client_key] = time.monotonic()
+            self._last_write.move_to_end(client_key)
+            while len(self._last_write) > self.max_clients:
+                self._last_write.popitem(last=False)
+
+    def requires_primary(self, client_key: str) -> bool:
+        with self._lock:
+            last_write = self._last_write.get(client_key)
+        return last_write is not None and time.monotonic() - last_write < self.window_seconds
+
+
+class ReplicaRouter:
+    """Escolhe o engine de leitura e contabiliza o roteamento."""
+
+    def __init__(self, primary: Engine, replicas: List[Engine], monitor: ReplicaMonitor):
+        self.primary = primary
+        self.replicas = replicas
+        self.monitor = monitor
+        self._next = count()
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.lag_fallbacks = 0
+        self.read_your_writes = 0
+
+    def read_engine(self) -> Engine:
+        """Retorna a próxima réplica saudável, ou o primário se não houver."""
+        if self.replicas:
+            start = next(self._next)
+            for offset in range(len(self.replicas)):
+                replica = self.replicas[(start + offset) % len(self.replicas)]
+                if self.monitor.is_healthy(replica):
+                    self.record("replica_reads")
+                    return replica
+            self.record("lag_fallbacks")
+        self.record("primary_reads")
+        return self.primary
+
+    def record(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = {
+                "replicas": len(self.replicas),
+                "replica_reads": self.replica_reads,
+                "primary_reads": self.primary_reads,
+                "lag_fallbacks": self.lag_fallbacks,
+                "read_your_writes": self.read_your_writes,
+            }
+        data["lag_seconds"] = self.monitor.snapshot()
+        return data
+
+
+class RoutingSession(Session):
+    """
+    Session que envia SELECTs para réplicas quando use_replica=True.
+
+    Tudo que não é SELECT (INSERT/UPDATE/DELETE, text(), flush) vai para o
+    primário. A réplica é escolhida uma vez por sessão, para que as leituras de
+    uma mesma requisição vejam um estado consistente.
+    """
+
+    def __init__(self, *args, router: ReplicaRouter, use_replica: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.router = router
+        self.use_replica = use_replica
+        self._read_engine: Optional[Engine] = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.use_replica and not self._flushing and isinstance(clause, Select):
+            if self._read_engine is None:
+                self._read_engine = self.router.read_engine()
+            return self._read_engine
+        return self.router.primary
@@ -0,0 +1,129 @@
+"""
+Prazo (deadline) por requisição e cancelamento quando o cliente desconecta.
+
+O prazo fica num ContextVar: cada etapa do pipeline de chat (banco, moderação,
+fila e OpenAI) usa o tempo restante como timeout, em vez de esperar
+indefinidamente por uma resposta que ninguém vai ler.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from starlette.requests import Request
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+
+class DeadlineExceeded(Exception):
+    """O prazo da requisição acabou durante uma etapa."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Prazo da requisição excedido na etapa '{stage}'")
+        self.stage = stage
+
+
+class ClientDisconnected(Exception):
+    """O cliente encerrou a conexão antes da resposta ficar pronta."""
+
+
+class Deadline:
+    """Instante limite para concluir uma requisição."""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def remaining_budget() -> Optional[float]:
+    """Segundos restantes do prazo atual, ou None se não houver prazo."""
+    deadline = current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def resolve_budget(header_value: Optional[str], default_seconds: float) -> Optional[float]:
+    """
+    Calcula o prazo da requisição em segundos.
+
+    O header X-Request-Deadline-Ms (tempo relativo em ms) só pode encurtar o
+    prazo configurado. Retorna None quando não há prazo algum.
+    """
+    budget = default_seconds if default_seconds > 0 else None
+    if header_value:
+        try:
+            requested = float(header_value) / 1000
+        except ValueError:
+            requested = None
+        if requested is not None and requested > 0:
+            budget = requested if budget is None else min(budget, requested)
+    return budget
+
+
+def start_deadline(seconds: Optional[float]) -> None:
+    """Define o prazo do contexto atual (tasks criadas depois herdam o valor)."""
+    current_deadline.set(Deadline(seconds) if seconds else None)
+
+
+async def within_deadline(awaitable: Awaitable[T], stage: str) -> T:
+    """
+    Aguarda a etapa usando o tempo restante como timeout.
+
+    Raises:
+        DeadlineExceeded: Se o prazo acabar antes da etapa terminar
+    """
+    remaining = remaining_budget()
+    if remaining is None:
+        return await awaitable
+    if remaining <= 0:
+        # Evita o aviso de coroutine nunca aguardada
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage)
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Executa a operação, cancelando-a se o cliente desconectar antes do fim.
+
+    Deve ser usada depois que o corpo da requisição já foi lido: a partir daí
+    a próxima mensagem do ASGI só chega quando o cliente desconecta.
+
+    Raises:
+        ClientDisconnected: Se o cliente desconectar primeiro
+    """
+    work = asyncio.ensure_future(awaitable)
+
+    async def wait_disconnect() -> None:
+        while True:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    watcher = asyncio.ensure_future(wait_disconnect())
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Cancelamento de quem chamou também interrompe as duas tasks
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+    if not work.done() or work.cancelled():
+        raise ClientDisconnected()
+    return work.result()
@@ -0,0 +1,184 @@
+"""
+Cache chave/valor em disco (SQLite), compartilhado pelos workers do mesmo host.
+
+Fica atrás dos resultados de moderação e das respostas do chat: sobrevive a
+deploys e reinícios de workers (warm start) e o que um worker calcula serve
+para os demais. O arquivo usa WAL, então leituras não bloqueiam escritas e
+vários processos podem usá-lo ao mesmo tempo. O tamanho é limitado: ao passar
+de max_bytes as entradas expiradas e as menos acessadas são removidas.
+
+Falhas do SQLite nunca falham a requisição: o acesso vira um cache miss.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fração das entradas removida de uma vez quando o limite de tamanho é atingido
+EVICTION_FRACTION = 0.1
+# O instante de acesso (usado no LRU) só é regravado depois deste intervalo,
+# para que leituras frequentes não virem escritas no arquivo
+TOUCH_INTERVAL_SECONDS = 60.0
+# Verifica o tamanho do arquivo a cada N escritas
+SIZE_CHECK_EVERY = 32
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at);
+"""
+
+
+def cache_key(namespace: str, *parts: Any) -> str:
+    """Chave estável: namespace + hash SHA-256 das partes (serializadas em JSON)."""
+    digest = hashlib.sha256(
+        json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class DiskCache:
+    """Cache em SQLite com TTL por entrada e limite de tamanho (LRU aproximado)."""
+
+    def __init__(self, path: Optional[str], max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        # Uma conexão por thread e por processo (conexões não atravessam o fork)
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.max_bytes > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # autocommit: cada comando é uma transação curta
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Valor guardado (desserializado do JSON) ou None se ausente/expirado."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            if now - row[2] > TOUCH_INTERVAL_SECONDS:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            value = json.loads(row[0])
+        except (sqlite3.Error, OSError, ValueError) as e:
+            self._failed("ler", e)
+            return None
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        """Guarda o valor (serializável em JSON) por ttl_seconds."""
+        if not self.enabled or ttl_seconds <= 0:
+            return
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + ttl_seconds, now),
+            )
+            self.stores += 1
+            self._writes += 1
+            if self._writes % SIZE_CHECK_EVERY == 0:
+                self._evict_if_needed(conn, now)
+        except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+            self._failed("gravar", e)
+
+    def _used_bytes(self, conn: sqlite3.Connection) -> int:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict_if_needed(self, conn: sqlite3.Connection, now: float) -> None:
+        if self._used_bytes(conn) <= self.max_bytes:
+            return
+        removed = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,)).rowcount
+        if self._used_bytes(conn) > self.max_bytes:
+            total = conn.execute("SELECT count(*) FROM cache").fetchone()[0]
+            removed += conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (max(1, int(total * EVICTION_FRACTION)),),
+            ).rowcount
+        self.evictions += removed
+        logger.info("Cache em disco acima de %s bytes: %s entradas removidas", self.max_bytes, removed)
+
+    def purge_expired(self) -> int:
+        """Remove as entradas expiradas (chamado na inicialização)."""
+        if not self.enabled:
+            return 0
+        try:
+            removed = self._connection().execute(
+                "DELETE FROM cache WHERE expires_at <= ?", (time.time(),)
+            ).rowcount
+        except (sqlite3.Error, OSError) as e:
+            self._failed("limpar", e)
+            return 0
+        self.evictions += removed
+        return removed
+
+    def _failed(self, action: str, e: Exception) -> None:
+        self.errors += 1
+        logger.warning("Falha ao %s o cache em disco (%s): %s", action, self.path, e)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+disk_cache = DiskCache(
+    path=settings.disk_cache_path,
+    max_bytes=int(settings.disk_cache_max_mb * 1024 * 1024),
+)
+metrics.register_collector("disk_cache", disk_cache.snapshot)
@@ -4,22 +4,38 @@ Implementa validação de entrada e saída para prevenir conteúdo inadequado.
 """
 
 import logging
+import threading
 from typing import Optional, Tuple
 from enum import Enum
 
-try:
-    from better_profanity import profanity
-except ImportError:
-    profanity = None
-
-try:
-    from detoxify import Detoxify
-except ImportError:
-    Detoxify = None
+from app.core.config import settings
+from app.core.disk_cache import cache_key, disk_cache
+from app.core.tracing import set_attributes, span
 
 logger = logging.getLogger(__name__)
 
 
+def _import_profanity():
+    """Importa o better_profanity na inicialização dos guardrails (None se não instalado)."""
+    try:
+        from better_profanity import profanity
+    except ImportError:
+        return None
+    return profanity
+
+
+def _import_detoxify():
+    """
+    Importa o Detoxify (e com ele o torch, vários segundos) só quando os
+    guardrails são criados, e não no import da aplicação.
+    """
+    try:
+        from detoxify import Detoxify
+    except ImportError:
+        return None
+    return Detoxify
+
+
 class ModerationLevel(str, Enum):
     """Níveis de moderação disponíveis."""
     STRICT = "strict"
@@ -73,6 +89,7 @@ class Guardrails:
     
     def _init_profanity_checker(self):
         """Inicializa o verificador de palavrões."""
+        profanity = self.profanity = _import_profanity()
         if profanity is None:
             logger.warning("better-profanity não está instalado. Verificação de palavrões desabilitada.")
             self.profanity_enabled = False
@@ -85,11 +102,12 @@ class Guardrails:
             self.profanity_enabled = True
             logger.info("Verificador de palavrões inicializado com sucesso.")
         except Exception as e:
-            logger.error(f"Erro ao inicializar verificador de palavrões: {e}")
+            logger.error("Erro ao inicializar verificador de palavrões: %s", e)
             self.profanity_enabled = False
     
     def _init_toxicity_detector(self):
         """Inicializa o detector de toxicidade."""
+        Detoxify = _import_detoxify()
         if Detoxify is None:
             logger.warning("detoxify não está instalado. Detecção de toxicidade desabilitada.")
             self.toxicity_enabled = False
@@ -102,7 +120,7 @@ class Guardrails:
             self.toxicity_enabled = True
             logger.info("Detector de toxicidade inicializado com sucesso.")
         except Exception as e:
-            logger.error(f"Erro ao inicializar detector de toxicidade: {e}")
+            logger.error("Erro ao inicializar detector de toxicidade: %s", e)
             self.toxicity_enabled = False
             self.toxicity_model = None
     
@@ -117,13 +135,13 @@ class Guardrails:
             return False, None
         
         try:
-            if profanity.contains_profanity(text):
+            if self.profanity.contains_profanity(text):
                 # Tenta encontrar a palavra ofensiva
-                censored = profanity.censor(text)
+                censored = self.profanity.censor(text)
                 return True, "Conteúdo ofensivo detectado"
             return False, None
         except Exception as e:
-            logger.error(f"Erro ao verificar palavrões: {e}")
+            logger.error("Erro ao verificar palavrões: %s", e)
             return False, None
     
     def _check_toxicity(self, text: str) -> Tuple[bool, Optional[float]]:
@@ -163,7 +181,7 @@ class Guardrails:
             # é feita no método moderate() comparando com o threshold
             return False, final_score
         except Exception as e:
-            logger.error(f"Erro ao verificar toxicidade: {e}")
+            logger.error("Erro ao verificar toxicidade: %s", e)
             return False, None
     
     def _get_thresholds(self) -> dict:
@@ -191,6 +209,9 @@ class Guardrails:
         """
         Modera um texto verificando conteúdo inadequado.
         
+        O resultado fica no cache em disco (compartilhado entre workers e
+        reinícios): o mesmo texto não passa de novo pelos verificadores.
+        
         Args:
             text: Texto a ser moderado
             check_type: "input" (apenas entrada), "output" (apenas saída), "both" (ambos)
@@ -201,6 +222,35 @@ class Guardrails:
         if not text or not text.strip():
             return ContentModerationResult(is_safe=True)
         
+        with span("moderacao", {
+            "moderation.check_type": check_type,
+            "moderation.level": self.moderation_level.value,
+            "moderation.text_chars": len(text),
+        }) as moderation_span:
+            # O resultado depende do nível e de quais verificadores estão ativos
+            key = cache_key(
+                "moderacao", self.moderation_level.value, check_type,
+                self.profanity_enabled, self.toxicity_enabled, text,
+            )
+            cached = disk_cache.get(key)
+            if cached is not None:
+                result = ContentModerationResult(**cached)
+            else:
+                result = self._moderate(text, check_type)
+                disk_cache.set(key, vars(result), settings.moderation_cache_ttl_seconds)
+            set_attributes(moderation_span, {
+                "moderation.cached": cached is not None,
+                "moderation.is_safe": result.is_safe,
+                "moderation.has_profanity": result.has_profanity,
+                "moderation.toxicity_score": result.toxicity_score,
+            })
+            return result
+    
+    def _moderate(self, text: str, check_type: str) -> ContentModerationResult:
+        """Executa as verificações (sem cache)."""
+        if not text or not text.strip():
+            return ContentModerationResult(is_safe=True)
+        
         thresholds = self._get_thresholds()
         text_lower = text.lower().strip()
         
@@ -243,7 +293,7 @@ class Guardrails:
                 
                 # Log para debug (pode ser removido depois)
                 if is_toxic:
-                    logger.debug(f"Texto bloqueado: '{text[:50]}...' | Score: {toxicity_score:.3f} | Threshold: {adjusted_threshold:.3f}")
+                    logger.debug("Texto bloqueado: '%s...' | Score: %.3f | Threshold: %.3f", text[:50], toxicity_score, adjusted_threshold)
         
         # Determina se o conteúdo é seguro
         is_safe = not has_profanity and not is_toxic
@@ -266,21 +316,40 @@ class Guardrails:
         )
 
 
-# Instância global do guardrails (será inicializada no startup)
+# Instância global do guardrails (carregada em segundo plano no startup ou na
+# primeira moderação, o que vier antes)
 _guardrails_instance: Optional[Guardrails] = None
+# Carregar o modelo leva segundos: quem chegar durante o carregamento espera
+# por ele em vez de carregar uma segunda cópia
+_guardrails_lock = threading.Lock()
+
+
+def configured_moderation_level() -> ModerationLevel:
+    """Nível definido em MODERATION_LEVEL (moderate se inválido)."""
+    try:
+        return ModerationLevel(settings.moderation_level.lower())
+    except ValueError:
+        return ModerationLevel.MODERATE
 
 
 def get_guardrails() -> Guardrails:
-    """Retorna a instância global do guardrails."""
+    """Retorna a instância global do guardrails, criando-a se preciso."""
     global _guardrails_instance
     if _guardrails_instance is None:
-        _guardrails_instance = Guardrails(moderation_level=ModerationLevel.MODERATE)
+        with _guardrails_lock:
+            if _guardrails_instance is None:
+                _guardrails_instance = Guardrails(moderation_level=configured_moderation_level())
     return _guardrails_instance
 
 
 def initialize_guardrails(moderation_level: ModerationLevel = ModerationLevel.MODERATE):
     """Inicializa a instância global do guardrails."""
     global _guardrails_instance
-    _guardrails_instance = Guardrails(moderation_level=moderation_level)
-    logger.info(f"Guardrails inicializado com nível: {moderation_level.value}")
+    with _guardrails_lock:
+        _guardrails_instance = Guardrails(moderation_level=moderation_level)
+    logger.info("Guardrails inicializado com nível: %s", moderation_level.value)
+
 
+def guardrails_ready() -> bool:
+    """Indica se a instância global já foi inicializada (ex.: antes do fork do gunicorn)."""
+    return _guardrails_instance is not None
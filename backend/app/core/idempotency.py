@@ -0,0 +1,107 @@
+"""
+Armazenamento de respostas por chave de idempotência (header Idempotency-Key).
+Uma nova tentativa com a mesma chave se junta à execução em andamento ou
+recebe a resposta já concluída, em vez de repetir o trabalho (e o custo).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class IdempotencyConflict(Exception):
+    """A chave já foi usada com um conteúdo de requisição diferente."""
+
+
+class _Entry:
+    def __init__(self, fingerprint: str, task: asyncio.Task):
+        self.fingerprint = fingerprint
+        self.task = task
+        self.created_at = time.monotonic()
+
+
+class IdempotencyStore:
+    """
+    Store em memória, limitado em tamanho (LRU) e em tempo (TTL), de execuções
+    em andamento e concluídas. Falhas não são guardadas: uma nova tentativa
+    com a mesma chave executa de novo.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.executions = 0
+        self.attached = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    def _purge_expired(self) -> None:
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.created_at >= cutoff:
+                break
+            del self._entries[key]
+
+    def _drop(self, key: str, task: asyncio.Task) -> None:
+        entry = self._entries.get(key)
+        if entry is not None and entry.task is task:
+            del self._entries[key]
+
+    async def run(self, key: str, fingerprint: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Executa fn() uma única vez por chave.
+
+        Args:
+            key: Valor do header Idempotency-Key
+            fingerprint: Identifica o conteúdo da requisição; a mesma chave com
+                outro conteúdo gera IdempotencyConflict
+            fn: Fábrica da coroutine que produz a resposta
+
+        Returns:
+            Tuple[T, bool]: (resultado, reaproveitado) - reaproveitado é True
+            quando o resultado veio de uma execução anterior ou em andamento
+        """
+        self._purge_expired()
+        entry = self._entries.get(key)
+        if entry is not None and entry.task.done() and (entry.task.cancelled() or entry.task.exception()):
+            # Tentativa anterior falhou: executa novamente
+            del self._entries[key]
+            entry = None
+
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                self.conflicts += 1
+                raise IdempotencyConflict(key)
+            if entry.task.done():
+                self.replayed += 1
+            else:
+                self.attached += 1
+            self._entries.move_to_end(key)
+            return await asyncio.shield(entry.task), True
+
+        task = asyncio.ensure_future(fn())
+        # Falhas são removidas assim que a execução termina
+        task.add_done_callback(
+            lambda done: self._drop(key, done) if done.cancelled() or done.exception() else None
+        )
+        self._entries[key] = _Entry(fingerprint, task)
+        self.executions += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return await asyncio.shield(task), False
+
+    def snapshot(self) -> dict:
+        in_flight = sum(1 for entry in self._entries.values() if not entry.task.done())
+        return {
+            "entries": len(self._entries),
+            "in_flight": in_flight,
+            "executions": self.executions,
+            "attached": self.attached,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+        }
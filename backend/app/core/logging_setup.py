@@ -0,0 +1,188 @@
+"""
+Configuração de logging sem bloqueio na requisição.
+
+As chamadas logger.info(...) só enfileiram o registro (QueueHandler): a
+formatação da mensagem (%-args), a serialização em JSON e a escrita no stderr
+acontecem numa thread separada (QueueListener). Registros abaixo de WARNING
+podem ser amostrados por logger (LOG_SAMPLE_RATES) e, com a fila cheia, são
+descartados em vez de segurar a requisição.
+
+Os argumentos passados ao logger são formatados depois, na thread de
+logging: passe valores, não objetos que a requisição ainda vai alterar.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.core import metrics
+from app.core.config import Settings
+
+# Atributos padrão do LogRecord; o que sobrar veio de extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+# Loggers do uvicorn também passam pela fila (o access log é uma linha por requisição)
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+
+def parse_sample_rates(value: Optional[str]) -> Dict[str, float]:
+    """Converte "app.perf=0.1,uvicorn.access=0.5" em {logger: fração mantida}."""
+    rates = {}
+    for item in (value or "").split(","):
+        name, sep, rate = item.partition("=")
+        if not sep or not name.strip():
+            continue
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os campos passados em extra={...}."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém só uma fração dos registros abaixo de WARNING de cada logger.
+
+    A regra usada é a do prefixo mais longo: "app.perf" vale também para
+    "app.perf.chat". Avisos e erros nunca são descartados.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> float:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que descarta (e conta) registros com a fila cheia e adia a formatação."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A fila é em processo: o registro segue como está e a mensagem é
+        # montada pelo formatter, já na thread do listener
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _LoggingPipeline:
+    def __init__(self, config: Settings):
+        self.queue: queue.Queue = queue.Queue(maxsize=max(0, config.log_queue_size))
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.sampler = SamplingFilter(parse_sample_rates(config.log_sample_rates))
+        self.handler.addFilter(self.sampler)
+
+        self.output = logging.StreamHandler(sys.stderr)
+        if config.log_format.lower() == "json":
+            self.output.setFormatter(JsonFormatter())
+        else:
+            self.output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        self.listener = QueueListener(self.queue, self.output, respect_handler_level=True)
+
+    def start(self) -> None:
+        self.listener.start()
+
+    def stop(self) -> None:
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def restart_after_fork(self) -> None:
+        # A thread do listener não existe no processo filho e a fila pode ter
+        # ficado com o lock preso no fork: cria fila e listener novos
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.handler.queue = self.queue
+        self.listener = QueueListener(self.queue, self.output, respect_handler_level=True)
+        self.listener.start()
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampler.sampled_out,
+        }
+
+
+_pipeline: Optional[_LoggingPipeline] = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(config: Settings) -> None:
+    """Direciona o logger raiz (e os do uvicorn) para a fila. Idempotente."""
+    global _pipeline
+    with _setup_lock:
+        if _pipeline is not None:
+            return
+        _pipeline = _LoggingPipeline(config)
+
+        root = logging.getLogger()
+        root.setLevel(config.log_level.upper())
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_pipeline.handler)
+        for name in _UVICORN_LOGGERS:
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+        _pipeline.start()
+        atexit.register(_pipeline.stop)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_pipeline.restart_after_fork)
+        metrics.register_collector("logging", _pipeline.snapshot)
+
+
+def truncate_for_log(text: str, max_chars: int) -> str:
+    """Corta textos grandes (ex.: corpos de requisição) antes de irem para o log."""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} caracteres omitidos]"
@@ -0,0 +1,29 @@
+"""
+Registro de métricas da aplicação.
+Cada componente registra um coletor que devolve um dicionário com o seu estado
+atual; o endpoint GET /metrics agrega todos eles.
+"""
+
+import logging
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], dict]) -> None:
+    """Registra (ou substitui) o coletor de métricas com o nome informado."""
+    _collectors[name] = collector
+
+
+def collect() -> Dict[str, dict]:
+    """Executa todos os coletores registrados e retorna os resultados por nome."""
+    results = {}
+    for name, collector in list(_collectors.items()):
+        try:
+            results[name] = collector()
+        except Exception as e:
+            logger.warning("Erro ao coletar métricas de '%s': %s", name, e)
+            results[name] = {"error": str(e)}
+    return results
@@ -0,0 +1,81 @@
+"""
+Roteamento adaptativo de modelo e max_tokens por requisição.
+Escolhe a rota (curta, padrão ou longa) a partir do tamanho da mensagem e da
+profundidade do histórico, aplica os ajustes do personagem e limita o
+max_tokens para caber na latência alvo (SLO).
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from app.core.config import Settings
+
+# Tempo fixo estimado de uma chamada (rede + processamento do prompt)
+BASE_LATENCY_MS = 800
+MIN_MAX_TOKENS = 64
+
+
+@dataclass
+class ChatRoute:
+    """Parâmetros escolhidos para uma chamada de chat completion."""
+    name: str
+    model: str
+    max_tokens: int
+    temperature: float
+    limited_by_slo: bool = False
+
+    def as_debug(self) -> dict:
+        return asdict(self)
+
+
+class RoutingPolicy:
+    """Política de roteamento configurada globalmente pelas Settings."""
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+
+    def choose(self, message: str, history_depth: int, overrides: Optional[dict] = None) -> ChatRoute:
+        """
+        Escolhe modelo, max_tokens e temperatura para a mensagem.
+
+        Args:
+            message: Mensagem atual do usuário
+            history_depth: Quantidade de mensagens no histórico enviado
+            overrides: chat_settings do personagem (model, max_tokens,
+                temperature, latency_slo_ms)
+
+        Returns:
+            ChatRoute: Rota escolhida
+        """
+        settings = self.settings
+        overrides = overrides or {}
+        length = len(message.strip())
+
+        if length <= settings.chat_short_message_chars and history_depth <= settings.chat_short_history_messages:
+            name, model, max_tokens = "curta", settings.chat_model, settings.chat_max_tokens_short
+        elif length >= settings.chat_long_message_chars or history_depth >= settings.chat_long_history_messages:
+            name = "longa"
+            model = settings.chat_model_long or settings.chat_model
+            max_tokens = settings.chat_max_tokens_long
+        else:
+            name, model, max_tokens = "padrao", settings.chat_model, settings.chat_max_tokens_standard
+
+        # Ajustes do personagem: modelo fixo e teto de max_tokens
+        if overrides.get("model"):
+            model = overrides["model"]
+        if overrides.get("max_tokens"):
+            max_tokens = min(max_tokens, overrides["max_tokens"])
+        temperature = overrides.get("temperature")
+        if temperature is None:
+            temperature = settings.chat_temperature
+
+        # Limita a geração ao que cabe na latência alvo
+        route = ChatRoute(name=name, model=model, max_tokens=max_tokens, temperature=temperature)
+        slo_ms = overrides.get("latency_slo_ms") or settings.chat_latency_slo_ms
+        if slo_ms and settings.chat_tokens_per_second > 0:
+            budget = int((slo_ms - BASE_LATENCY_MS) / 1000 * settings.chat_tokens_per_second)
+            budget = max(MIN_MAX_TOKENS, budget)
+            if budget < route.max_tokens:
+                route.max_tokens = budget
+                route.limited_by_slo = True
+        return route
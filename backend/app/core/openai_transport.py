@@ -0,0 +1,292 @@
+"""
+Transporte resiliente para as chamadas de chat completion da OpenAI.
+Combina retry com backoff exponencial e jitter, requisições de hedge opcionais
+(uma segunda chamada quando a primeira passa do percentil de latência) e um
+circuit breaker que falha rápido enquanto a OpenAI está degradada.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from app.core.deadline import DeadlineExceeded, remaining_budget, within_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """O circuito está aberto: a chamada nem foi tentada."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Circuito da OpenAI aberto")
+        self.retry_after = retry_after
+
+
+def is_retryable(error: Exception) -> bool:
+    """Erros transitórios: conexão/timeout, 5xx e rate limit (exceto falta de cota)."""
+    # Import adiado: o SDK da OpenAI é o import mais lento da aplicação
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    if isinstance(error, RateLimitError):
+        return getattr(error, "code", None) != "insufficient_quota"
+    return isinstance(error, (APIConnectionError, InternalServerError))
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker clássico (closed -> open -> half_open).
+
+    Após failure_threshold falhas consecutivas o circuito abre por
+    reset_timeout segundos; depois disso uma única chamada de teste é liberada
+    e, se tiver sucesso, o circuito fecha novamente.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    def before_call(self) -> None:
+        """Libera a chamada ou levanta CircuitOpenError."""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(remaining)
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(1.0)
+                self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def abandon(self) -> None:
+        """A chamada foi cancelada sem resultado: libera a vaga de teste."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                    logger.warning(
+                        "⚠️  Circuito da OpenAI aberto após %s falhas consecutivas", self.consecutive_failures
+                    )
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class LatencyWindow:
+    """Janela móvel das últimas latências, para calcular percentis."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class OpenAITransport:
+    """Executa chat completions com retry, hedge e circuit breaker."""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+        self.latencies = LatencyWindow()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Backoff exponencial com full jitter, respeitando o Retry-After da OpenAI."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        retry_after = _retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _hedge_delay(self, kwargs: dict) -> Optional[float]:
+        if not self.hedge_enabled or kwargs.get("stream"):
+            return None
+        if len(self.latencies) < self.hedge_min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    async def _hedged_call(self, client, kwargs: dict):
+        hedge_delay = self._hedge_delay(kwargs)
+        primary = asyncio.ensure_future(client.chat.completions.create(**kwargs))
+        if hedge_delay is None:
+            return await primary
+
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                # A primeira chamada passou do percentil: dispara uma segunda
+                self.hedges += 1
+                tasks.append(asyncio.ensure_future(client.chat.completions.create(**kwargs)))
+
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancela a chamada perdedora (ou ambas, se quem chamou desistiu)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def create(self, client, **kwargs):
+        """
+        Equivalente a client.chat.completions.create(**kwargs), com resiliência.
+
+        Se houver prazo na requisição (ver app.core.deadline), cada tentativa
+        usa o tempo restante como timeout e não é feita nova tentativa que não
+        caiba no prazo.
+
+        Raises:
+            CircuitOpenError: Se o circuito estiver aberto
+            DeadlineExceeded: Se o prazo acabar antes de uma resposta
+            openai.OpenAIError: Erro não transitório ou tentativas esgotadas
+        """
+        self.breaker.before_call()
+        self.calls += 1
+        for attempt in range(self.max_attempts):
+            start = time.monotonic()
+            try:
+                result = await within_deadline(self._hedged_call(client, kwargs), "openai")
+            except (asyncio.CancelledError, DeadlineExceeded):
+                # Sem resultado por desistência de quem chamou, não por falha da OpenAI
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    # Erros do cliente (chave inválida, requisição inválida) não
+                    # indicam degradação: a OpenAI respondeu
+                    self.breaker.record_success()
+                    raise
+                if attempt + 1 >= self.max_attempts:
+                    self.failures += 1
+                    self.breaker.record_failure()
+                    raise
+                delay = self._backoff(attempt, e)
+                remaining = remaining_budget()
+                if remaining is not None and delay >= remaining:
+                    # Não há tempo para outra tentativa: o prazo da requisição
+                    # acabou, o que não conta como falha da OpenAI
+                    self.breaker.abandon()
+                    raise DeadlineExceeded("openai") from e
+                self.retries += 1
+                logger.warning(
+                    "Falha transitória na OpenAI (%s); nova tentativa %s/%s em %.2fs",
+                    type(e).__name__,
+                    attempt + 2,
+                    self.max_attempts,
+                    delay,
+                )
+                try:
+                    await asyncio.sleep(delay)
+                except asyncio.CancelledError:
+                    self.breaker.abandon()
+                    raise
+                continue
+
+            # Em stream o tempo medido é só até o início da resposta: não entra
+            # na janela usada pelo hedge
+            if not kwargs.get("stream"):
+                self.latencies.record(time.monotonic() - start)
+            self.breaker.record_success()
+            return result
+
+    def snapshot(self) -> dict:
+        p = self.latencies.percentile(self.hedge_percentile)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            f"latency_p{self.hedge_percentile:g}_ms": round(p * 1000, 2) if p is not None else None,
+            "breaker": self.breaker.snapshot(),
+        }
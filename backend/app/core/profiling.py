@@ -0,0 +1,226 @@
+"""
+Profiling sob demanda de uma única requisição (pyinstrument, opcional).
+
+Um administrador pede o profiling com ?profile=1 (ou o header X-Profile) e o
+header X-Admin-Token. A requisição roda sob o profiler por amostragem do
+começo ao fim (rota, moderação e serialização da resposta) e o resultado é
+gravado em PROFILING_OUTPUT_DIR no formato speedscope (https://speedscope.app)
+ou HTML. A resposta traz o id do arquivo em X-Profile-Id, baixado em
+GET /api/admin/profiles/{id}.
+
+Um rate limit global (PROFILING_MAX_PER_MINUTE) impede que o profiler, que
+deixa a requisição mais lenta, seja usado em volume: acima dele a requisição
+é atendida normalmente, sem profiling.
+"""
+
+import logging
+import os
+import secrets
+import time
+import uuid
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, List, Optional, TypeVar
+from urllib.parse import parse_qs
+
+from anyio import to_thread
+from starlette.requests import HTTPConnection
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+from app.core.admission import TokenBucketLimiter
+from app.core.config import settings
+
+# Sem PROFILING_ADMIN_TOKEN o profiling fica desligado: nem importa o pyinstrument
+Profiler = None
+if settings.profiling_admin_token:
+    try:
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+        from pyinstrument.session import Session
+    except ImportError:
+        Profiler = None
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROFILE_HEADER = "X-Profile"
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILE_FORMATS = {"speedscope": ".speedscope.json", "html": ".html"}
+
+
+def profiling_enabled() -> bool:
+    return Profiler is not None and bool(settings.profiling_admin_token)
+
+
+def is_admin(connection: HTTPConnection) -> bool:
+    """Confere o header X-Admin-Token com PROFILING_ADMIN_TOKEN (tempo constante)."""
+    token = connection.headers.get(ADMIN_TOKEN_HEADER)
+    if not token or not settings.profiling_admin_token:
+        return False
+    return secrets.compare_digest(token.encode("utf-8"), settings.profiling_admin_token.encode("utf-8"))
+
+
+class RequestProfile:
+    """Profiler da requisição e as sessões coletadas nas threads do threadpool."""
+
+    def __init__(self, profile_format: str):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.format = profile_format
+        self.profiler = Profiler(interval=settings.profiling_interval_ms / 1000, async_mode="enabled")
+        self.thread_sessions: List["Session"] = []
+
+    def session(self) -> "Session":
+        session = self.profiler.last_session
+        for thread_session in self.thread_sessions:
+            session = Session.combine(session, thread_session)
+        return session
+
+
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+def profiled(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Envolve uma função que vai rodar no threadpool (ex.: moderação) para que
+    ela entre no profiling da requisição atual. Sem profiling ativo, devolve
+    a própria função.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return fn
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        # O profiler da requisição só amostra a thread do event loop
+        thread_profiler = Profiler(interval=settings.profiling_interval_ms / 1000, async_mode="disabled")
+        thread_profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.thread_sessions.append(thread_profiler.stop())
+
+    return run
+
+
+class ProfileStore:
+    """Arquivos de profiling em disco, limitados aos max_files mais recentes."""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    def path(self, profile_id: str) -> Optional[str]:
+        for suffix in PROFILE_FORMATS.values():
+            candidate = os.path.join(self.directory, f"{profile_id}{suffix}")
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def list(self) -> List[dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            for profile_format, suffix in PROFILE_FORMATS.items():
+                if name.endswith(suffix):
+                    path = os.path.join(self.directory, name)
+                    profiles.append({
+                        "id": name[: -len(suffix)],
+                        "format": profile_format,
+                        "bytes": os.path.getsize(path),
+                    })
+        return profiles
+
+    def save(self, profile: RequestProfile) -> str:
+        session = profile.session()
+        renderer = SpeedscopeRenderer() if profile.format == "speedscope" else HTMLRenderer()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{profile.id}{PROFILE_FORMATS[profile.format]}")
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(renderer.render(session))
+        self._prune()
+        return path
+
+    def _prune(self) -> None:
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if any(name.endswith(suffix) for suffix in PROFILE_FORMATS.values())
+        )
+        for name in names[: max(0, len(names) - self.max_files)]:
+            os.remove(os.path.join(self.directory, name))
+
+
+profile_store = ProfileStore(settings.profiling_output_dir, settings.profiling_max_files)
+# Balde global (uma única chave): no máximo N profilings por minuto no processo
+profiling_rate_limiter = TokenBucketLimiter(rate=settings.profiling_max_per_minute / 60, burst=1)
+metrics.register_collector("profiling", lambda: {
+    "available": Profiler is not None,
+    "enabled": profiling_enabled(),
+    "allowed": profiling_rate_limiter.allowed,
+    "limited": profiling_rate_limiter.limited,
+})
+
+
+def _requested_format(scope: Scope) -> Optional[str]:
+    """Formato pedido via ?profile=... ou header X-Profile (1/true = formato padrão)."""
+    connection = HTTPConnection(scope)
+    value = connection.headers.get(PROFILE_HEADER)
+    if value is None:
+        values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile")
+        value = values[0] if values else None
+    if value is None or value.lower() in ("", "0", "false"):
+        return None
+    value = value.lower()
+    return value if value in PROFILE_FORMATS else settings.profiling_format
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI que aplica o profiling às requisições HTTP que o pedirem."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        profile_format = _requested_format(scope) if scope["type"] == "http" else None
+        if profile_format is None or not profiling_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        if not is_admin(HTTPConnection(scope)):
+            response = JSONResponse(status_code=403, content={"detail": "Token de administrador inválido."})
+            await response(scope, receive, send)
+            return
+
+        if profiling_rate_limiter.rate > 0 and profiling_rate_limiter.check("global"):
+            logger.info("Profiling recusado pelo rate limit: requisição atendida sem profiler")
+            await self.app(scope, receive, self._with_header(send, "X-Profile-Skipped", "rate_limited"))
+            return
+
+        profile = RequestProfile(profile_format)
+        token = current_profile.set(profile)
+        profile.profiler.start()
+        try:
+            await self.app(scope, receive, self._with_header(send, "X-Profile-Id", profile.id))
+        finally:
+            profile.profiler.stop()
+            current_profile.reset(token)
+            try:
+                # Renderizar e gravar é lento: fora do event loop, após a resposta
+                path = await to_thread.run_sync(profile_store.save, profile)
+                logger.info("Profiling da requisição %s %s gravado em %s", scope["method"], scope["path"], path)
+            except Exception as e:
+                logger.warning("Falha ao gravar o profiling %s: %s", profile.id, e)
+
+    @staticmethod
+    def _with_header(send: Send, name: str, value: str) -> Send:
+        async def send_with_header(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        return send_with_header
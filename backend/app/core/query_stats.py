@@ -0,0 +1,225 @@
+"""
+Estatísticas das consultas SQL por requisição.
+
+Listeners do SQLAlchemy contam as consultas e somam o tempo gasto no banco
+da requisição atual (ContextVar, que acompanha o threadpool e os engines
+asyncio). O total vai nos headers X-DB-Queries / X-DB-Time-Ms e no
+debug_performance do chat.
+
+Também registra no log as consultas acima de DB_SLOW_QUERY_MS (com os
+parâmetros ocultos: só tipo e tamanho) e detecta N+1: o mesmo SELECT
+repetido DB_N_PLUS_ONE_THRESHOLD vezes numa requisição. Com
+DB_N_PLUS_ONE_MODE=raise a consulta falha com NPlusOneQueryError, o que
+faz os testes quebrarem no ponto do laço.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+from app.core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+QUERIES_HEADER = "X-DB-Queries"
+TIME_HEADER = "X-DB-Time-Ms"
+N_PLUS_ONE_MODES = ("off", "warn", "raise")
+# Consultas longas são cortadas no log
+MAX_STATEMENT_CHARS = 1000
+
+
+class NPlusOneQueryError(RuntimeError):
+    """Mesmo SELECT repetido além do limite numa requisição (DB_N_PLUS_ONE_MODE=raise)."""
+
+
+class RequestQueryStats:
+    """Consultas de uma requisição (as rotas podem consultar de várias threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.total_ms = 0.0
+        self.selects: Counter = Counter()
+        self.n_plus_one: Optional[str] = None
+
+    def record(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self.queries += 1
+            self.total_ms += elapsed_ms
+
+    def count_select(self, statement: str, threshold: int) -> bool:
+        """Conta o SELECT; True na primeira vez em que ele atinge o limite."""
+        with self._lock:
+            self.selects[statement] += 1
+            if self.selects[statement] != threshold or self.n_plus_one is not None:
+                return False
+            self.n_plus_one = statement
+            return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"db_queries": self.queries, "db_ms": round(self.total_ms, 2)}
+
+
+current_query_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+class _Totals:
+    """Contadores do processo exportados em /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+        self.n_plus_one = 0
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"slow_queries": self.slow_queries, "n_plus_one": self.n_plus_one}
+
+
+_totals = _Totals()
+metrics.register_collector("db_queries", _totals.snapshot)
+
+
+def _describe(value: Any) -> Any:
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def redact_parameters(parameters: Any, executemany: bool = False) -> Any:
+    """Troca os valores dos parâmetros pelo tipo (e tamanho, para textos)."""
+    if executemany and isinstance(parameters, (list, tuple)):
+        first = redact_parameters(parameters[0]) if parameters else None
+        return {"linhas": len(parameters), "primeira": first}
+    if isinstance(parameters, dict):
+        return {key: _describe(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_describe(value) for value in parameters]
+    return _describe(parameters)
+
+
+def _n_plus_one_mode(config: Settings) -> str:
+    mode = config.db_n_plus_one_mode.lower()
+    if mode not in N_PLUS_ONE_MODES:
+        logger.warning("DB_N_PLUS_ONE_MODE inválido: '%s'. Usando 'warn'.", config.db_n_plus_one_mode)
+        return "warn"
+    return "off" if config.db_n_plus_one_threshold <= 0 else mode
+
+
+def instrument_engine_queries(engine: Engine, name: str, config: Settings) -> None:
+    """
+    Registra os listeners de consulta do engine (para engines asyncio, passe
+    o AsyncEngine.sync_engine).
+    """
+    slow_ms = config.db_slow_query_ms
+    threshold = config.db_n_plus_one_threshold
+    mode = _n_plus_one_mode(config)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_query_stats.get()
+        if stats is not None and mode != "off" and not executemany and statement.lstrip()[:6].upper() == "SELECT":
+            if stats.count_select(statement, threshold) and mode == "raise":
+                raise NPlusOneQueryError(
+                    f"Mesma consulta executada {threshold} vezes na requisição (N+1): "
+                    f"{statement[:MAX_STATEMENT_CHARS]}"
+                )
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    def _finish(context, statement, parameters, executemany) -> None:
+        start = getattr(context, "_query_start", None)
+        if start is None:
+            return
+        context._query_start = None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record(elapsed_ms)
+        if slow_ms > 0 and elapsed_ms >= slow_ms:
+            _totals.increment("slow_queries")
+            logger.warning(
+                "Consulta lenta (%.1fms) no engine %s",
+                elapsed_ms,
+                name,
+                extra={
+                    "db_ms": round(elapsed_ms, 2),
+                    "statement": statement[:MAX_STATEMENT_CHARS],
+                    "parameters": redact_parameters(parameters, executemany),
+                },
+            )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _finish(context, statement, parameters, executemany)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        context = exception_context.execution_context
+        if context is not None:
+            _finish(
+                context,
+                exception_context.statement or "",
+                exception_context.parameters,
+                getattr(context, "executemany", False),
+            )
+
+
+class QueryStatsMiddleware:
+    """Acompanha as consultas de cada requisição HTTP e as expõe nos headers."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Em respostas em streaming, só o que rodou até o primeiro byte
+                data = stats.snapshot()
+                headers = list(message.get("headers", []))
+                headers.append((QUERIES_HEADER.lower().encode("latin-1"), str(data["db_queries"]).encode("latin-1")))
+                headers.append((TIME_HEADER.lower().encode("latin-1"), str(data["db_ms"]).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
+            if stats.n_plus_one is not None:
+                _totals.increment("n_plus_one")
+                logger.warning(
+                    "Possível N+1 em %s %s: consulta repetida %s vezes",
+                    scope["method"],
+                    scope["path"],
+                    stats.selects[stats.n_plus_one],
+                    extra={"statement": stats.n_plus_one[:MAX_STATEMENT_CHARS], **stats.snapshot()},
+                )
+
+
+def query_stats_snapshot() -> dict:
+    """Consultas da requisição atual até aqui (vazio fora de uma requisição)."""
+    stats = current_query_stats.get()
+    return stats.snapshot() if stats is not None else {}
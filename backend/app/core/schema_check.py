@@ -0,0 +1,267 @@
+"""
+Verificação rápida do schema na subida do container.
+
+Rodar `alembic upgrade head` em todo boot importa o ambiente inteiro do
+Alembic (e a aplicação) mesmo quando o banco já está na última revisão. Aqui
+as revisões são lidas direto dos arquivos de alembic/versions (sem importar o
+Alembic) e comparadas com alembic_version numa única consulta; o Alembic só
+roda quando o banco está atrás da head.
+
+A espera pelo banco usa backoff exponencial (DB_BOOT_BACKOFF_INITIAL_SECONDS,
+dobrando até DB_BOOT_BACKOFF_MAX_SECONDS, por no máximo DB_BOOT_WAIT_SECONDS).
+Os tempos de cada etapa vão para SCHEMA_CHECK_REPORT_PATH, que o startup da
+aplicação inclui nos tempos de inicialização (/metrics, chave "startup").
+
+Uso (a partir de backend/, como no start.sh):
+    python -m app.core.schema_check            # só verifica (exit 0 = atualizado)
+    python -m app.core.schema_check --upgrade  # roda o Alembic se necessário
+"""
+
+import argparse
+import ast
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import NullPool
+
+from app.core.config import Settings, settings
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+VERSIONS_DIR = BACKEND_DIR / "alembic" / "versions"
+
+T = TypeVar("T")
+
+
+class DatabaseUnavailableError(RuntimeError):
+    """O banco não respondeu dentro de DB_BOOT_WAIT_SECONDS."""
+
+
+@dataclass
+class SchemaStatus:
+    """Resultado da verificação (tempos em ms)."""
+
+    heads: List[str]
+    stored: List[str]
+    current: bool
+    attempts: int = 0
+    wait_ms: float = 0.0
+    check_ms: float = 0.0
+    migrate_ms: Optional[float] = None
+    migrated: bool = False
+    total_ms: Optional[float] = None
+
+
+def _literal(node: ast.AST):
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        return None
+
+
+def read_revisions(versions_dir: Path = VERSIONS_DIR) -> Dict[str, Set[str]]:
+    """revision -> down_revisions de cada script, lidos com ast (sem executar os arquivos)."""
+    revisions: Dict[str, Set[str]] = {}
+    for path in sorted(versions_dir.glob("*.py")):
+        values = {}
+        for node in ast.parse(path.read_text(encoding="utf-8"), filename=str(path)).body:
+            if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.value is not None:
+                values[node.target.id] = _literal(node.value)
+            elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                values[node.targets[0].id] = _literal(node.value)
+        revision = values.get("revision")
+        if not isinstance(revision, str):
+            continue
+        down = values.get("down_revision")
+        if down is None:
+            revisions[revision] = set()
+        elif isinstance(down, str):
+            revisions[revision] = {down}
+        else:
+            revisions[revision] = set(down)
+    return revisions
+
+
+def script_heads(versions_dir: Path = VERSIONS_DIR) -> Set[str]:
+    """Revisões que nenhum outro script tem como down_revision (as heads do Alembic)."""
+    revisions = read_revisions(versions_dir)
+    parents = set().union(*revisions.values()) if revisions else set()
+    return set(revisions) - parents
+
+
+def with_backoff(
+    operation: Callable[[], T],
+    config: Settings = settings,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Tuple[T, int]:
+    """
+    Repete a operação com espera exponencial até dar certo ou estourar
+    DB_BOOT_WAIT_SECONDS. Devolve (resultado, tentativas).
+    """
+    deadline = time.monotonic() + config.db_boot_wait_seconds
+    delay = config.db_boot_backoff_initial_seconds
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return operation(), attempt
+        except Exception as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DatabaseUnavailableError(
+                    f"Banco indisponível após {attempt} tentativas: {e}"
+                ) from e
+            wait = min(delay, remaining)
+            logger.info("⏳ Banco indisponível (tentativa %s): %s. Nova tentativa em %.1fs", attempt, e, wait)
+            sleep(wait)
+            delay = min(delay * 2, config.db_boot_backoff_max_seconds)
+
+
+def _boot_engine(config: Settings) -> Engine:
+    url = config.database_url
+    connect_args = {}
+    if make_url(url).get_backend_name() == "mysql":
+        # Falha rápido e deixa o backoff decidir quando tentar de novo
+        connect_args["connect_timeout"] = 5
+    return create_engine(url, poolclass=NullPool, connect_args=connect_args)
+
+
+def _stored_revisions(engine: Engine) -> List[str]:
+    """Revisões em alembic_version (vazio se a tabela ainda não existe)."""
+    with engine.connect() as conn:
+        try:
+            return [row[0] for row in conn.execute(text("SELECT version_num FROM alembic_version"))]
+        except DBAPIError as e:
+            # Conectou, então o erro é da consulta: banco sem migrations ainda
+            if e.connection_invalidated:
+                raise
+            return []
+
+
+def check_schema(config: Settings = settings, versions_dir: Path = VERSIONS_DIR) -> SchemaStatus:
+    """Espera o banco (com backoff) e compara alembic_version com as heads dos scripts."""
+    heads = script_heads(versions_dir)
+    engine = _boot_engine(config)
+    try:
+        started = time.perf_counter()
+        if make_url(config.database_url).get_backend_name() == "mysql":
+            # Cria o banco se preciso (antes ficava a cargo do Alembic)
+            from app.database import ensure_database_exists
+
+            _, attempts = with_backoff(ensure_database_exists, config)
+        else:
+            _, attempts = with_backoff(lambda: engine.connect().close(), config)
+        wait_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        stored = _stored_revisions(engine)
+        check_ms = (time.perf_counter() - started) * 1000
+    finally:
+        engine.dispose()
+
+    return SchemaStatus(
+        heads=sorted(heads),
+        stored=sorted(stored),
+        current=bool(heads) and set(stored) == heads,
+        attempts=attempts,
+        wait_ms=round(wait_ms, 2),
+        check_ms=round(check_ms, 2),
+    )
+
+
+def run_migrations(config: Settings = settings, retries: int = 3) -> None:
+    """`alembic upgrade head` no próprio processo, com backoff entre as tentativas."""
+    from alembic import command
+    from alembic.config import Config
+
+    alembic_config = Config(str(BACKEND_DIR / "alembic.ini"))
+    delay = config.db_boot_backoff_initial_seconds
+    for attempt in range(1, retries + 1):
+        try:
+            command.upgrade(alembic_config, "head")
+            return
+        except Exception as e:
+            if attempt == retries:
+                raise
+            logger.warning("❌ Falha nas migrations (tentativa %s/%s): %s", attempt, retries, e)
+            time.sleep(delay)
+            delay = min(delay * 2, config.db_boot_backoff_max_seconds)
+
+
+def write_report(status: SchemaStatus, path: str) -> None:
+    if not path:
+        return
+    try:
+        with open(path, "w", encoding="utf-8") as output:
+            json.dump(asdict(status), output)
+    except OSError as e:
+        logger.warning("Não foi possível gravar o relatório do boot em %s: %s", path, e)
+
+
+def read_report(path: str) -> Optional[dict]:
+    """Relatório gravado pelo start.sh nesta subida do container (ou None)."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as report:
+            return json.load(report)
+    except (OSError, ValueError) as e:
+        logger.warning("Relatório do boot inválido em %s: %s", path, e)
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upgrade", action="store_true", help="Roda o Alembic quando o banco está atrás da head")
+    parser.add_argument("--report", default=settings.schema_check_report_path, help="Arquivo JSON com os tempos")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    started = time.perf_counter()
+    try:
+        status = check_schema()
+    except DatabaseUnavailableError as e:
+        logger.error("❌ %s", e)
+        return 2
+
+    logger.info(
+        "📌 Revisão no banco: %s | head dos scripts: %s (%s tentativa(s), espera %.0f ms, consulta %.1f ms)",
+        ", ".join(status.stored) or "nenhuma",
+        ", ".join(status.heads),
+        status.attempts,
+        status.wait_ms,
+        status.check_ms,
+    )
+    if status.current:
+        logger.info("✅ Schema atualizado; migrations puladas")
+    elif args.upgrade:
+        logger.info("📊 Schema desatualizado; executando alembic upgrade head...")
+        migrate_started = time.perf_counter()
+        try:
+            run_migrations()
+        except Exception as e:
+            logger.error("❌ Migrations falharam: %s", e)
+            return 1
+        status.migrate_ms = round((time.perf_counter() - migrate_started) * 1000, 2)
+        status.migrated = True
+        logger.info("✅ Migrations executadas em %.0f ms", status.migrate_ms)
+    else:
+        logger.info("⚠️  Schema desatualizado; rode alembic upgrade head")
+
+    status.total_ms = round((time.perf_counter() - started) * 1000, 2)
+    write_report(status, args.report)
+    return 0 if status.current or status.migrated else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Single-flight: coalescência de operações idênticas concorrentes.
+Enquanto uma operação com determinada chave está em andamento, chamadas com a
+mesma chave aguardam o mesmo resultado em vez de repetir o trabalho.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave numa única execução."""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.calls = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Executa fn() uma única vez por chave entre chamadas concorrentes.
+
+        A execução roda numa task própria: se a requisição que a iniciou for
+        cancelada (cliente desconectou), as demais continuam aguardando. Se
+        todas desistirem, a execução é cancelada.
+
+        Returns:
+            Tuple[T, bool]: (resultado, compartilhado) - compartilhado é True
+            quando o resultado veio de uma execução iniciada por outra chamada
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                # Último interessado desistiu: não vale a pena continuar
+                self.abandoned += 1
+                task.cancel()
+            raise
+        finally:
+            remaining = self._waiters.get(task, 0) - 1
+            if remaining > 0:
+                self._waiters[task] = remaining
+            else:
+                self._waiters.pop(task, None)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Marca a exceção como consumida caso todos os interessados tenham desistido
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.calls - self.shared,
+            "shared": self.shared,
+            "coalescing_rate": round(self.shared / self.calls, 4) if self.calls else 0.0,
+            "in_flight": len(self._in_flight),
+            "abandoned": self.abandoned,
+        }
@@ -0,0 +1,294 @@
+"""
+Tracing distribuído com OpenTelemetry (opcional).
+
+Uma requisição do navegador (header traceparent) vira o span do servidor, com
+filhos para o chat, a moderação, as consultas SQL e a chamada à OpenAI.
+Exportadores (TRACING_EXPORTER):
+
+- none: desabilitado (padrão); nenhum listener ou middleware é registrado
+- console: imprime os spans no stdout
+- file: um span em JSON por linha em TRACING_FILE_PATH (uso offline)
+- otlp: envia para um coletor OTLP/HTTP (OTEL_EXPORTER_OTLP_ENDPOINT)
+
+A amostragem (TRACING_SAMPLE_RATIO) é decidida no servidor pelo trace id,
+inclusive quando o navegador envia o traceparent; spans não amostrados não
+gravam nada. Requer opentelemetry-sdk; sem ele o tracing fica desabilitado.
+"""
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import Settings, settings
+
+trace = None
+SpanExporter = object
+# Com TRACING_EXPORTER=none o SDK nem é importado
+if settings.tracing_exporter.lower() != "none":
+    try:
+        from opentelemetry import propagate, trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import (
+            BatchSpanProcessor,
+            ConsoleSpanExporter,
+            SpanExporter,
+            SpanExportResult,
+        )
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+        from opentelemetry.trace import SpanKind, Status, StatusCode
+    except ImportError:
+        trace = None
+        SpanExporter = object
+
+logger = logging.getLogger(__name__)
+
+TRACE_ID_HEADER = "X-Trace-Id"
+# Consultas longas são cortadas no atributo db.statement
+MAX_STATEMENT_CHARS = 2000
+
+
+class _NoopSpan:
+    """Span usado quando o tracing está desabilitado."""
+
+    def set_attribute(self, key, value) -> None:
+        pass
+
+    def set_attributes(self, attributes) -> None:
+        pass
+
+    def is_recording(self) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+_tracer = None
+_provider = None
+
+
+class FileSpanExporter(SpanExporter):
+    """Grava cada span como uma linha JSON (formato do ConsoleSpanExporter, compacto)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans) -> "SpanExportResult":
+        lines = "".join(json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n" for span in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as output:
+                output.write(lines)
+        except OSError as e:
+            logger.warning("Falha ao gravar spans em %s: %s", self.path, e)
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def _create_exporter(config: Settings):
+    exporter = config.tracing_exporter.lower()
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    if exporter == "file":
+        return FileSpanExporter(config.tracing_file_path)
+    if exporter == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("opentelemetry-exporter-otlp não está instalado. Tracing desabilitado.")
+            return None
+        return OTLPSpanExporter()
+    if exporter != "none":
+        logger.warning("TRACING_EXPORTER desconhecido: %s. Tracing desabilitado.", exporter)
+    return None
+
+
+def setup_tracing(config: Settings) -> None:
+    """Configura o TracerProvider conforme as Settings (feito no import deste módulo)."""
+    global _tracer, _provider
+    if _tracer is not None or config.tracing_exporter.lower() == "none":
+        return
+    if trace is None:
+        logger.warning("opentelemetry-sdk não está instalado. Tracing desabilitado.")
+        return
+    exporter = _create_exporter(config)
+    if exporter is None:
+        return
+
+    ratio = TraceIdRatioBased(min(1.0, max(0.0, config.tracing_sample_ratio)))
+    # O traceparent do navegador define o trace id, mas não a decisão de amostragem
+    sampler = ParentBased(root=ratio, remote_parent_sampled=ratio, remote_parent_not_sampled=ratio)
+    _provider = TracerProvider(
+        sampler=sampler,
+        resource=Resource.create({"service.name": config.tracing_service_name}),
+    )
+    # Exporta em lote numa thread própria: a requisição só enfileira o span
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _provider.get_tracer("app")
+    logger.info("Tracing habilitado (exportador %s, amostragem %s)", config.tracing_exporter, config.tracing_sample_ratio)
+
+
+def shutdown_tracing() -> None:
+    """Exporta os spans pendentes (chamado no shutdown)."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def span(name: str, attributes: Optional[dict] = None, kind: str = "internal") -> Iterator:
+    """
+    Abre um span filho do span atual (kind: "internal", "client" ou "server").
+    Com o tracing desabilitado devolve um span vazio, então o código
+    instrumentado não precisa checar nada.
+    """
+    if _tracer is None:
+        yield NOOP_SPAN
+        return
+    with _tracer.start_as_current_span(
+        name, kind=SpanKind[kind.upper()], attributes=_clean(attributes)
+    ) as current:
+        yield current
+
+
+def current_span():
+    """Span atual (para acrescentar atributos), ou um span vazio."""
+    if _tracer is None:
+        return NOOP_SPAN
+    return trace.get_current_span()
+
+
+def _clean(attributes: Optional[dict]) -> Optional[dict]:
+    # O OpenTelemetry não aceita None como valor de atributo
+    if not attributes:
+        return None
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+def set_attributes(target, attributes: dict) -> None:
+    """Acrescenta atributos ignorando valores None."""
+    cleaned = _clean(attributes)
+    if cleaned and target.is_recording():
+        target.set_attributes(cleaned)
+
+
+def instrument_engine_tracing(engine: Engine, name: str) -> None:
+    """
+    Cria um span por consulta SQL do engine (para engines asyncio, passe o
+    AsyncEngine.sync_engine). Só há span quando a consulta acontece dentro de
+    um trace amostrado; o texto da consulta vai sem os parâmetros.
+    """
+    if _tracer is None:
+        return
+    system = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.setdefault("_trace_spans", [])
+        if not trace.get_current_span().is_recording():
+            # Marca a consulta sem span para manter a pilha alinhada com o after
+            spans.append(None)
+            return
+        operation = statement.split(None, 1)[0].upper() if statement.strip() else "SQL"
+        query_span = _tracer.start_span(
+            f"db {operation}",
+            kind=SpanKind.CLIENT,
+            attributes={
+                "db.system": system,
+                "db.statement": statement[:MAX_STATEMENT_CHARS],
+                "db.operation": operation,
+                "db.engine": name,
+                "db.executemany": executemany,
+            },
+        )
+        spans.append(query_span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("_trace_spans")
+        query_span = spans.pop() if spans else None
+        if query_span is not None:
+            if cursor is not None and cursor.rowcount is not None and cursor.rowcount >= 0:
+                query_span.set_attribute("db.rowcount", cursor.rowcount)
+            query_span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        spans = conn.info.get("_trace_spans") if conn is not None else None
+        query_span = spans.pop() if spans else None
+        if query_span is not None:
+            query_span.record_exception(exception_context.original_exception)
+            query_span.set_status(Status(StatusCode.ERROR))
+            query_span.end()
+
+
+class TracingMiddleware:
+    """
+    Span do servidor para cada requisição HTTP, continuando o trace do
+    navegador (traceparent). A resposta traz o trace id em X-Trace-Id.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        parent = propagate.extract(carrier)
+        with _tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=parent,
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]},
+        ) as server_span:
+            trace_id = format(server_span.get_span_context().trace_id, "032x")
+
+            async def send_with_trace(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    server_span.set_attribute("http.response.status_code", status_code)
+                    if status_code >= 500:
+                        server_span.set_status(Status(StatusCode.ERROR))
+                    if server_span.is_recording():
+                        headers = list(message.get("headers", []))
+                        headers.append((TRACE_ID_HEADER.lower().encode("latin-1"), trace_id.encode("latin-1")))
+                        message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+            # Nome com o template da rota ("/api/characters/{character_id}") agrupa melhor
+            server_span.update_name(f"{scope['method']} {_route_template(scope)}")
+
+
+def _route_template(scope: Scope) -> str:
+    """Troca, no path da requisição, os valores dos parâmetros da rota pelos nomes."""
+    by_value = {str(value): name for name, value in (scope.get("path_params") or {}).items()}
+    if not by_value:
+        return scope["path"]
+    return "/".join(
+        f"{{{by_value[segment]}}}" if segment in by_value else segment
+        for segment in scope["path"].split("/")
+    )
+
+
+# Antes da criação dos engines em app.database, que registram os listeners de SQL
+setup_tracing(settings)
@@ -1,15 +1,29 @@
+import logging
+
 import pymysql
+from fastapi import Request
+from starlette.requests import HTTPConnection
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from app.core.config import settings
+from app.core import metrics
+from app.core.clients import get_client_key
+from app.core.config import settings, to_async_url
+from app.core.db_instrumentation import engine_options, instrument_engine
+from app.core.query_stats import instrument_engine_queries
+from app.core.tracing import instrument_engine_tracing
+from app.core.db_routing import ReadYourWritesTracker, ReplicaMonitor, ReplicaRouter, RoutingSession
 from app.models.base import Base  # noqa: F401  (ensures metadata import)
 
+logger = logging.getLogger(__name__)
+
 
 def ensure_database_exists():
     """
     Verifica se o banco de dados existe e cria se não existir.
-    Deve ser chamado antes de criar o engine com o database_url.
+    Deve ser chamado antes da primeira conexão do engine (ver check_database_exists).
     """
     try:
         # Conecta ao MySQL sem especificar o banco de dados
@@ -18,7 +32,8 @@ def ensure_database_exists():
             port=settings.db_port,
             user=settings.db_user,
             password=settings.db_password,
-            charset='utf8mb4'
+            charset='utf8mb4',
+            connect_timeout=5,
         )
         
         with connection.cursor() as cursor:
@@ -43,26 +58,179 @@ def ensure_database_exists():
         raise
 
 
-# Garante que o banco existe antes de criar o engine
-# Não falha se o MySQL não estiver disponível - apenas loga o erro
-try:
-    ensure_database_exists()
-except Exception as e:
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.warning(f"⚠️  Não foi possível verificar/criar banco de dados: {e}")
-    logger.warning("   Isso é normal se o MySQL ainda não estiver disponível.")
-    logger.warning("   O Alembic tentará criar o banco durante as migrations.")
+def check_database_exists() -> None:
+    """
+    Passo do startup da aplicação (não do import do módulo, que não deve abrir
+    conexões): garante que o banco MySQL existe. Não falha se o MySQL não
+    estiver disponível - apenas loga o erro.
+    """
+    if make_url(settings.database_url).get_backend_name() != "mysql":
+        return
+    try:
+        ensure_database_exists()
+    except Exception as e:
+        logger.warning("⚠️  Não foi possível verificar/criar banco de dados: %s", e)
+        logger.warning("   Isso é normal se o MySQL ainda não estiver disponível.")
+        logger.warning("   O Alembic tentará criar o banco durante as migrations.")
+
+engine = create_engine(
+    settings.database_url, **engine_options(settings, settings.database_url, "primary")
+)
+instrument_engine(engine, "primary", settings)
+instrument_engine_tracing(engine, "primary")
+instrument_engine_queries(engine, "primary", settings)
+
+replica_engines = []
+for index, replica_url in enumerate(settings.database_replica_urls):
+    replica_engine = create_engine(
+        replica_url, **engine_options(settings, replica_url, f"replica_{index}")
+    )
+    instrument_engine(replica_engine, f"replica_{index}", settings)
+    instrument_engine_tracing(replica_engine, f"replica_{index}")
+    instrument_engine_queries(replica_engine, f"replica_{index}", settings)
+    replica_engines.append(replica_engine)
+
+replica_router = ReplicaRouter(
+    engine,
+    replica_engines,
+    ReplicaMonitor(
+        replica_engines,
+        max_lag_seconds=settings.db_replica_max_lag_seconds,
+        check_interval_seconds=settings.db_replica_check_interval_seconds,
+    ),
+)
+read_your_writes = ReadYourWritesTracker(settings.db_read_your_writes_seconds)
+metrics.register_collector("db_replicas", replica_router.snapshot)
+
+SessionLocal = sessionmaker(
+    class_=RoutingSession, autocommit=False, autoflush=False, bind=engine, router=replica_router
+)
+
+# Engines asyncio (aiomysql; aiosqlite para SQLite) usados pelas rotas async.
+# O roteamento para réplicas reaproveita a RoutingSession via sync_session_class.
+async_engine = create_async_engine(
+    settings.async_database_url,
+    **engine_options(settings, settings.async_database_url, "primary_async", is_async=True),
+)
+instrument_engine(async_engine.sync_engine, "primary_async", settings)
+instrument_engine_tracing(async_engine.sync_engine, "primary_async")
+instrument_engine_queries(async_engine.sync_engine, "primary_async", settings)
+
+async_replica_engines = []
+for index, replica_url in enumerate(settings.database_replica_urls):
+    replica_url = to_async_url(replica_url)
+    replica_engine = create_async_engine(
+        replica_url, **engine_options(settings, replica_url, f"replica_{index}_async", is_async=True)
+    )
+    instrument_engine(replica_engine.sync_engine, f"replica_{index}_async", settings)
+    instrument_engine_tracing(replica_engine.sync_engine, f"replica_{index}_async")
+    instrument_engine_queries(replica_engine.sync_engine, f"replica_{index}_async", settings)
+    async_replica_engines.append(replica_engine)
 
-engine = create_engine(settings.database_url, pool_pre_ping=True)
+async_replica_router = ReplicaRouter(
+    async_engine.sync_engine,
+    [replica_engine.sync_engine for replica_engine in async_replica_engines],
+    ReplicaMonitor(
+        [replica_engine.sync_engine for replica_engine in async_replica_engines],
+        max_lag_seconds=settings.db_replica_max_lag_seconds,
+        check_interval_seconds=settings.db_replica_check_interval_seconds,
+    ),
+)
+metrics.register_collector("db_replicas_async", async_replica_router.snapshot)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    # As respostas são montadas depois do commit; evita lazy loads (proibidos em asyncio)
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    router=async_replica_router,
+)
 
 
 def get_db():
+    """Sessão no primário (escritas e leituras que exigem o dado mais recente)."""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+
+def get_write_db(request: Request):
+    """
+    Sessão no primário para rotas de escrita.
+
+    Marca o cliente para que suas próximas leituras, dentro da janela de
+    read-your-writes, também sejam servidas pelo primário.
+    """
+    client_key = get_client_key(request)
+    read_your_writes.mark_write(client_key)
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        # Reinicia a janela a partir do fim da escrita
+        read_your_writes.mark_write(client_key)
+
+
+def get_read_db(request: Request):
+    """Sessão que envia os SELECTs para uma réplica saudável, quando houver."""
+    use_replica = bool(replica_engines)
+    if use_replica and read_your_writes.requires_primary(get_client_key(request)):
+        replica_router.record("read_your_writes")
+        use_replica = False
+    db = SessionLocal(use_replica=use_replica)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+
+async def get_async_db():
+    """Versão asyncio de get_db."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_write_db(request: Request):
+    """Versão asyncio de get_write_db."""
+    client_key = get_client_key(request)
+    read_your_writes.mark_write(client_key)
+    try:
+        async with AsyncSessionLocal() as db:
+            yield db
+    finally:
+        read_your_writes.mark_write(client_key)
+
+
+def get_read_preference(request: HTTPConnection) -> bool:
+    """Indica se as leituras assíncronas desta requisição podem ir para uma réplica."""
+    use_replica = bool(async_replica_engines)
+    if use_replica and read_your_writes.requires_primary(get_client_key(request)):
+        async_replica_router.record("read_your_writes")
+        use_replica = False
+    return use_replica
+
+
+async def get_async_read_db(request: Request):
+    """Versão asyncio de get_read_db."""
+    async with AsyncSessionLocal(use_replica=get_read_preference(request)) as db:
+        yield db
+
+
+def dispose_engines_after_fork() -> None:
+    """
+    Descarta os pools de conexão herdados do processo mestre do gunicorn.
+
+    Com preload_app a aplicação é importada antes do fork; conexões abertas no
+    mestre não podem ser compartilhadas entre processos. close=False apenas
+    esquece as conexões herdadas (sem fechar o socket do pai) e cada worker
+    abre as suas.
+    """
+    for sync_engine in [engine, *replica_engines]:
+        sync_engine.dispose(close=False)
+    for async_engine_ in [async_engine, *async_replica_engines]:
+        async_engine_.sync_engine.dispose(close=False)
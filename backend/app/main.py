@@ -1,3 +1,8 @@
+import asyncio
+import importlib
+import time
+
+from anyio import to_thread
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -5,40 +10,66 @@ from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
 import logging
 
+from app.api.routes.admin import router as admin_router
 from app.api.routes.characters import router as characters_router
 from app.api.routes.chat import router as chat_router
+from app.api.routes.usage import router as usage_router
+from app.core import metrics
 from app.core.config import settings
-from app.core.guardrails import initialize_guardrails, ModerationLevel
+from app.core.disk_cache import disk_cache
+from app.core.logging_setup import setup_logging, truncate_for_log
+from app.core.profiling import ProfilingMiddleware
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.schema_check import read_report
+from app.core.tracing import TracingMiddleware, shutdown_tracing
+from app.database import check_database_exists
+from app.core.guardrails import configured_moderation_level, guardrails_ready, initialize_guardrails
+from app.services.invalidation import invalidation_bus
+from app.services.ledger import usage_ledger
 
 logger = logging.getLogger(__name__)
+setup_logging(settings)
 
 app = FastAPI(title=settings.app_name)
 
+# Tempos (ms) das etapas da inicialização, incluindo a verificação do schema
+# feita pelo start.sh antes de o servidor subir
+startup_timings: dict = {}
+metrics.register_collector("startup", lambda: startup_timings)
+
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Captura erros de validação do Pydantic e loga detalhes."""
     body = await request.body()
-    logger.error(f"❌ Erro de validação na rota {request.url.path}:")
-    logger.error(f"   Método: {request.method}")
-    logger.error(f"   Erros: {exc.errors()}")
-    try:
-        import json
-        body_str = json.dumps(json.loads(body.decode('utf-8')), indent=2, ensure_ascii=False)
-        logger.error(f"   Body recebido:\n{body_str}")
-    except Exception:
-        logger.error(f"   Body recebido (raw): {body.decode('utf-8', errors='ignore')[:500]}")
+    # Um único registro, com o corpo cortado em LOG_MAX_BODY_CHARS
+    logger.error(
+        "❌ Erro de validação na rota %s %s",
+        request.method,
+        request.url.path,
+        extra={
+            "errors": exc.errors(),
+            "body": truncate_for_log(body.decode("utf-8", errors="ignore"), settings.log_max_body_chars),
+        },
+    )
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={"detail": exc.errors()},
     )
 
+# Profiling sob demanda (?profile=1 + X-Admin-Token); o CORS fica por fora
+app.add_middleware(ProfilingMiddleware)
+# Span do servidor por requisição (só com TRACING_EXPORTER configurado)
+app.add_middleware(TracingMiddleware)
+# Contagem e tempo das consultas SQL da requisição (headers X-DB-Queries / X-DB-Time-Ms)
+app.add_middleware(QueryStatsMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "X-DB-Time-Ms", "X-Trace-Id"],
 )
 
 
@@ -47,29 +78,97 @@ def health_check():
     return {"status": "ok"}
 
 
+@app.get("/metrics", tags=["health"])
+async def metrics_snapshot():
+    """Exporta as métricas internas (pool do banco, threadpool etc.)."""
+    limiter = to_thread.current_default_thread_limiter()
+    data = metrics.collect()
+    # Permite comparar o tamanho do pool do banco com o threadpool das rotas síncronas
+    data["threadpool"] = {
+        "total_tokens": limiter.total_tokens,
+        "borrowed_tokens": limiter.borrowed_tokens,
+    }
+    return data
+
+
 app.include_router(characters_router, prefix=settings.api_prefix)
 app.include_router(chat_router, prefix=settings.api_prefix)
+app.include_router(admin_router, prefix=settings.api_prefix)
+app.include_router(usage_router, prefix=settings.api_prefix)
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Inicializa os guardrails na inicialização da aplicação."""
+def load_guardrails():
+    """Inicializa os guardrails (e o modelo de toxicidade) conforme as configurações."""
     if settings.moderation_enabled:
         try:
-            # Converte string para ModerationLevel
-            level_map = {
-                "strict": ModerationLevel.STRICT,
-                "moderate": ModerationLevel.MODERATE,
-                "permissive": ModerationLevel.PERMISSIVE
-            }
-            moderation_level = level_map.get(
-                settings.moderation_level.lower(),
-                ModerationLevel.MODERATE
-            )
-            initialize_guardrails(moderation_level=moderation_level)
+            initialize_guardrails(moderation_level=configured_moderation_level())
         except Exception as e:
             # Log do erro mas não impede a inicialização da aplicação
             import logging
             logger = logging.getLogger(__name__)
-            logger.warning(f"Erro ao inicializar guardrails: {e}. Moderação desabilitada.")
+            logger.warning("Erro ao inicializar guardrails: %s. Moderação desabilitada.", e)
+
+
+def warm_up():
+    """
+    Carrega o que o import da aplicação adia: o SDK da OpenAI (~0,5 s) e os
+    guardrails (modelo de toxicidade, com o torch).
+    """
+    started = time.perf_counter()
+    importlib.import_module("openai")
+    # Com o gunicorn (gunicorn.conf.py) o modelo já foi carregado no processo
+    # mestre antes do fork e é compartilhado com os workers (copy-on-write)
+    if not guardrails_ready():
+        load_guardrails()
+    startup_timings["warm_up_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
+async def _timed_step(name: str, step) -> None:
+    """Executa uma etapa do startup e guarda a duração em startup_timings."""
+    started = time.perf_counter()
+    await step
+    startup_timings[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Prepara banco, caches e tarefas em segundo plano na inicialização da aplicação."""
+    started = time.perf_counter()
+    # O servidor passa a aceitar conexões sem esperar o modelo: ele carrega numa
+    # thread e a primeira moderação, se chegar antes, espera o carregamento
+    app.state.warm_up = asyncio.create_task(to_thread.run_sync(warm_up))
+    # Verificação do schema feita pelo start.sh nesta subida (espera pelo banco,
+    # consulta à alembic_version e, se precisou, as migrations)
+    schema_check = await to_thread.run_sync(read_report, settings.schema_check_report_path)
+    if schema_check is not None:
+        startup_timings["schema_check"] = schema_check
+    # Antes feito no import de app.database (e em todo import da aplicação)
+    await _timed_step("check_database", to_thread.run_sync(check_database_exists))
+    # Em cada worker (depois do fork): escuta as invalidações dos demais
+    await _timed_step("invalidation_bus", invalidation_bus.start())
+    # O cache em disco sobrevive aos reinícios: descarta só o que já expirou
+    await _timed_step("disk_cache_purge", to_thread.run_sync(disk_cache.purge_expired))
+    # Gravação em lote do registro de uso do chat
+    await _timed_step("usage_ledger", usage_ledger.start())
+    startup_timings["startup_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info(
+        "Startup concluído em %.0f ms (schema no boot: %s)",
+        startup_timings["startup_ms"],
+        _describe_schema_check(schema_check),
+    )
+
+
+def _describe_schema_check(report) -> str:
+    if report is None:
+        return "não verificado"
+    if report.get("migrated"):
+        return f"migrations em {report.get('migrate_ms', 0):.0f} ms"
+    return f"atualizado, verificado em {report.get('total_ms') or 0:.0f} ms"
+
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await invalidation_bus.stop()
+    # Grava os registros de uso ainda na fila
+    await usage_ledger.stop()
+    shutdown_tracing()
@@ -1,4 +1,5 @@
 from app.models.character import Character  # noqa: F401
 from app.models.phrase import Phrase  # noqa: F401
+from app.models.usage import ChatTranscript, ChatUsage  # noqa: F401
 
-__all__ = ["Character", "Phrase"]
+__all__ = ["Character", "Phrase", "ChatUsage", "ChatTranscript"]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Integer, String, Text, func
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, func
 from sqlalchemy.dialects.mysql import JSON
 from sqlalchemy.orm import relationship
 
@@ -9,6 +9,10 @@ class Character(Base):
     """Represents a playable chatbot persona."""
 
     __tablename__ = "characters"
+    __table_args__ = (
+        # Busca textual (ver app.services.search); só tem efeito no MySQL
+        Index("ft_characters_search", "name", "description", "who_is_character", mysql_prefix="FULLTEXT"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), unique=True, nullable=False)
@@ -17,6 +21,8 @@ class Character(Base):
     personality_traits = Column(JSON, nullable=True)
     image_url = Column(Text, nullable=True)
     who_is_character = Column(String(255), nullable=False)
+    # Ajustes de roteamento do chat (modelo, max_tokens, temperatura, SLO)
+    chat_settings = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
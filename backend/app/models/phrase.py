@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, func
 from sqlalchemy.orm import relationship
 
 from app.models.base import Base
@@ -8,6 +8,9 @@ class Phrase(Base):
     """Represents a phrase (fala) associated with a character and a purpose."""
 
     __tablename__ = "phrases"
+    __table_args__ = (
+        Index("ft_phrases_phrase", "phrase", mysql_prefix="FULLTEXT"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     character_id = Column(Integer, ForeignKey("characters.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -0,0 +1,44 @@
+from sqlalchemy import Boolean, Column, DateTime, Float, Index, Integer, String, Text
+from sqlalchemy.dialects.mysql import JSON
+
+from app.models.base import Base
+
+
+class ChatUsage(Base):
+    """One chat reply: tokens, stage timings and moderation outcome (write-behind ledger)."""
+
+    __tablename__ = "chat_usage"
+    __table_args__ = (
+        Index("ix_chat_usage_character_created", "character_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    request_id = Column(String(32), nullable=False, index=True)
+    # Sem chave estrangeira: o histórico de uso continua após excluir o personagem
+    character_id = Column(Integer, nullable=False)
+    channel = Column(String(20), nullable=False)
+    route = Column(String(50), nullable=True)
+    model = Column(String(100), nullable=True)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    total_ms = Column(Float, nullable=True)
+    openai_ms = Column(Float, nullable=True)
+    # Demais etapas do debug_performance (moderação, fila, banco...)
+    stages = Column(JSON, nullable=True)
+    moderation = Column(String(20), nullable=False)
+    cached = Column(Boolean, nullable=False, default=False)
+    shared = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class ChatTranscript(Base):
+    """A message of a chat turn (user or assistant), linked to its usage row by request_id."""
+
+    __tablename__ = "chat_transcripts"
+
+    id = Column(Integer, primary_key=True)
+    request_id = Column(String(32), nullable=False, index=True)
+    character_id = Column(Integer, nullable=False, index=True)
+    role = Column(String(20), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,12 +1,24 @@
-from app.schemas.character import CharacterCreate, CharacterOut, CharacterUpdate, AVAILABLE_PURPOSES
+from app.schemas.character import (
+    CharacterCreate,
+    CharacterOut,
+    CharacterSearchPage,
+    CharacterUpdate,
+    ChatSettings,
+    AVAILABLE_PURPOSES,
+)
 from app.schemas.phrase import PhraseCreate, PhraseOut, PhraseUpdate
+from app.schemas.usage import CharacterUsage, UsageReport
 
 __all__ = [
     "CharacterCreate",
     "CharacterOut",
+    "CharacterSearchPage",
     "CharacterUpdate",
+    "ChatSettings",
     "AVAILABLE_PURPOSES",
     "PhraseCreate",
     "PhraseOut",
     "PhraseUpdate",
+    "CharacterUsage",
+    "UsageReport",
 ]
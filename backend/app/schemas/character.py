@@ -22,6 +22,14 @@ class PhraseInput(BaseModel):
     purpose: str = Field(..., description="Finalidade da fala")
 
 
+class ChatSettings(BaseModel):
+    """Ajustes de roteamento do chat por personagem (sobrepõem os globais)."""
+    model: Optional[str] = Field(None, max_length=100, description="Modelo da OpenAI")
+    max_tokens: Optional[int] = Field(None, ge=16, le=4000, description="Limite de tokens da resposta")
+    temperature: Optional[float] = Field(None, ge=0, le=2)
+    latency_slo_ms: Optional[int] = Field(None, ge=1000, description="Latência alvo da resposta")
+
+
 class CharacterBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -30,6 +38,7 @@ class CharacterBase(BaseModel):
     image_url: Optional[str] = Field(None, description="URL da imagem do personagem (pode ser URL ou data URI)")
     who_is_character: str = Field(..., min_length=1, max_length=255, description="Descrição de quem é o personagem")
     phrases: List[PhraseInput] = Field(..., min_items=5, max_items=5, description="Lista de falas (uma para cada finalidade)")
+    chat_settings: Optional[ChatSettings] = None
     
     @model_validator(mode='before')
     @classmethod
@@ -53,6 +62,7 @@ class CharacterUpdate(BaseModel):
     image_url: Optional[str] = Field(None, description="URL da imagem do personagem (pode ser URL ou data URI)")
     who_is_character: Optional[str] = Field(None, min_length=1, max_length=255)
     phrases: Optional[List[PhraseInput]] = Field(None, min_items=5, max_items=5)
+    chat_settings: Optional[ChatSettings] = None
 
 
 class CharacterOut(BaseModel):
@@ -64,6 +74,7 @@ class CharacterOut(BaseModel):
     image_url: Optional[str] = None
     who_is_character: str = Field(default="", description="Descrição de quem é o personagem")
     phrases: List[PhraseOut] = Field(default_factory=list)  # Retorna as frases completas com IDs
+    chat_settings: Optional[ChatSettings] = None
     created_at: datetime | None = None
     updated_at: datetime | None = None
 
@@ -81,3 +92,11 @@ class CharacterOut(BaseModel):
             if 'phrases' not in data or data['phrases'] is None:
                 data['phrases'] = []
         return data
+
+
+class CharacterSearchPage(BaseModel):
+    """Página de resultados da busca, em ordem de relevância."""
+    total: int
+    limit: int
+    offset: int
+    items: List[CharacterOut]
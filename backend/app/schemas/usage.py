@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class CharacterUsage(BaseModel):
+    """Uso agregado de um personagem no período."""
+    character_id: int
+    character_name: Optional[str] = None
+    replies: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_total_ms: Optional[float] = None
+    max_total_ms: Optional[float] = None
+    avg_openai_ms: Optional[float] = None
+    cached: int
+    shared: int
+    input_blocked: int
+    output_blocked: int
+
+
+class UsageReport(BaseModel):
+    """Uso por personagem desde `since` (registros ainda na fila ficam de fora)."""
+    since: datetime
+    replies: int
+    prompt_tokens: int
+    completion_tokens: int
+    characters: List[CharacterUsage]
+    pending: int
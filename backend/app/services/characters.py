@@ -0,0 +1,164 @@
+"""
+Leitura de personagens compartilhada entre as rotas.
+Cargas concorrentes do mesmo personagem são coalescidas numa única consulta e
+os snapshots ficam num cache por processo, invalidado pelo invalidation_bus.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.database import AsyncSessionLocal
+from app.models.character import Character
+from app.schemas.character import CharacterOut
+from app.services.invalidation import invalidation_bus, reaches_all_workers
+
+character_flight = SingleFlight()
+metrics.register_collector("singleflight.characters", character_flight.snapshot)
+
+
+class CharacterCache:
+    """LRU com TTL dos snapshots de personagens (CharacterOut) deste processo."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[int, Tuple[float, CharacterOut]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, character_id: int) -> Optional[CharacterOut]:
+        entry = self._entries.get(character_id)
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(character_id)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, character: CharacterOut) -> None:
+        self._entries[character.id] = (time.monotonic() + self.ttl_seconds, character)
+        self._entries.move_to_end(character.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, character_id: Optional[int]) -> None:
+        self.invalidations += 1
+        if character_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(character_id, None)
+
+    def snapshot(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+def _character_cache_entries() -> int:
+    """
+    Tamanho do cache. Com vários workers e o barramento local, uma edição feita
+    num worker não chegaria aos caches dos demais (que serviriam a versão
+    antiga até o TTL): o cache fica desligado.
+    """
+    if settings.character_cache_max_entries > 0 and not reaches_all_workers("Cache de personagens"):
+        return 0
+    return settings.character_cache_max_entries
+
+
+character_cache = CharacterCache(
+    max_entries=_character_cache_entries(),
+    ttl_seconds=settings.character_cache_ttl_seconds,
+)
+invalidation_bus.subscribe(character_cache.invalidate)
+metrics.register_collector("character_cache", character_cache.snapshot)
+
+
+async def _fetch_character(character_id: int, use_replica: bool) -> Optional[CharacterOut]:
+    version = invalidation_bus.version(character_id)
+    # Sessão própria: a consulta pode sobreviver à requisição que a iniciou
+    async with AsyncSessionLocal(use_replica=use_replica) as db:
+        character = (await db.execute(
+            select(Character).options(selectinload(Character.phrases)).where(Character.id == character_id)
+        )).scalar_one_or_none()
+        snapshot = CharacterOut.model_validate(character) if character else None
+    # Só guarda leituras do primário, e se nenhuma invalidação chegou durante a consulta
+    if (
+        snapshot is not None
+        and character_cache.enabled
+        and not use_replica
+        and invalidation_bus.version(character_id) == version
+    ):
+        character_cache.put(snapshot)
+    return snapshot
+
+
+async def load_character(character_id: int, use_replica: bool = False) -> Optional[CharacterOut]:
+    """
+    Carrega o personagem com suas falas, do cache do processo ou do banco,
+    compartilhando a consulta entre requisições concorrentes para o mesmo id.
+
+    Com o cache ligado a consulta vai sempre ao primário: uma réplica pode
+    ainda não ter aplicado uma edição já avisada pelo invalidation_bus (até
+    DB_REPLICA_MAX_LAG_SECONDS de atraso), e a versão antiga ficaria no cache
+    até CHARACTER_CACHE_TTL_SECONDS. A versão do barramento só descarta
+    consultas que cruzaram uma invalidação. Sem cache, vale a preferência do
+    chamador.
+
+    Args:
+        character_id: ID do personagem
+        use_replica: Se a leitura pode ir para uma réplica (ver get_read_preference);
+            ignorado com o cache ligado
+
+    Returns:
+        Optional[CharacterOut]: Snapshot do personagem, ou None se não existir
+    """
+    if character_cache.enabled:
+        cached = character_cache.get(character_id)
+        if cached is not None:
+            return cached
+        use_replica = False
+    # A versão na chave impede que quem chega após uma invalidação aproveite
+    # uma consulta iniciada antes dela
+    character, _ = await character_flight.do(
+        ("character", character_id, use_replica, invalidation_bus.version(character_id)),
+        lambda: _fetch_character(character_id, use_replica),
+    )
+    return character
+
+
+async def load_characters(character_ids: Iterable[int], use_replica: bool = False) -> Dict[int, CharacterOut]:
+    """
+    Carrega vários personagens (com suas falas) numa única consulta.
+
+    Args:
+        character_ids: IDs dos personagens
+        use_replica: Se a leitura pode ir para uma réplica (ver get_read_preference)
+
+    Returns:
+        Dict[int, CharacterOut]: Snapshots por id; ids inexistentes ficam de fora
+    """
+    ids = set(character_ids)
+    if not ids:
+        return {}
+    async with AsyncSessionLocal(use_replica=use_replica) as db:
+        characters = (await db.execute(
+            select(Character).options(selectinload(Character.phrases)).where(Character.id.in_(ids))
+        )).scalars().all()
+        return {character.id: CharacterOut.model_validate(character) for character in characters}
@@ -0,0 +1,272 @@
+"""
+Barramento de invalidação de cache entre workers e nós.
+
+As rotas de escrita publicam "o personagem X mudou" e cada processo incrementa
+a versão local do personagem e avisa os caches inscritos (snapshot de
+personagens, índice de busca, sessões de chat). Implementações:
+
+- local: só o próprio processo (um worker, desenvolvimento e testes)
+- redis: pub/sub no Redis (REDIS_URL); entrega em milissegundos
+- mysql: cada worker consulta max(updated_at) e count(*) de characters
+  periodicamente; não precisa de infraestrutura extra
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.core import metrics
+from app.core.config import Settings, settings
+from app.database import AsyncSessionLocal
+from app.models.character import Character
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Recebe o id do personagem alterado, ou None quando tudo deve ser invalidado
+InvalidationHandler = Callable[[Optional[int]], None]
+
+
+class LocalInvalidationBus:
+    """Barramento em processo; base das demais implementações."""
+
+    backend = "local"
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex
+        self._handlers: List[InvalidationHandler] = []
+        self._versions: Dict[int, int] = {}
+        self._global_version = 0
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    def subscribe(self, handler: InvalidationHandler) -> None:
+        self._handlers.append(handler)
+
+    def version(self, character_id: int) -> Tuple[int, int]:
+        """Versão local do personagem; muda a cada invalidação que o atinge."""
+        return (self._global_version, self._versions.get(character_id, 0))
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, character_id: Optional[int]) -> None:
+        """
+        Anuncia que o personagem mudou (None: todos). Chamado após o commit.
+
+        O próprio processo é invalidado na hora; falhas na difusão para os
+        demais são registradas mas não falham a requisição de escrita.
+        """
+        self.published += 1
+        self._apply(character_id)
+        try:
+            await self._broadcast(character_id)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Falha ao difundir invalidação do personagem %s: %s", character_id, e)
+
+    async def _broadcast(self, character_id: Optional[int]) -> None:
+        pass
+
+    def _apply(self, character_id: Optional[int]) -> None:
+        if character_id is None:
+            self._global_version += 1
+            self._versions.clear()
+        else:
+            self._versions[character_id] = self._versions.get(character_id, 0) + 1
+        for handler in self._handlers:
+            try:
+                handler(character_id)
+            except Exception as e:
+                self.errors += 1
+                logger.error("Erro ao aplicar invalidação do personagem %s: %s", character_id, e, exc_info=True)
+
+    def snapshot(self) -> dict:
+        return {
+            "backend": self.backend,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+            "tracked_characters": len(self._versions),
+        }
+
+
+class RedisInvalidationBus(LocalInvalidationBus):
+    """Difunde as invalidações por pub/sub no Redis."""
+
+    backend = "redis"
+
+    def __init__(self, url: str, channel: str):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._client = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._client = aioredis.from_url(self.url)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def _broadcast(self, character_id: Optional[int]) -> None:
+        message = json.dumps({"character_id": character_id, "origin": self.node_id})
+        await self._client.publish(self.channel, message)
+
+    async def _listen(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Mensagens perdidas enquanto estava desconectado: invalida tudo
+                    self._apply(None)
+                    delay = 1.0
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        data = json.loads(message["data"])
+                        if data.get("origin") == self.node_id:
+                            continue
+                        self.received += 1
+                        self._apply(data.get("character_id"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Conexão de invalidação com o Redis falhou: %s. Reconectando em %.0fs", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+
+class PollingInvalidationBus(LocalInvalidationBus):
+    """
+    Detecta mudanças feitas por outros workers consultando o banco.
+
+    Personagens com updated_at >= ao último máximo visto são invalidados um a
+    um; uma queda na contagem (exclusão) invalida tudo.
+    """
+
+    backend = "mysql"
+
+    def __init__(self, interval_seconds: float, session_factory=AsyncSessionLocal):
+        super().__init__()
+        self.interval_seconds = interval_seconds
+        self.session_factory = session_factory
+        self._last_max: Optional[datetime] = None
+        self._last_count: Optional[int] = None
+        self._poller: Optional[asyncio.Task] = None
+        self.polls = 0
+
+    async def start(self) -> None:
+        self._poller = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Falha ao consultar alterações de personagens: %s", e)
+            await asyncio.sleep(self.interval_seconds)
+
+    async def poll(self) -> None:
+        self.polls += 1
+        # Sempre no primário: a réplica pode estar atrasada
+        async with self.session_factory() as db:
+            last_max, count = (await db.execute(
+                select(func.max(Character.updated_at), func.count(Character.id))
+            )).one()
+            if self._last_count is None:
+                self._last_max, self._last_count = last_max, count
+                return
+            if (last_max, count) == (self._last_max, self._last_count):
+                return
+
+            changed = []
+            if last_max is not None:
+                stmt = select(Character.id, Character.created_at)
+                if self._last_max is not None:
+                    # >= porque updated_at pode ter só precisão de segundos
+                    stmt = stmt.where(Character.updated_at >= self._last_max)
+                changed = (await db.execute(stmt)).all()
+
+        created = sum(
+            1 for _, created_at in changed
+            if self._last_max is None or (created_at is not None and created_at >= self._last_max)
+        )
+        if count < self._last_count + created:
+            # Algum personagem foi removido
+            self.received += 1
+            self._apply(None)
+        else:
+            for character_id, _ in changed:
+                self.received += 1
+                self._apply(character_id)
+        self._last_max, self._last_count = last_max, count
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["polls"] = self.polls
+        return data
+
+
+def create_invalidation_bus(config: Settings) -> LocalInvalidationBus:
+    """Cria o barramento configurado em CACHE_INVALIDATION_BACKEND."""
+    backend = config.cache_invalidation_backend.lower()
+    if backend == "redis":
+        if aioredis is None:
+            logger.warning("redis não está instalado. Usando invalidação local (apenas este processo).")
+        elif not config.redis_url:
+            logger.warning("REDIS_URL não configurada. Usando invalidação local (apenas este processo).")
+        else:
+            return RedisInvalidationBus(config.redis_url, config.cache_invalidation_channel)
+    elif backend == "mysql":
+        return PollingInvalidationBus(config.cache_invalidation_poll_seconds)
+    elif backend != "local":
+        logger.warning("CACHE_INVALIDATION_BACKEND desconhecido: %s. Usando invalidação local.", backend)
+    return LocalInvalidationBus()
+
+
+invalidation_bus = create_invalidation_bus(settings)
+metrics.register_collector("invalidation", invalidation_bus.snapshot)
+
+
+def reaches_all_workers(consumer: str, config: Settings = settings) -> bool:
+    """
+    Se as invalidações chegam a todos os workers. Com vários workers e o
+    barramento local, uma edição feita num worker não chega aos demais: quem
+    guarda estado derivado dos personagens (consumer, usado no aviso) deve
+    deixar de guardá-lo.
+    """
+    if config.web_concurrency > 1 and invalidation_bus.backend == "local":
+        logger.warning(
+            "%s desligado: %s workers com CACHE_INVALIDATION_BACKEND=local. Use redis ou mysql para habilitá-lo.",
+            consumer,
+            config.web_concurrency,
+        )
+        return False
+    return True
@@ -0,0 +1,191 @@
+"""
+Registro de uso do chat (write-behind).
+
+Cada resposta gera um registro de uso (tokens, tempos por etapa, resultado da
+moderação) e, opcionalmente, a transcrição do turno. A rota só coloca o
+registro numa fila em memória; uma task em segundo plano grava a fila em
+lotes (INSERT com várias linhas) a cada USAGE_LEDGER_FLUSH_SECONDS ou quando
+um lote enche. A fila é limitada: com o banco lento ou fora do ar os
+registros excedentes são descartados e contados, sem segurar a resposta.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.core import metrics
+from app.core.config import Settings, settings
+from app.database import AsyncSessionLocal
+from app.models.usage import ChatTranscript, ChatUsage
+
+logger = logging.getLogger(__name__)
+
+# Etapas do debug_performance gravadas à parte (colunas próprias)
+_OWN_COLUMNS = ("total_ms", "openai_ms")
+
+
+class UsageLedger:
+    """Fila limitada de registros de uso, gravada em lotes por uma task."""
+
+    def __init__(self, config: Settings, session_factory=AsyncSessionLocal):
+        self.enabled = config.usage_ledger_enabled
+        self.transcripts = config.usage_ledger_transcripts
+        self.batch_size = max(1, config.usage_ledger_batch_size)
+        self.flush_seconds = config.usage_ledger_flush_seconds
+        self.max_pending = max(1, config.usage_ledger_max_pending)
+        self.session_factory = session_factory
+        self._pending: Deque[Tuple[dict, List[dict]]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.last_flush_ms = 0.0
+
+    def record(
+        self,
+        character_id: int,
+        channel: str,
+        perf_data: dict,
+        moderation: str,
+        messages: Optional[List[Tuple[str, str]]] = None,
+    ) -> None:
+        """
+        Enfileira o uso de uma resposta (e as mensagens (papel, texto) do
+        turno). Não bloqueia: com a fila cheia o registro é descartado.
+        """
+        if not self.enabled:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+
+        now = datetime.now(timezone.utc)
+        request_id = uuid.uuid4().hex
+        route = perf_data.get("rota") or {}
+        shared = bool(perf_data.get("compartilhada"))
+        usage = {
+            "request_id": request_id,
+            "character_id": character_id,
+            "channel": channel,
+            "route": route.get("name"),
+            "model": route.get("model"),
+            # Resposta compartilhada: os tokens já foram contados na requisição líder
+            "prompt_tokens": 0 if shared else perf_data.get("tokens_prompt") or 0,
+            "completion_tokens": 0 if shared else perf_data.get("tokens_resposta") or 0,
+            "total_ms": perf_data.get("total_ms"),
+            "openai_ms": perf_data.get("openai_ms"),
+            "stages": _stages(perf_data),
+            "moderation": moderation,
+            "cached": bool(perf_data.get("cache_resposta")),
+            "shared": shared,
+            "created_at": now,
+        }
+        transcript = [
+            {
+                "request_id": request_id,
+                "character_id": character_id,
+                "role": role,
+                "content": content,
+                "created_at": now,
+            }
+            for role, content in (messages or [])
+            if content
+        ] if self.transcripts else []
+
+        self._pending.append((usage, transcript))
+        self.recorded += 1
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if not self.enabled or self._writer is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._writer = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Para a task e grava o que ainda estiver na fila."""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        await self.flush()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Grava a fila em lotes de até batch_size registros."""
+        while self._pending:
+            count = min(self.batch_size, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(count)]
+            start = time.perf_counter()
+            try:
+                await self._write(batch)
+            except asyncio.CancelledError:
+                self.failed += len(batch)
+                raise
+            except Exception as e:
+                # Não recoloca na fila: com o banco fora do ar ela só cresceria
+                self.failed += len(batch)
+                logger.warning("Falha ao gravar %s registros de uso: %s", len(batch), e)
+                return
+            self.written += len(batch)
+            self.flushes += 1
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    async def _write(self, batch: List[Tuple[dict, List[dict]]]) -> None:
+        usage_rows = [usage for usage, _ in batch]
+        transcript_rows = [row for _, transcript in batch for row in transcript]
+        async with self.session_factory() as db:
+            # Um único INSERT com várias linhas por tabela
+            await db.execute(insert(ChatUsage).values(usage_rows))
+            if transcript_rows:
+                await db.execute(insert(ChatTranscript).values(transcript_rows))
+            await db.commit()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": self.pending,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+def _stages(perf_data: dict) -> Dict[str, float]:
+    """Tempos das demais etapas (chaves *_ms) e o número de consultas SQL."""
+    stages = {
+        key: value
+        for key, value in perf_data.items()
+        if key.endswith("_ms") and key not in _OWN_COLUMNS and isinstance(value, (int, float))
+    }
+    if "db_queries" in perf_data:
+        stages["db_queries"] = perf_data["db_queries"]
+    return stages
+
+
+usage_ledger = UsageLedger(settings)
+metrics.register_collector("usage_ledger", usage_ledger.snapshot)
@@ -0,0 +1,322 @@
+"""
+Busca textual de personagens (nome, descrição, quem é e falas).
+
+No MySQL a busca usa os índices FULLTEXT (MATCH ... AGAINST em modo booleano).
+Nos demais bancos (SQLite nos testes e no desenvolvimento local) usa um índice
+invertido em memória, construído na primeira busca e atualizado a partir do
+invalidation_bus (inclusive com escritas feitas em outros workers). Com vários
+workers e o barramento local o índice ficaria desatualizado: a busca vira uma
+consulta LIKE no banco, sem ranking de relevância.
+"""
+
+import asyncio
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, literal, or_, select
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.character import Character
+from app.models.phrase import Phrase
+from app.schemas.character import CharacterOut
+from app.services.invalidation import invalidation_bus, reaches_all_workers
+
+# Peso de cada campo no ranking
+FIELD_WEIGHTS = {"name": 3.0, "who_is_character": 2.0, "description": 1.0, "phrase": 1.0}
+# Termos que só casam por prefixo valem um pouco menos que o termo exato
+PREFIX_FACTOR = 0.8
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 50
+MAX_QUERY_TOKENS = 10
+# Termos muito comuns pontuam só os personagens com maior peso no termo: o
+# custo da busca fica limitado mesmo quando o termo aparece em todo o catálogo
+MAX_SCORED_POSTINGS = 5000
+
+_TOKEN_RE = re.compile(r"\w+")
+_COMBINING_RE = re.compile(r"[\u0300-\u036f]")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Quebra o texto em termos minúsculos e sem acento."""
+    if not text:
+        return []
+    text = text.lower()
+    if not text.isascii():
+        text = _COMBINING_RE.sub("", unicodedata.normalize("NFKD", text))
+    return _TOKEN_RE.findall(text)
+
+
+class CharacterSearchIndex:
+    """
+    Índice invertido em memória: termo -> {id do personagem: peso}.
+
+    O peso soma as ocorrências do termo em cada campo multiplicadas pelo peso
+    do campo. O ranking é um TF-IDF simples com os termos da busca em OU (quem
+    casa com mais termos fica na frente); cada termo também casa por prefixo.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._vocabulary: Optional[List[str]] = None
+        # Maiores pesos de cada termo muito comum, em ordem decrescente
+        self._top_postings: Dict[str, List[Tuple[int, float]]] = {}
+        self.built = False
+        self.stale = False
+        # Personagens alterados desde a última busca, reindexados sob demanda
+        self._pending = set()
+        self.builds = 0
+        self.refreshes = 0
+        self._build_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def _add(self, character_id: int, fields: Dict[str, Iterable[Optional[str]]]) -> None:
+        weights: Dict[str, float] = defaultdict(float)
+        for field, texts in fields.items():
+            for text in texts:
+                for token in tokenize(text):
+                    weights[token] += FIELD_WEIGHTS[field]
+        for token, weight in weights.items():
+            self._postings[token][character_id] = weight
+            self._top_postings.pop(token, None)
+        self._doc_terms[character_id] = list(weights)
+        self._vocabulary = None
+
+    def remove(self, character_id: int) -> None:
+        for token in self._doc_terms.pop(character_id, []):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(character_id, None)
+            self._top_postings.pop(token, None)
+            if not postings:
+                del self._postings[token]
+        self._vocabulary = None
+
+    def invalidate(self, character_id: Optional[int]) -> None:
+        """Recebe as invalidações do barramento (None: reconstrói tudo)."""
+        if self._build_lock.locked() or character_id is None:
+            # A escrita pode não aparecer nos dados que o build em andamento já leu
+            self.stale = True
+        elif self.built:
+            self._pending.add(character_id)
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """Termos do vocabulário que casam com o termo da busca (exato ou prefixo)."""
+        terms = [(token, 1.0)] if token in self._postings else []
+        if len(token) < MIN_PREFIX_LENGTH:
+            return terms
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                terms.append((term, PREFIX_FACTOR))
+        return terms
+
+    def _scored_postings(self, term: str) -> Iterable[Tuple[int, float]]:
+        postings = self._postings[term]
+        if len(postings) <= MAX_SCORED_POSTINGS:
+            return postings.items()
+        top = self._top_postings.get(term)
+        if top is None:
+            top = heapq.nlargest(MAX_SCORED_POSTINGS, postings.items(), key=lambda item: item[1])
+            self._top_postings[term] = top
+        return top
+
+    def search(self, query: str, limit: int, offset: int = 0) -> Tuple[int, List[int]]:
+        """
+        Returns:
+            Tuple[int, List[int]]: (total de resultados, ids da página em ordem de relevância)
+        """
+        total_docs = len(self._doc_terms) or 1
+        scores: Dict[int, float] = defaultdict(float)
+        matched = []
+        for token in dict.fromkeys(tokenize(query)[:MAX_QUERY_TOKENS]):
+            for term, factor in self._expand(token):
+                postings = self._postings[term]
+                matched.append(postings.keys())
+                idf = math.log(1 + total_docs / len(postings))
+                for character_id, weight in self._scored_postings(term):
+                    scores[character_id] += factor * idf * weight
+        if not matched:
+            return 0, []
+        # O total conta todos os personagens que casam, inclusive os não pontuados
+        total = len(set().union(*matched))
+        ranked = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return total, [character_id for character_id, _ in ranked[offset:]]
+
+    async def _refresh_pending(self, db: AsyncSession) -> None:
+        ids, self._pending = self._pending, set()
+        characters = (await db.execute(
+            select(Character.id, Character.name, Character.who_is_character, Character.description)
+            .where(Character.id.in_(ids))
+        )).all()
+        phrases = (await db.execute(
+            select(Phrase.character_id, Phrase.phrase).where(Phrase.character_id.in_(ids))
+        )).all()
+        for character_id in ids:
+            self.remove(character_id)
+        fresh = _build_index(characters, phrases)
+        for character_id, terms in fresh._doc_terms.items():
+            for term in terms:
+                self._postings[term][character_id] = fresh._postings[term][character_id]
+                self._top_postings.pop(term, None)
+            self._doc_terms[character_id] = terms
+        self._vocabulary = None
+        self.refreshes += 1
+
+    async def ensure_built(self, db: AsyncSession) -> None:
+        """Constrói o índice a partir do banco na primeira busca (ou se ficou desatualizado)."""
+        if self.built and not self.stale:
+            if self._pending:
+                await self._refresh_pending(db)
+            return
+        async with self._build_lock:
+            if self.built and not self.stale:
+                return
+            self.stale = False
+            self._pending = set()
+            # Colunas simples em vez de objetos ORM: bem mais leve para catálogos grandes
+            characters = (await db.execute(
+                select(Character.id, Character.name, Character.who_is_character, Character.description)
+            )).all()
+            phrases = (await db.execute(select(Phrase.character_id, Phrase.phrase))).all()
+            fresh = await run_in_threadpool(_build_index, characters, phrases)
+            self._postings = fresh._postings
+            self._doc_terms = fresh._doc_terms
+            self._vocabulary = None
+            self._top_postings = {}
+            self.built = True
+            self.builds += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "built": self.built,
+            "documents": len(self._doc_terms),
+            "terms": len(self._postings),
+            "builds": self.builds,
+            "refreshes": self.refreshes,
+            "pending": len(self._pending),
+        }
+
+
+def _build_index(characters, phrases) -> CharacterSearchIndex:
+    phrases_by_character: Dict[int, List[str]] = defaultdict(list)
+    for character_id, phrase in phrases:
+        phrases_by_character[character_id].append(phrase)
+    index = CharacterSearchIndex()
+    for character_id, name, who_is_character, description in characters:
+        index._add(character_id, {
+            "name": [name],
+            "who_is_character": [who_is_character],
+            "description": [description],
+            "phrase": [" ".join(phrases_by_character.get(character_id, []))],
+        })
+    return index
+
+
+character_search_index = CharacterSearchIndex()
+invalidation_bus.subscribe(character_search_index.invalidate)
+metrics.register_collector("search_index", character_search_index.snapshot)
+# No MySQL o índice em memória não é usado (FULLTEXT)
+_use_memory_index = make_url(settings.database_url).get_backend_name() == "mysql" or reaches_all_workers(
+    "Índice de busca em memória"
+)
+
+
+def _boolean_query(query: str) -> str:
+    """Converte a busca em termos do modo booleano do MySQL, com prefixo (termo*)."""
+    return " ".join(f"{token}*" for token in dict.fromkeys(tokenize(query)[:MAX_QUERY_TOKENS]))
+
+
+async def _search_fulltext(db: AsyncSession, query: str, limit: int, offset: int) -> Tuple[int, List[int]]:
+    against = _boolean_query(query)
+    if not against:
+        return 0, []
+
+    character_score = match(
+        Character.name, Character.description, Character.who_is_character, against=against
+    ).in_boolean_mode()
+    phrase_match = match(Phrase.phrase, against=against).in_boolean_mode()
+    phrase_scores = (
+        select(Phrase.character_id, func.sum(phrase_match).label("score"))
+        .where(phrase_match)
+        .group_by(Phrase.character_id)
+        .subquery()
+    )
+    score = (character_score * FIELD_WEIGHTS["name"] + func.coalesce(phrase_scores.c.score, literal(0))).label("score")
+    stmt = (
+        select(Character.id, score, func.count().over().label("total"))
+        .outerjoin(phrase_scores, phrase_scores.c.character_id == Character.id)
+        .where(or_(character_score > 0, phrase_scores.c.character_id.is_not(None)))
+        .order_by(score.desc(), Character.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return 0, []
+    return rows[0].total, [row.id for row in rows]
+
+
+async def _search_like(db: AsyncSession, query: str, limit: int, offset: int) -> Tuple[int, List[int]]:
+    """Qualquer termo contido em nome, descrição, quem é ou falas; ordem por id."""
+    terms = list(dict.fromkeys(term.lower() for term in _TOKEN_RE.findall(query)))[:MAX_QUERY_TOKENS]
+    if not terms:
+        return 0, []
+    columns = (Character.name, Character.description, Character.who_is_character)
+    phrase_match = select(Phrase.character_id).where(
+        or_(*(func.lower(Phrase.phrase).contains(term, autoescape=True) for term in terms))
+    )
+    condition = or_(
+        *(func.lower(column).contains(term, autoescape=True) for column in columns for term in terms),
+        Character.id.in_(phrase_match),
+    )
+    total = await db.scalar(select(func.count()).select_from(Character).where(condition))
+    ids = (await db.execute(
+        select(Character.id).where(condition).order_by(Character.id).limit(limit).offset(offset)
+    )).scalars().all()
+    return total or 0, list(ids)
+
+
+async def search_characters(
+    db: AsyncSession, query: str, limit: int, offset: int = 0
+) -> Tuple[int, List[CharacterOut]]:
+    """
+    Busca personagens por relevância.
+
+    Returns:
+        Tuple[int, List[CharacterOut]]: (total de resultados, personagens da página)
+    """
+    if db.get_bind().dialect.name == "mysql":
+        total, ids = await _search_fulltext(db, query, limit, offset)
+    elif not _use_memory_index:
+        total, ids = await _search_like(db, query, limit, offset)
+    else:
+        await character_search_index.ensure_built(db)
+        total, ids = character_search_index.search(query, limit, offset)
+    if not ids:
+        return total, []
+
+    # Carrega só a página, numa única consulta, e devolve na ordem do ranking
+    characters = (await db.execute(
+        select(Character).options(selectinload(Character.phrases)).where(Character.id.in_(ids))
+    )).scalars().all()
+    by_id = {character.id: CharacterOut.model_validate(character) for character in characters}
+    return total, [by_id[character_id] for character_id in ids if character_id in by_id]
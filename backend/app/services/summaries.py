@@ -0,0 +1,199 @@
+"""
+Resumo incremental do histórico do chat.
+
+Conversas longas reenviariam todas as mensagens antigas à OpenAI a cada
+turno. Quando o histórico passa de CHAT_SUMMARY_THRESHOLD_MESSAGES, as
+mensagens antigas são trocadas por um resumo e só as mais recentes vão
+inteiras, então o tamanho do prompt fica quase constante.
+
+O trecho resumido sempre termina num múltiplo de CHAT_SUMMARY_BLOCK_MESSAGES:
+assim o mesmo prefixo (e a mesma chave de cache, o hash do prefixo) se repete
+por vários turnos. O resumo nunca é gerado na requisição: quando o do bloco
+atual ainda não existe, a requisição usa o do bloco anterior (ou o histórico
+inteiro) e uma task em segundo plano gera o novo a partir do resumo anterior
+mais as mensagens do bloco. Os resumos ficam no cache em disco (compartilhado
+pelos workers) e num LRU em memória.
+"""
+
+import asyncio
+import contextvars
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from anyio import to_thread
+
+from app.core import metrics
+from app.core.config import Settings, settings
+from app.core.disk_cache import cache_key, disk_cache
+from app.schemas import CharacterOut
+
+logger = logging.getLogger(__name__)
+
+# (id do personagem, mensagens, modelo, max_tokens) -> texto gerado
+Completion = Callable[[int, List[dict], str, int], Awaitable[str]]
+
+# Blocos anteriores consultados quando o resumo do bloco atual não está pronto
+_MAX_LOOKBACK_BLOCKS = 4
+_MEMORY_ENTRIES = 512
+
+
+class ConversationSummarizer:
+    """Troca o começo de históricos longos por um resumo gerado fora da requisição."""
+
+    def __init__(self, config: Settings, complete: Completion):
+        self.enabled = config.chat_summary_enabled
+        self.threshold = config.chat_summary_threshold_messages
+        self.block = max(1, config.chat_summary_block_messages)
+        self.keep_recent = max(0, config.chat_summary_keep_recent_messages)
+        self.model = config.chat_summary_model
+        self.max_tokens = config.chat_summary_max_tokens
+        self.ttl_seconds = config.chat_summary_ttl_seconds
+        self.complete = complete
+        self._semaphore = asyncio.Semaphore(max(1, config.chat_summary_max_concurrency))
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._in_flight: Set[str] = set()
+        # Mantém referência às tasks em andamento (o event loop guarda só referências fracas)
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.fallbacks = 0
+        self.scheduled = 0
+        self.built = 0
+        self.failed = 0
+
+    def covered(self, history: List[dict]) -> int:
+        """Quantas mensagens do começo do histórico devem ser resumidas (0 = nenhuma)."""
+        if not self.enabled or len(history) < self.threshold:
+            return 0
+        return (len(history) - self.keep_recent) // self.block * self.block
+
+    def _key(self, character: CharacterOut, prefix: List[dict]) -> str:
+        return cache_key("chat_summary", character.id, self.model, prefix)
+
+    async def _lookup(self, key: str) -> Optional[str]:
+        summary = self._memory.get(key)
+        if summary is not None:
+            self._memory.move_to_end(key)
+            return summary
+        summary = await to_thread.run_sync(disk_cache.get, key)
+        if summary is not None:
+            self._remember(key, summary)
+        return summary
+
+    def _remember(self, key: str, summary: str) -> None:
+        self._memory[key] = summary
+        self._memory.move_to_end(key)
+        while len(self._memory) > _MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    async def _best_summary(
+        self, character: CharacterOut, history: List[dict], covered: int
+    ) -> Tuple[int, Optional[str]]:
+        """Maior bloco <= covered que já tem resumo: (mensagens cobertas, resumo)."""
+        for size in range(covered, max(0, covered - _MAX_LOOKBACK_BLOCKS * self.block), -self.block):
+            summary = await self._lookup(self._key(character, history[:size]))
+            if summary is not None:
+                return size, summary
+        return 0, None
+
+    async def compact(self, character: CharacterOut, history: List[dict], perf_data: dict) -> List[dict]:
+        """
+        Histórico a enviar: o resumo mais recente disponível (como mensagem de
+        sistema) seguido das mensagens que ele não cobre.
+        """
+        covered = self.covered(history)
+        if covered <= 0:
+            return list(history)
+
+        size, summary = await self._best_summary(character, history, covered)
+        if size < covered:
+            self._schedule(character, history[:covered], size, summary)
+            perf_data["resumo_pendente"] = True
+        if summary is None:
+            self.fallbacks += 1
+            return list(history)
+
+        self.hits += 1
+        perf_data["resumo_mensagens"] = size
+        return [{"role": "system", "content": f"Resumo da conversa até aqui:\n{summary}"}, *history[size:]]
+
+    def _schedule(
+        self, character: CharacterOut, prefix: List[dict], base_size: int, base_summary: Optional[str]
+    ) -> None:
+        key = self._key(character, prefix)
+        if key in self._in_flight:
+            return
+        self._in_flight.add(key)
+        self.scheduled += 1
+        # Contexto vazio: o resumo não herda o prazo, o trace nem as métricas da requisição
+        task = asyncio.create_task(
+            self._build(key, character, prefix, base_size, base_summary), context=contextvars.Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _build(
+        self,
+        key: str,
+        character: CharacterOut,
+        prefix: List[dict],
+        base_size: int,
+        base_summary: Optional[str],
+    ) -> None:
+        try:
+            async with self._semaphore:
+                summary = (await self.complete(
+                    character.id,
+                    _summary_prompt(character, base_summary, prefix[base_size:]),
+                    self.model,
+                    self.max_tokens,
+                )).strip()
+            if not summary:
+                raise ValueError("resumo vazio")
+            self._remember(key, summary)
+            await to_thread.run_sync(disk_cache.set, key, summary, self.ttl_seconds)
+            self.built += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Falha ao resumir o histórico do chat com %s: %s", character.name, e)
+        finally:
+            self._in_flight.discard(key)
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "scheduled": self.scheduled,
+            "built": self.built,
+            "failed": self.failed,
+            "in_flight": len(self._in_flight),
+        }
+
+
+def _summary_prompt(character: CharacterOut, previous: Optional[str], messages: List[dict]) -> List[dict]:
+    speakers: Dict[str, str] = {"user": "Usuário", "assistant": character.name}
+    transcript = "\n".join(
+        f"{speakers.get(message.get('role'), message.get('role'))}: {message.get('content', '')}"
+        for message in messages
+    )
+    if previous:
+        transcript = f"Resumo anterior:\n{previous}\n\nMensagens seguintes:\n{transcript}"
+    return [
+        {
+            "role": "system",
+            "content": (
+                f"Resuma a conversa entre o usuário e {character.name} em até 8 frases, em português. "
+                "Mantenha fatos, nomes, preferências e pedidos do usuário e o que o personagem já "
+                "contou ou prometeu. Responda apenas com o resumo."
+            ),
+        },
+        {"role": "user", "content": transcript},
+    ]
+
+
+def create_summarizer(complete: Completion, config: Settings = settings) -> ConversationSummarizer:
+    """Cria o resumidor e registra suas métricas."""
+    summarizer = ConversationSummarizer(config, complete)
+    metrics.register_collector("chat_summaries", summarizer.snapshot)
+    return summarizer
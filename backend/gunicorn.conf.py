@@ -0,0 +1,59 @@
+"""
+Configuração do gunicorn para servir a API com vários workers uvicorn.
+
+Usada pelo start.sh quando WEB_CONCURRENCY > 1. A aplicação (e o modelo do
+Detoxify/torch) é carregada uma única vez no processo mestre antes do fork;
+os workers compartilham essa memória via copy-on-write em vez de cada um
+carregar a sua cópia do modelo.
+"""
+
+import gc
+import os
+
+# Evita "buracos" nas páginas herdadas pelos workers: o GC fica desligado no
+# mestre até o fork e os objetos carregados são congelados (gc.freeze)
+gc.disable()
+
+# Cada worker usa uma thread do torch; com vários workers, threads extras
+# só disputam os mesmos núcleos
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:7000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+# GUNICORN_PRELOAD=false só faz sentido para comparação (scripts/bench_worker_memory.py)
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() != "false"
+
+# Reciclagem dos workers (limita o crescimento de memória); o jitter evita
+# que todos reiniciem ao mesmo tempo. 0 desabilita
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# Maior que o prazo das requisições de chat (CHAT_REQUEST_TIMEOUT_SECONDS)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "130"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+accesslog = "-"
+
+
+def when_ready(server):
+    """Roda no mestre depois do preload e antes de criar os workers."""
+    if not preload_app:
+        gc.enable()
+        return
+    from app.main import warm_up
+
+    # O import da aplicação adia o SDK da OpenAI e o modelo: carrega aqui, antes
+    # do fork, para que os workers compartilhem essa memória
+    warm_up()
+    gc.collect()
+    gc.freeze()
+    server.log.info("Aplicação e guardrails pré-carregados; objetos congelados para o fork")
+
+
+def post_fork(server, worker):
+    """Roda em cada worker logo após o fork."""
+    gc.enable()
+    from app.database import dispose_engines_after_fork
+
+    dispose_engines_after_fork()
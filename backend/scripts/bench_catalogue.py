@@ -0,0 +1,246 @@
+"""
+Benchmark de escala das rotas de personagens com um catálogo sintético.
+
+Para cada tamanho de catálogo (--sizes, em ordem crescente) completa o banco
+com personagens de scripts/generate_catalogue.py, sobe um uvicorn novo (caches
+e memória zerados) e mede cada rota:
+
+- list: GET /api/characters/ (o catálogo inteiro, com as imagens inline)
+- get: GET /api/characters/{id} com ids aleatórios (cache frio; é a mesma
+  consulta do chat, app.services.characters.load_character)
+- get_cache: os mesmos ids de novo (cache de personagens do processo)
+- search: GET /api/characters/search (no SQLite, a 1ª monta o índice em memória)
+- create: POST /api/characters/
+
+Relata p50/p95/máximo da latência, bytes da resposta, consultas SQL por
+requisição (X-DB-Queries) e a memória do servidor (RSS ao subir e pico), com
+o crescimento em relação ao menor catálogo, para expor os degraus de escala
+antes da produção.
+
+Uso (a partir de backend/, só Linux):
+    python scripts/bench_catalogue.py --sizes 100,1000,10000 --image-kb 50
+    python scripts/bench_catalogue.py --sizes 1000,100000 --image-kb 0 --json curvas.json
+    DATABASE_URL=mysql+pymysql://... python scripts/bench_catalogue.py --sizes 1000,10000 --use-database-url
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from generate_catalogue import BACKEND_DIR, generate, insert_catalogue
+
+# Personagens criados pelo benchmark ficam longe dos índices do catálogo
+CREATE_INDEX_BASE = 10_000_000
+
+
+def read_process_memory_kb(pid: int) -> Dict[str, int]:
+    """VmRSS (atual) e VmHWM (pico) de /proc/<pid>/status, em kB."""
+    values = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0])
+    return {"rss": values.get("VmRSS", 0), "peak": values.get("VmHWM", 0)}
+
+
+def wait_until_ready(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Servidor não respondeu em {url} após {timeout}s")
+
+
+def request(method: str, url: str, body: Optional[dict] = None) -> Tuple[float, int, int]:
+    """(latência em ms, bytes da resposta, consultas SQL) de uma requisição."""
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=300) as response:
+        payload = response.read()
+        queries = int(response.headers.get("X-DB-Queries") or 0)
+    return (time.perf_counter() - started) * 1000, len(payload), queries
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(samples: List[Tuple[float, int, int]]) -> dict:
+    latencies = [sample[0] for sample in samples]
+    return {
+        "requests": len(samples),
+        "p50_ms": round(percentile(latencies, 0.5), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "max_ms": round(max(latencies), 2),
+        "avg_bytes": round(sum(sample[1] for sample in samples) / len(samples)),
+        "avg_queries": round(sum(sample[2] for sample in samples) / len(samples), 2),
+    }
+
+
+def start_server(port: int, database_url: str, workdir: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        # Só as rotas de personagens: sem modelo de moderação nem logs por requisição
+        MODERATION_ENABLED="false",
+        LOG_LEVEL="WARNING",
+        DISK_CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+        SCHEMA_CHECK_REPORT_PATH="",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+def bench_size(args, size: int, database_url: str, workdir: str) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    api = f"{base_url}/api/characters"
+    started = time.perf_counter()
+    server = start_server(args.port, database_url, workdir)
+    try:
+        wait_until_ready(f"{base_url}/health", args.startup_timeout)
+        startup_ms = (time.perf_counter() - started) * 1000
+        # Aquecimento (imports tardios, primeira conexão do pool) fora das medições
+        for _ in range(args.warmup):
+            request("GET", f"{api}/1")
+        memory_start = read_process_memory_kb(server.pid)
+
+        rng = random.Random(args.seed + size)
+        ids = [rng.randint(1, size) for _ in range(args.requests)]
+        endpoints = {
+            "list": [request("GET", f"{api}/") for _ in range(args.list_requests)],
+            "get": [request("GET", f"{api}/{character_id}") for character_id in ids],
+            "get_cache": [request("GET", f"{api}/{character_id}") for character_id in ids],
+            "search": [
+                request("GET", f"{api}/search?q={rng.choice(('cogumelo', 'koopa', 'estrela', 'castelo'))}")
+                for _ in range(args.requests)
+            ],
+            "create": [
+                request("POST", f"{api}/", payload)
+                for payload in generate(
+                    args.requests, CREATE_INDEX_BASE + size, args.traits, args.image_kb, args.seed
+                )
+            ],
+        }
+        memory_end = read_process_memory_kb(server.pid)
+    finally:
+        stop_server(server)
+
+    return {
+        "size": size,
+        "startup_ms": round(startup_ms, 2),
+        "rss_start_mb": round(memory_start["rss"] / 1024, 1),
+        "rss_end_mb": round(memory_end["rss"] / 1024, 1),
+        "peak_mb": round(memory_end["peak"] / 1024, 1),
+        "endpoints": {name: summarize(samples) for name, samples in endpoints.items()},
+    }
+
+
+def print_results(results: List[dict]) -> None:
+    first = results[0]
+    print(f"\n{'catálogo':>9} {'subida ms':>10} {'RSS início MB':>14} {'RSS fim MB':>11} {'pico MB':>8}")
+    for result in results:
+        print(
+            f"{result['size']:>9} {result['startup_ms']:>10.0f} {result['rss_start_mb']:>14.1f} "
+            f"{result['rss_end_mb']:>11.1f} {result['peak_mb']:>8.1f}"
+        )
+    for name in first["endpoints"]:
+        base = first["endpoints"][name]
+        print(f"\n{name}")
+        print(
+            f"{'catálogo':>9} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9} {'bytes':>12} "
+            f"{'consultas':>9} {'p50 x':>7} {'bytes x':>8}"
+        )
+        for result in results:
+            row = result["endpoints"][name]
+            # Crescimento em relação ao menor catálogo: revela comportamento linear (ou pior)
+            latency_growth = row["p50_ms"] / base["p50_ms"] if base["p50_ms"] else 0.0
+            bytes_growth = row["avg_bytes"] / base["avg_bytes"] if base["avg_bytes"] else 0.0
+            print(
+                f"{result['size']:>9} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['max_ms']:>9.1f} "
+                f"{row['avg_bytes']:>12} {row['avg_queries']:>9.1f} {latency_growth:>7.1f} {bytes_growth:>8.1f}"
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", help="Tamanhos do catálogo, separados por vírgula")
+    parser.add_argument("--image-kb", type=float, default=20.0, help="Imagem inline por personagem (0 = sem imagem)")
+    parser.add_argument("--traits", type=int, default=5)
+    parser.add_argument("--requests", type=int, default=30, help="Requisições por rota (exceto list)")
+    parser.add_argument("--list-requests", type=int, default=3, help="Requisições da listagem completa")
+    parser.add_argument("--warmup", type=int, default=5, help="Requisições de aquecimento por servidor")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=7200)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument(
+        "--use-database-url",
+        action="store_true",
+        help="Usa o banco de DATABASE_URL (deve estar vazio) em vez de um SQLite temporário",
+    )
+    parser.add_argument("--json", help="Grava as curvas em JSON")
+    args = parser.parse_args()
+    sizes = sorted({int(size) for size in args.sizes.split(",") if size.strip()})
+
+    from sqlalchemy import create_engine
+
+    with tempfile.TemporaryDirectory(prefix="bench_catalogue_") as workdir:
+        if args.use_database_url:
+            database_url = os.environ["DATABASE_URL"]
+        else:
+            database_url = f"sqlite:///{os.path.join(workdir, 'catalogue.db')}"
+        engine = create_engine(database_url)
+        generated = 0
+        results = []
+        try:
+            for size in sizes:
+                started = time.perf_counter()
+                generated += insert_catalogue(
+                    engine, generate(size - generated, generated, args.traits, args.image_kb, args.seed)
+                )
+                print(
+                    f"catálogo com {size} personagens (+{args.requests} por tamanho criados pelo benchmark) "
+                    f"em {time.perf_counter() - started:.1f}s; medindo..."
+                )
+                results.append(bench_size(args, size, database_url, workdir))
+        finally:
+            engine.dispose()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump({"image_kb": args.image_kb, "traits": args.traits, "results": results}, output, indent=2)
+        print(f"\nCurvas gravadas em {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
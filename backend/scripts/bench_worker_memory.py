@@ -0,0 +1,117 @@
+"""
+Mede a memória por worker do gunicorn (gunicorn.conf.py), com e sem preload.
+
+Sobe o gunicorn, espera o /health responder, faz algumas requisições de
+aquecimento e lê /proc/<pid>/smaps_rollup do mestre e de cada worker. A
+coluna que importa é a PSS (memória proporcional): páginas compartilhadas via
+copy-on-write são divididas entre os processos, então a soma das PSS é o custo
+real em RAM. A RSS conta as páginas compartilhadas em todos os processos.
+
+Uso (a partir de backend/, só Linux):
+    python scripts/bench_worker_memory.py --workers 4
+    python scripts/bench_worker_memory.py --workers 4 --no-preload
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_memory_kb(pid: int) -> dict:
+    """Rss, Pss, Shared_* e Private_* (kB) de /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        "private": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def child_pids(pid: int) -> list:
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as handle:
+            children.extend(int(child) for child in handle.read().split())
+    return sorted(children)
+
+
+def wait_until_ready(url: str, workers: int, master_pid: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200 and len(child_pids(master_pid)) >= workers:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Servidor não respondeu em {url} após {timeout}s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=7100)
+    parser.add_argument("--no-preload", action="store_true", help="Cada worker importa a aplicação sozinho")
+    parser.add_argument("--warmup", type=int, default=50, help="Requisições de aquecimento por worker")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    args = parser.parse_args()
+
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_BIND=f"127.0.0.1:{args.port}",
+        GUNICORN_PRELOAD="false" if args.no_preload else "true",
+        GUNICORN_MAX_REQUESTS="0",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        base_url = f"http://127.0.0.1:{args.port}"
+        wait_until_ready(f"{base_url}/health", args.workers, server.pid, args.startup_timeout)
+        for _ in range(args.warmup * args.workers):
+            with urllib.request.urlopen(f"{base_url}/health", timeout=5) as response:
+                response.read()
+        time.sleep(1)
+
+        rows = [("mestre", server.pid, read_memory_kb(server.pid))]
+        rows += [(f"worker {i + 1}", pid, read_memory_kb(pid)) for i, pid in enumerate(child_pids(server.pid))]
+
+        print(f"preload={'não' if args.no_preload else 'sim'} workers={args.workers}")
+        print(f"{'processo':<10} {'pid':>7} {'RSS MB':>9} {'PSS MB':>9} {'compart. MB':>12} {'privada MB':>11}")
+        for label, pid, memory in rows:
+            print(
+                f"{label:<10} {pid:>7} {memory['rss'] / 1024:>9.1f} {memory['pss'] / 1024:>9.1f} "
+                f"{memory['shared'] / 1024:>12.1f} {memory['private'] / 1024:>11.1f}"
+            )
+        total_pss = sum(memory["pss"] for _, _, memory in rows) / 1024
+        total_rss = sum(memory["rss"] for _, _, memory in rows) / 1024
+        print(f"{'total':<10} {'':>7} {total_rss:>9.1f} {total_pss:>9.1f}")
+        return 0
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
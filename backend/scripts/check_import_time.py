@@ -0,0 +1,105 @@
+"""
+Verifica o orçamento de tempo de import da aplicação (python -X importtime).
+
+Importa app.main num processo novo algumas vezes e compara o menor tempo
+acumulado com o orçamento. Também falha se o import carregar módulos que
+devem ficar para o primeiro uso ou para o warm_up do startup (torch,
+detoxify, SDK da OpenAI...). Usado no CI para impedir que um import pesado
+volte para o caminho da inicialização.
+
+Uso (a partir de backend/):
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget-ms 800 --runs 5 --top 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Carregados só no primeiro uso ou no warm_up do startup
+DEFERRED_MODULES = ("torch", "detoxify", "better_profanity", "openai", "pyinstrument", "opentelemetry.sdk")
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Linhas do -X importtime como (módulo com indentação, self_us, cumulativo_us)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|", 2)
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module: str) -> Tuple[int, List[Tuple[str, int, int]], List[str]]:
+    """Importa o módulo num processo novo: (tempo acumulado em us, linhas, módulos adiados carregados)."""
+    code = (
+        f"import sys; import {module}; "
+        f"print(','.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))"
+    )
+    env = dict(os.environ)
+    # O import não deve depender do banco (nem abrir conexões)
+    env.setdefault("DATABASE_URL", "sqlite:///./import_time_check.db")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}:\n{result.stderr[-4000:]}")
+    rows = parse_importtime(result.stderr)
+    total = next((cumulative for name, _, cumulative in rows if name.strip() == module), 0)
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return total, rows, loaded
+
+
+def heaviest(rows: List[Tuple[str, int, int]], top: int, exclude: str) -> List[Tuple[str, int]]:
+    """Pacotes raiz (fora o próprio pacote medido) com maior tempo acumulado."""
+    packages: Dict[str, int] = {}
+    for name, _, cumulative in rows:
+        root = name.strip().split(".")[0]
+        if root == exclude:
+            continue
+        packages[root] = max(packages.get(root, 0), cumulative)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500")),
+        help="Tempo máximo de import (padrão: IMPORT_TIME_BUDGET_MS ou 1500)",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Usa o menor tempo entre as execuções")
+    parser.add_argument("--top", type=int, default=10, help="Pacotes mais lentos exibidos")
+    args = parser.parse_args()
+
+    measurements = [measure(args.module) for _ in range(max(1, args.runs))]
+    total_us, rows, loaded = min(measurements, key=lambda measurement: measurement[0])
+    total_ms = total_us / 1000
+
+    print(f"import {args.module}: {total_ms:.0f} ms (melhor de {len(measurements)}; orçamento {args.budget_ms:.0f} ms)")
+    for package, cumulative in heaviest(rows, args.top, args.module.split(".")[0]):
+        print(f"  {cumulative / 1000:8.1f} ms  {package}")
+
+    failed = False
+    if loaded:
+        print(f"ERRO: o import carregou módulos que deveriam ser adiados: {', '.join(loaded)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"ERRO: import acima do orçamento ({total_ms:.0f} ms > {args.budget_ms:.0f} ms)")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+Gera um catálogo sintético de personagens para testes de escala.
+
+Cada personagem tem uma fala para cada finalidade de AVAILABLE_PURPOSES, uma
+lista de traços de personalidade e, opcionalmente, uma imagem inline (data
+URI base64, como as enviadas pelo formulário) do tamanho pedido. Os dados são
+determinísticos para a mesma --seed.
+
+Sem --output, grava direto no banco de DATABASE_URL (INSERTs em lote, bem mais
+rápido que a API para dezenas de milhares de personagens); as tabelas são
+criadas se ainda não existirem. Com --output, grava os payloads da API
+(CharacterCreate) em JSON Lines.
+
+Uso (a partir de backend/):
+    DATABASE_URL=sqlite:///./catalogo.db python scripts/generate_catalogue.py --count 10000 --image-kb 50
+    python scripts/generate_catalogue.py --count 100 --traits 8 --output catalogo.jsonl
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+from typing import Iterator, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.schemas.character import AVAILABLE_PURPOSES  # noqa: E402
+
+NAME_PREFIXES = ("Super", "Capitão", "Dr.", "Mestre", "Princesa", "Rei", "Pequeno", "Grande", "Sombra", "Mini")
+NAME_ROOTS = ("Cogumelo", "Koopa", "Estrela", "Goomba", "Boo", "Yoshi", "Lakitu", "Chomp", "Toad", "Wiggler")
+TRAITS = (
+    "corajoso", "curioso", "teimoso", "brincalhão", "leal", "desastrado", "sábio", "tímido",
+    "ranzinza", "otimista", "competitivo", "gentil", "misterioso", "guloso", "vaidoso", "aventureiro",
+)
+WORDS = (
+    "reino", "castelo", "tubo", "moeda", "estrela", "cogumelo", "floresta", "lava", "nuvem", "ponte",
+    "tesouro", "corrida", "festa", "chave", "torre", "ilha", "caverna", "deserto", "neve", "arco-íris",
+)
+# Cabeçalho PNG: o data URI parece uma imagem de verdade para quem inspeciona
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def character_name(index: int) -> str:
+    prefix = NAME_PREFIXES[index % len(NAME_PREFIXES)]
+    root = NAME_ROOTS[(index // len(NAME_PREFIXES)) % len(NAME_ROOTS)]
+    # O número garante nomes únicos (a coluna name é UNIQUE)
+    return f"{prefix} {root} {index:06d}"
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _traits(rng: random.Random, count: int) -> List[str]:
+    if count <= len(TRAITS):
+        return rng.sample(TRAITS, count)
+    # Listas maiores que o vocabulário repetem os traços com um número
+    return [f"{rng.choice(TRAITS)} {position}" for position in range(count)]
+
+
+def inline_image(rng: random.Random, size_kb: float) -> Optional[str]:
+    """Data URI com cerca de size_kb KB de base64 (None para 0)."""
+    if size_kb <= 0:
+        return None
+    raw_bytes = max(len(PNG_SIGNATURE), int(size_kb * 1024 * 3 / 4))
+    payload = PNG_SIGNATURE + rng.randbytes(raw_bytes - len(PNG_SIGNATURE))
+    return "data:image/png;base64," + base64.b64encode(payload).decode("ascii")
+
+
+def character_payload(index: int, rng: random.Random, traits: int, image: Optional[str]) -> dict:
+    """Payload de CharacterCreate do personagem sintético número index."""
+    name = character_name(index)
+    return {
+        "name": name,
+        "description": f"{name} vive perto de {_sentence(rng, 3).lower()}. {_sentence(rng, 12)}.",
+        "catchphrase": f"{_sentence(rng, 4)}!",
+        "personality_traits": _traits(rng, traits),
+        "image_url": image,
+        "who_is_character": f"Personagem sintético {index} do catálogo de testes",
+        "phrases": [
+            {"phrase": f"{_sentence(rng, 8)} ({purpose})"[:255], "purpose": purpose}
+            for purpose in AVAILABLE_PURPOSES
+        ],
+    }
+
+
+def generate(
+    count: int, start: int = 0, traits: int = 5, image_kb: float = 0.0, seed: int = 42
+) -> Iterator[dict]:
+    """Payloads dos personagens start .. start+count-1."""
+    for index in range(start, start + count):
+        # Uma semente por índice: o personagem N é o mesmo qualquer que seja o start
+        rng = random.Random(seed * 1_000_003 + index)
+        yield character_payload(index, rng, traits, inline_image(rng, image_kb))
+
+
+def insert_catalogue(engine, payloads: Iterator[dict], batch_size: int = 500) -> int:
+    """Grava os payloads direto nas tabelas, em lotes. Devolve quantos foram gravados."""
+    from sqlalchemy import func, insert, select
+
+    from app.models import Character, Phrase
+    from app.models.base import Base
+
+    Base.metadata.create_all(engine, tables=[Character.__table__, Phrase.__table__])
+    with engine.begin() as conn:
+        next_id = (conn.execute(select(func.max(Character.id))).scalar() or 0) + 1
+
+    written = 0
+    batch: List[dict] = []
+
+    def flush() -> None:
+        nonlocal next_id, written
+        if not batch:
+            return
+        characters, phrases = [], []
+        for payload in batch:
+            characters.append({
+                "id": next_id,
+                **{key: value for key, value in payload.items() if key != "phrases"},
+            })
+            phrases.extend({"character_id": next_id, **phrase} for phrase in payload["phrases"])
+            next_id += 1
+        with engine.begin() as conn:
+            conn.execute(insert(Character), characters)
+            conn.execute(insert(Phrase), phrases)
+        written += len(batch)
+        batch.clear()
+
+    for payload in payloads:
+        batch.append(payload)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return written
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000, help="Personagens a gerar")
+    parser.add_argument("--start", type=int, default=0, help="Índice do primeiro personagem")
+    parser.add_argument("--traits", type=int, default=5, help="Traços de personalidade por personagem")
+    parser.add_argument("--image-kb", type=float, default=0.0, help="Tamanho da imagem inline (0 = sem imagem)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--output", help="Arquivo JSON Lines em vez do banco")
+    args = parser.parse_args()
+
+    payloads = generate(args.count, args.start, args.traits, args.image_kb, args.seed)
+    started = time.perf_counter()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            for payload in payloads:
+                output.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        print(f"{args.count} personagens gravados em {args.output} em {time.perf_counter() - started:.1f}s")
+        return 0
+
+    from sqlalchemy import create_engine
+
+    from app.core.config import settings
+
+    engine = create_engine(settings.database_url)
+    try:
+        written = insert_catalogue(engine, payloads, args.batch_size)
+    finally:
+        engine.dispose()
+    print(f"{written} personagens inseridos em {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Configuração dos testes: SQLite temporário, sem moderação nem cache em disco.
+
+As Settings são lidas no import da aplicação, então o ambiente é definido
+aqui, antes de qualquer import de app.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_TMP_DIR = tempfile.mkdtemp(prefix="chatbot_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["DISK_CACHE_PATH"] = os.path.join(_TMP_DIR, "cache.sqlite3")
+os.environ["MODERATION_ENABLED"] = "false"
+os.environ["SCHEMA_CHECK_REPORT_PATH"] = ""
+os.environ["USAGE_LEDGER_ENABLED"] = "false"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    import app.models  # noqa: F401
+    from app.database import engine
+    from app.main import app
+    from app.models.base import Base
+
+    Base.metadata.create_all(engine)
+    with TestClient(app) as test_client:
+        yield test_client
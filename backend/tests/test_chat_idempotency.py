@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.routes import chat as chat_mod
+from app.schemas import AVAILABLE_PURPOSES
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=f"Resposta {self.calls}")
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message, finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15),
+            model=kwargs["model"],
+        )
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    fake = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+    monkeypatch.setattr(chat_mod, "get_openai_client", lambda: client)
+    return fake
+
+
+@pytest.fixture
+def character_id(client):
+    response = client.post("/api/characters/", json={
+        "name": "Teste Idempotência",
+        "who_is_character": "Personagem de teste",
+        "personality_traits": ["leal"],
+        "phrases": [{"phrase": f"Fala {index}", "purpose": purpose} for index, purpose in enumerate(AVAILABLE_PURPOSES)],
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def test_retry_with_the_same_key_replays_the_first_reply(client, completions, character_id):
+    history = [
+        {"role": "user", "content": "Oi"},
+        {"role": "assistant", "content": "Olá!"},
+    ]
+    # O ChatPage reenvia, com a mesma chave, o histórico da primeira tentativa
+    # (sem o turno que falhou nem a mensagem de erro exibida)
+    payload = {"message": "Tudo bem?", "character_id": character_id, "conversation_history": history}
+    headers = {"Idempotency-Key": "turno-1"}
+
+    first = client.post("/api/chat/", json=payload, headers=headers)
+    retry = client.post("/api/chat/", json=payload, headers=headers)
+
+    assert first.status_code == 200, first.text
+    assert retry.status_code == 200, retry.text
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert retry.json()["response"] == first.json()["response"]
+    assert completions.calls == 1
+
+    # Com o turno que falhou no histórico é outro pedido: a chave é recusada
+    payload["conversation_history"] = history + [
+        {"role": "user", "content": "Tudo bem?"},
+        {"role": "assistant", "content": "❌ Erro: Network Error"},
+    ]
+    assert client.post("/api/chat/", json=payload, headers=headers).status_code == 422
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+# Carregados só no primeiro uso ou no warm_up do startup. Do OpenTelemetry só
+# o SDK: a API (opentelemetry.trace...) já vem com o próprio FastAPI quando
+# está instalada
+DEFERRED_MODULES = ("torch", "detoxify", "better_profanity", "openai", "pyinstrument", "opentelemetry.sdk")
+
+
+def test_import_does_not_load_deferred_modules():
+    # Processo novo: aqui os outros testes já importaram a aplicação
+    code = (
+        "import sys; import app.main; "
+        f"print(','.join(name for name in {DEFERRED_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=dict(os.environ), capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr[-4000:]
+    assert result.stdout.strip() == ""
@@ -0,0 +1,24 @@
+from app.schemas import AVAILABLE_PURPOSES
+from app.services import search
+
+
+def test_search_without_memory_index_queries_the_database(client, monkeypatch):
+    # Vários workers com o barramento local: o índice em memória fica desligado
+    monkeypatch.setattr(search, "_use_memory_index", False)
+    response = client.post("/api/characters/", json={
+        "name": "Teste Busca Cogumelo",
+        "who_is_character": "Personagem de teste",
+        "personality_traits": ["curioso"],
+        "phrases": [
+            {"phrase": f"Fala {index} sobre o castelo_100%", "purpose": purpose}
+            for index, purpose in enumerate(AVAILABLE_PURPOSES)
+        ],
+    })
+    assert response.status_code == 201, response.text
+    character_id = response.json()["id"]
+
+    found = client.get("/api/characters/search", params={"q": "cogumelo"}).json()
+    assert character_id in [character["id"] for character in found["items"]]
+    by_phrase = client.get("/api/characters/search", params={"q": "castelo_100"}).json()
+    assert [character["id"] for character in by_phrase["items"]] == [character_id]
+    assert client.get("/api/characters/search", params={"q": "inexistentexyz"}).json()["total"] == 0
@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from app.api.routes import chat as chat_mod
+from app.core.openai_transport import CircuitBreaker
+
+
+class FakeCompletions:
+    def __init__(self, fail: bool):
+        self.fail = fail
+
+    async def create(self, **kwargs):
+        if self.fail:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1"))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="resumo"))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30),
+        )
+
+
+def _fake_client(monkeypatch, fail: bool) -> None:
+    client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(fail)))
+    monkeypatch.setattr(chat_mod, "get_openai_client", lambda: client)
+
+
+def test_summary_usage_goes_to_ledger(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(chat_mod.usage_ledger, "record", lambda *args, **kwargs: recorded.append(args))
+    _fake_client(monkeypatch, fail=False)
+
+    text = asyncio.run(chat_mod._summary_completion(7, [{"role": "user", "content": "oi"}], "gpt-4o-mini", 200))
+
+    assert text == "resumo"
+    [(character_id, channel, perf_data, _)] = recorded
+    assert (character_id, channel) == (7, "resumo")
+    assert (perf_data["tokens_prompt"], perf_data["tokens_resposta"]) == (120, 30)
+    assert perf_data["rota"]["model"] == "gpt-4o-mini"
+
+
+def test_summary_failures_do_not_open_chat_breaker(monkeypatch):
+    monkeypatch.setattr(chat_mod.usage_ledger, "record", lambda *args, **kwargs: None)
+    monkeypatch.setattr(chat_mod.summary_transport, "max_attempts", 1)
+    monkeypatch.setattr(chat_mod.summary_transport, "breaker", CircuitBreaker(failure_threshold=3, reset_timeout=30.0))
+    _fake_client(monkeypatch, fail=True)
+
+    for _ in range(chat_mod.summary_transport.breaker.failure_threshold):
+        with pytest.raises(openai.APIConnectionError):
+            asyncio.run(chat_mod._summary_completion(7, [], "gpt-4o-mini", 200))
+
+    assert chat_mod.summary_transport.breaker.state == "open"
+    assert chat_mod.openai_transport.breaker.state == "closed"
+    assert chat_mod.openai_transport.breaker.consecutive_failures == 0
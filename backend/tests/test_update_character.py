@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.database import async_engine
+from app.schemas import AVAILABLE_PURPOSES
+
+
+@contextmanager
+def count_statements():
+    """Conta os statements enviados ao banco pelo engine assíncrono de escrita."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sync_engine = async_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _payload(name: str, suffix: str = "") -> dict:
+    return {
+        "name": name,
+        "who_is_character": "Personagem de teste",
+        "personality_traits": ["corajoso"],
+        "phrases": [
+            {"phrase": f"Fala {index}{suffix}", "purpose": purpose}
+            for index, purpose in enumerate(AVAILABLE_PURPOSES)
+        ],
+    }
+
+
+def _create(client, name: str) -> dict:
+    response = client.post("/api/characters/", json=_payload(name))
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+def test_single_phrase_edit_statement_count(client):
+    character = _create(client, "Teste Uma Fala")
+    payload = _payload("Teste Uma Fala")
+    payload["phrases"][0]["phrase"] = "Fala alterada"
+
+    with count_statements() as statements:
+        response = client.put(f"/api/characters/{character['id']}", json=payload)
+
+    assert response.status_code == 200, response.text
+    # SELECT do personagem (com func.now()), SELECT das falas (selectinload),
+    # UPDATE em lote das falas e UPDATE do personagem
+    verbs = [statement.split(None, 1)[0].upper() for statement in statements]
+    assert verbs == ["SELECT", "SELECT", "UPDATE", "UPDATE"], statements
+    body = response.json()
+    assert body["phrases"][0]["phrase"] == "Fala alterada"
+    assert body["updated_at"] >= character["created_at"]
+
+
+def test_unchanged_edit_only_reads(client):
+    character = _create(client, "Teste Sem Mudança")
+
+    with count_statements() as statements:
+        response = client.put(f"/api/characters/{character['id']}", json=_payload("Teste Sem Mudança"))
+
+    assert response.status_code == 200, response.text
+    assert [statement.split(None, 1)[0].upper() for statement in statements] == ["SELECT", "SELECT"], statements
+
+
+def test_scalar_edit_in_the_same_second_as_create(client):
+    # O func.now() tem precisão de segundos: o updated_at novo é igual ao gravado
+    character = _create(client, "Teste Mesmo Segundo")
+
+    response = client.put(f"/api/characters/{character['id']}", json={"name": "Teste Mesmo Segundo 2"})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["name"] == "Teste Mesmo Segundo 2"
+    assert client.get(f"/api/characters/{character['id']}").json()["name"] == "Teste Mesmo Segundo 2"
@@ -0,0 +1,11 @@
+from app.core.config import settings
+
+
+def test_usage_report_requires_admin_token(client, monkeypatch):
+    assert client.get("/api/usage/").status_code == 403
+
+    monkeypatch.setattr(settings, "profiling_admin_token", "segredo")
+    assert client.get("/api/usage/", headers={"X-Admin-Token": "errado"}).status_code == 403
+    response = client.get("/api/usage/", headers={"X-Admin-Token": "segredo"})
+    assert response.status_code == 200, response.text
+    assert response.json()["replies"] == 0
@@ -1,11 +1,22 @@
 import api from "./client";
-import type { Character, CharacterPayload } from "../types/character";
+import type { Character, CharacterPayload, CharacterSearchPage } from "../types/character";
 
 export const fetchCharacters = async (): Promise<Character[]> => {
     const { data } = await api.get<Character[]>("/api/characters/");
     return data;
 };
 
+export const searchCharacters = async (
+    q: string,
+    limit = 20,
+    offset = 0,
+): Promise<CharacterSearchPage> => {
+    const { data } = await api.get<CharacterSearchPage>("/api/characters/search", {
+        params: { q, limit, offset },
+    });
+    return data;
+};
+
 export const fetchCharacter = async (id: number): Promise<Character> => {
     const { data } = await api.get<Character>(`/api/characters/${id}`);
     return data;
@@ -10,9 +10,54 @@ export interface ChatResponse {
     response: string;
 }
 
-export const sendChatMessage = async (payload: ChatRequest): Promise<ChatResponse> => {
+export interface GroupChatRequest {
+    message: string;
+    character_ids: number[];
+    conversation_history: Array<{ role: "user" | "assistant"; content: string }>;
+}
+
+export interface GroupChatReply {
+    character_id: number;
+    character_name: string;
+    response?: string | null;
+    error?: string | null;
+    status_code: number;
+}
+
+export interface GroupChatResponse {
+    replies: GroupChatReply[];
+}
+
+// O backend desiste um pouco antes do navegador, liberando a capacidade
+// em vez de continuar gerando uma resposta que ninguém vai receber
+const deadlineHeader = (): Record<string, string> =>
+    api.defaults.timeout ? { "X-Request-Deadline-Ms": String(api.defaults.timeout - 2000) } : {};
+
+export const createIdempotencyKey = (): string =>
+    // randomUUID só existe em contextos seguros (https/localhost)
+    typeof crypto !== "undefined" && "randomUUID" in crypto
+        ? crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
+export const sendChatMessage = async (
+    payload: ChatRequest,
+    idempotencyKey?: string
+): Promise<ChatResponse> => {
     // Usa /api/chat/ com barra no final para consistência com o backend
-    const { data } = await api.post<ChatResponse>("/api/chat/", payload);
+    // O Idempotency-Key permite reenviar o mesmo turno sem gerar uma nova resposta
+    const { data } = await api.post<ChatResponse>("/api/chat/", payload, {
+        headers: {
+            ...deadlineHeader(),
+            ...(idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {}),
+        },
+    });
     return data;
 };
 
+export const sendGroupChatMessage = async (payload: GroupChatRequest): Promise<GroupChatResponse> => {
+    // Todos os personagens respondem em paralelo no backend
+    const { data } = await api.post<GroupChatResponse>("/api/chat/group", payload, {
+        headers: deadlineHeader(),
+    });
+    return data;
+};
@@ -12,13 +12,30 @@ const api = axios.create({
     timeout: 120000, // 120 segundos (2 minutos) - necessário para requisições da OpenAI que podem demorar
 });
 
+function randomHex(bytes: number): string {
+    const values = new Uint8Array(bytes);
+    crypto.getRandomValues(values);
+    return Array.from(values, (value) => value.toString(16).padStart(2, "0")).join("");
+}
+
+// Header W3C traceparent: o backend continua este trace (quando o tracing
+// está habilitado), ligando a requisição do navegador aos spans do servidor.
+// A decisão de amostragem fica com o backend
+function traceparent(): { header: string; traceId: string } {
+    const traceId = randomHex(16);
+    return { header: `00-${traceId}-${randomHex(8)}-01`, traceId };
+}
+
 // Interceptor para log de requisições e erros
 api.interceptors.request.use(
     (config) => {
+        const trace = traceparent();
+        config.headers.set("traceparent", trace.header);
         console.log("📤 Requisição:", {
             method: config.method?.toUpperCase(),
             url: config.url,
             fullURL: `${config.baseURL}${config.url}`,
+            traceId: trace.traceId,
         });
         return config;
     },
@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef } from "react";
 import { useQuery } from "@tanstack/react-query";
 import { fetchCharacters, fetchCharacter } from "../api/characters";
-import { sendChatMessage } from "../api/chat";
+import { createIdempotencyKey, sendChatMessage } from "../api/chat";
 import { MessageContent } from "../components/MessageContent";
 import "./ChatPage.css";
 
@@ -17,6 +17,12 @@ export function ChatPage({ onNavigateToCharacters }: ChatPageProps) {
     const [conversation, setConversation] = useState<Array<{ role: "user" | "assistant"; content: string }>>([]);
     const [isLoading, setIsLoading] = useState(false);
     const messagesEndRef = useRef<HTMLDivElement>(null);
+    const pendingTurnRef = useRef<{
+        key: string;
+        characterId: number;
+        message: string;
+        history: Array<{ role: "user" | "assistant"; content: string }>;
+    } | null>(null);
     const [showCharacterSelect, setShowCharacterSelect] = useState(false);
 
     const charactersQuery = useQuery({
@@ -58,16 +64,32 @@ export function ChatPage({ onNavigateToCharacters }: ChatPageProps) {
         setMessage("");
         setIsLoading(true);
 
+        // Reenvio da mesma mensagem após timeout/erro de rede reaproveita a chave,
+        // para o backend devolver a geração em andamento em vez de criar outra.
+        // O histórico também é o da primeira tentativa (sem o turno que falhou
+        // nem a mensagem de erro): o backend recusa a mesma chave com outro histórico
+        const pending = pendingTurnRef.current;
+        const retry =
+            pending && pending.characterId === selectedCharacterId && pending.message === userMessage
+                ? pending
+                : null;
+        const idempotencyKey = retry ? retry.key : createIdempotencyKey();
+        const history = retry ? retry.history : conversation;
+        pendingTurnRef.current = null;
+
         // Adiciona mensagem do usuário
-        const newConversation = [...conversation, { role: "user" as const, content: userMessage }];
+        const newConversation = [...history, { role: "user" as const, content: userMessage }];
         setConversation(newConversation);
 
         try {
-            const response = await sendChatMessage({
-                message: userMessage,
-                character_id: selectedCharacterId,
-                conversation_history: conversation,
-            });
+            const response = await sendChatMessage(
+                {
+                    message: userMessage,
+                    character_id: selectedCharacterId,
+                    conversation_history: history,
+                },
+                idempotencyKey
+            );
 
             // Adiciona resposta do assistente
             setConversation([
@@ -76,6 +98,16 @@ export function ChatPage({ onNavigateToCharacters }: ChatPageProps) {
             ]);
         } catch (error) {
             console.error("Erro ao enviar mensagem:", error);
+
+            // Sem resposta do servidor (timeout/rede): a geração pode continuar lá
+            if (error && typeof error === 'object' && !(error as { response?: unknown }).response) {
+                pendingTurnRef.current = {
+                    key: idempotencyKey,
+                    characterId: selectedCharacterId,
+                    message: userMessage,
+                    history,
+                };
+            }
             
             // Extrai mensagem de erro mais detalhada
             let errorMessage = "❌ Erro ao processar sua mensagem. Tente novamente.";
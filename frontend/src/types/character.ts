@@ -7,6 +7,13 @@ export interface Phrase {
     updated_at?: string | null;
 }
 
+export interface ChatSettings {
+    model?: string | null;
+    max_tokens?: number | null;
+    temperature?: number | null;
+    latency_slo_ms?: number | null;
+}
+
 export interface Character {
     id: number;
     name: string;
@@ -16,6 +23,7 @@ export interface Character {
     image_url?: string | null;
     who_is_character: string;
     phrases: Phrase[];
+    chat_settings?: ChatSettings | null;
     created_at?: string | null;
     updated_at?: string | null;
 }
@@ -38,3 +46,10 @@ export const AVAILABLE_PURPOSES = [
 ] as const;
 
 export type Purpose = typeof AVAILABLE_PURPOSES[number];
+
+export interface CharacterSearchPage {
+    total: number;
+    limit: number;
+    offset: number;
+    items: Character[];
+}